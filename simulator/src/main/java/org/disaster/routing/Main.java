@@ -18,12 +18,13 @@ public class Main {
     private static final String DEFAULT_OUTPUT_DIRECTORY_NAME = "output";
 
     public static void main(String[] args) {
-        if (args.length > 1) {
-            System.err.println("Usage: Main <output-directory-name>");
+        if (args.length > 2) {
+            System.err.println("Usage: Main <output-directory-name> [<input-directory-name>]");
             System.exit(1);
         }
 
-        File outputDirectory = new File(MATSIM_DIRECTORY, args.length == 1 ? args[0] : DEFAULT_OUTPUT_DIRECTORY_NAME);
+        File outputDirectory = new File(MATSIM_DIRECTORY, args.length >= 1 ? args[0] : DEFAULT_OUTPUT_DIRECTORY_NAME);
+        File inputDirectory = args.length == 2 ? new File(MATSIM_DIRECTORY, args[1]) : null;
         File configFile = new File(MATSIM_DIRECTORY, "config.xml");
         if (!configFile.exists()) {
             System.err.printf("Config file not found: %s\n", configFile.getAbsolutePath());
@@ -34,6 +35,12 @@ public class Main {
         config.routing().setNetworkRouteConsistencyCheck(RoutingConfigGroup.NetworkRouteConsistencyCheck.disable);
         config.network().setTimeVariantNetwork(true);
 
+        // Simulations running side by side read their network and plans from their own input directories
+        if (inputDirectory != null) {
+            config.network().setInputFile(new File(inputDirectory, "network.xml.gz").getAbsolutePath());
+            config.plans().setInputFile(new File(inputDirectory, "plans.xml.gz").getAbsolutePath());
+        }
+
         config.controller().setOutputDirectory(outputDirectory.getAbsolutePath());
         config.controller().setOverwriteFileSetting(
             OutputDirectoryHierarchy.OverwriteFileSetting.deleteDirectoryIfExists
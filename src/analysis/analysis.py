@@ -6,16 +6,21 @@ from shapely.geometry.polygon import orient
 
 from config import ProgramConfig
 from data_loader.population import get_total_population
+from routes.route import Route
 
 
 def write_analysis_data_simwrapper(
-    program_conf: ProgramConfig, stats: dict[str, int], output_dir: Path
+    program_conf: ProgramConfig,
+    stats: dict[str, int],
+    output_dir: Path,
+    routes: list[Route] | None = None,
 ) -> None:
     """
     Write analysis data to the output directory.
     :param program_conf: ProgramConfig object containing simulation parameters
     :param stats: Dictionary containing statistics
     :param output_dir: Path to the output directory
+    :param routes: The routes given to MATSim, used to report the load on every exit
     """
     _add_danger_zone_statistics(
         program_conf=program_conf,
@@ -23,6 +28,8 @@ def write_analysis_data_simwrapper(
         output_dir=output_dir,
     )
     _add_population_file_to_output(program_conf=program_conf, output_dir=output_dir)
+    if routes is not None:
+        _add_exit_loads(program_conf=program_conf, routes=routes, output_dir=output_dir)
 
 
 def _add_danger_zone_statistics(
@@ -51,6 +58,11 @@ def _add_danger_zone_statistics(
             f"Departure time window length [minutes], {program_conf.departure_end_time_sec / 60}\n"
         )
         file.write(f"Total lane km, {round(total_lane_km, 2)}\n")
+        if program_conf.safe_exits is not None:
+            file.write(f"Exit edges, {len(program_conf.safe_exits)}\n")
+            file.write(
+                f"Total exit capacity [vehicles/hour], {round(program_conf.safe_exits.total_capacity)}\n"
+            )
         for key, value in stats.items():
             file.write(f"{key}, {value}\n")
         file.write(
@@ -67,3 +79,15 @@ def _add_population_file_to_output(
     pop_data.to_file(
         os.path.join(output_dir, "population_data.geojson"), driver="GeoJSON"
     )
+
+
+def _add_exit_loads(
+    program_conf: ProgramConfig, routes: list[Route], output_dir: Path
+) -> None:
+    safe_exits = program_conf.safe_exits
+    if safe_exits is None:
+        return
+    exits = safe_exits.to_geodataframe().drop(columns="geometry")
+    exits["vehicles"] = safe_exits.exit_loads(routes)
+    exits["hours_to_clear"] = (exits["vehicles"] / exits["capacity"]).round(2)
+    exits.to_csv(os.path.join(output_dir, "exit_loads.csv"), index=False)
@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass, field
 from pathlib import Path
 
@@ -6,16 +7,21 @@ from geopandas import GeoDataFrame
 
 from data_loader import load_json_file_to_str
 from input_data import InputData, PopulationType, SimulationType
+from routes.capacity_aware import CapacityAwareFastestPath
+from routes.compact_graph import CompactRoadGraph
 from routes.fastest_path import FastestPath
+from routes.heuristics import Search
 from routes.route_algo import RouteAlgo
+from routes.route_utils import vertex
+from routes.safe_exits import SafeExitCatalogue
 from routes.shortest_path import ShortestPath
+from routes.time_dependent import TimeDependentFastestPath
 
 SOURCE_DIR = Path(__file__).parent.parent
 DATA_DIR = SOURCE_DIR / "data"
 EXPLORE_OUTPUT_FOLDER = DATA_DIR / "matsim"
 CASE_STUDIES_OUTPUT_FOLDER = DATA_DIR / "case_studies"
 
-CPH_G_GRAPHML = "copenhagen.graphml"
 CPH_XTRA_SMALL_AMAGER_DANGER_ZONE = "dangerzone_lillebitteamager.geojson"
 CPH_SMALL_AMAGER_DANGER_ZONE = "mindre_del_af_amager.geojson"
 CPH_AMAGER_DANGER_ZONE = "dangerzone_amager.geojson"
@@ -28,7 +34,19 @@ RAVENNA_POPULATION_DATA = "ravennaPopulation.geojson"
 ONE_HOUR = 3600
 cars_per_person_cph = 0.24  # refer to our thesis
 cars_per_person_ravenna = 0.69  # refer to our thesis
-ROUTE_ALGOS = [FastestPath(), ShortestPath()]
+SEARCHES: list[Search] = ["dijkstra", "astar", "alt", "ch", "bidirectional"]
+"""Searches the fastest and shortest path routers can be run with, see default_route_algos."""
+OPTIONAL_ROUTE_ALGOS: dict[str, RouteAlgo] = {
+    "capacity-aware": CapacityAwareFastestPath(),
+    "time-dependent": TimeDependentFastestPath(),
+}
+"""Algorithms that are only simulated when asked for, by name, in addition to default_route_algos."""
+# Cores kept busy by one MATSim run (QSim, replanning and events threads)
+MATSIM_CPUS_PER_SIMULATION = 4
+MATSIM_MEMORY_PER_SIMULATION_MB = 4096
+# Without a memory budget every MATSim JVM may grow to its default heap, a quarter of the physical memory, so
+# this many simulations at a time leave half of the memory to the rest of the system
+MATSIM_DEFAULT_HEAP_SIMULATIONS = 2
 
 SIM_WRAPPER_LINK = "https://docs.simwrapper.app/site/local/"
 
@@ -38,14 +56,28 @@ class ProgramConfig:
     danger_zone_population_data: GeoDataFrame = None
     danger_zones: GeoDataFrame = None
     G: nx.MultiDiGraph = None
-    origin_points: list[str] = field(default_factory=list)
+    compact_graph: CompactRoadGraph | None = None
+    safe_exits: SafeExitCatalogue | None = None
+    origin_points: list[vertex] = field(default_factory=list)
     cars_per_person: float = 1
     route_algos: list[RouteAlgo] = field(default_factory=list)
     departure_end_time_sec: int = ONE_HOUR
     diversifying_routes: int = 1
+    routing_workers: int = os.cpu_count() or 1
+    simulation_cpu_budget: int = os.cpu_count() or 1
+    simulation_memory_budget_mb: int | None = None
     population_type: PopulationType = PopulationType.TIFF_FILE
 
 
+def default_route_algos(search: Search = "dijkstra") -> list[RouteAlgo]:
+    """
+    Returns the algorithms that are always simulated.
+    :param search: How the fastest and shortest path routers search for routes, one of SEARCHES.
+    :return: The fastest and shortest path routers.
+    """
+    return [FastestPath(search), ShortestPath(search)]
+
+
 def set_dev_input_data() -> InputData:
     """
     Set the input data for development.
@@ -1,17 +1,17 @@
 import logging
+import os
 import subprocess
 from pathlib import Path
 from types import FrameType
 
 from config import (
-    ROUTE_ALGOS,
+    OPTIONAL_ROUTE_ALGOS,
     SOURCE_DIR,
     ProgramConfig,
+    default_route_algos,
 )
-from data_loader.danger_zones import load_danger_zone_from_str
-from data_loader.osm import (
-    download_osm_graph_from_polygon,
-)
+from data_loader.danger_zones import Scenario
+from data_loader.osm import OsmGraphCache, load_osm_graph
 from data_loader.population import (
     get_origin_points,
     population_data_from_geojson,
@@ -27,20 +27,43 @@ from input_data import (
     open_pickle_file,
     verify_input,
 )
+from routes.compact_graph import load_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.heuristics import Search
+from routes.incremental import incremental
+from routes.safe_exits import SafeExitCatalogue
 
 
-def run_matsim(output_dir_name: str = "output") -> None:
+def run_matsim(
+    output_dir_name: str = "output",
+    input_dir_name: str | None = None,
+    memory_mb: int | None = None,
+) -> None:
     """
     Run the MATSim executable with the config.xml file in the MATSIM_DATA_DIR.
     :param output_dir_name: The name of the output directory in the "matsim" data directory.
+    :param input_dir_name: The name of the directory in the "matsim" data directory containing the network and
+        plans files. If None, the files in the "matsim" data directory itself are used.
+    :param memory_mb: The maximum heap size of the MATSim JVM in megabytes. If None, the JVM default is used.
     """
+    exec_args = (
+        output_dir_name
+        if input_dir_name is None
+        else f"{output_dir_name} {input_dir_name}"
+    )
     cmd = [
         "mvn",
         "exec:java",
         "-Dexec.mainClass=org.disaster.routing.Main",
-        f'-Dexec.args="{output_dir_name}"',
+        f'-Dexec.args="{exec_args}"',
     ]
-    subprocess.run(cmd, cwd=SOURCE_DIR / "simulator", check=True)
+    env = None
+    if memory_mb is not None:
+        # exec:java runs MATSim inside the Maven JVM, so its heap is set through MAVEN_OPTS
+        env = os.environ | {
+            "MAVEN_OPTS": f"{os.environ.get('MAVEN_OPTS', '')} -Xmx{memory_mb}m".strip()
+        }
+    subprocess.run(cmd, cwd=SOURCE_DIR / "simulator", env=env, check=True)
 
 
 def sim_wrapper_serve(output_path: Path) -> None:
@@ -55,20 +78,34 @@ def sim_wrapper_serve(output_path: Path) -> None:
     subprocess.run(cmd, cwd=output_path, check=True)
 
 
-def controller_input_data(input_data: InputData) -> ProgramConfig:
+def controller_input_data(
+    input_data: InputData,
+    optional_route_algos: list[str] | None = None,
+    search: Search = "dijkstra",
+) -> ProgramConfig:
+    """
+    Load everything a run needs from the input data.
+    :param input_data: The input data of the run.
+    :param optional_route_algos: Names of algorithms in OPTIONAL_ROUTE_ALGOS to simulate as well.
+    :param search: How the fastest and shortest path routers search for routes, one of SEARCHES.
+    :return: The program configuration of the run.
+    """
     conf = ProgramConfig()
-    conf.route_algos = ROUTE_ALGOS
+    route_algos = default_route_algos(search) + [
+        OPTIONAL_ROUTE_ALGOS[name] for name in optional_route_algos or []
+    ]
+    conf.route_algos = route_algos
+    osm_cache = OsmGraphCache()
+    if input_data.danger_zones_geopandas_json == "":
+        logging.fatal("Danger zone geojson is empty")
+        raise ValueError("Danger zone geojson is empty")
+    # The danger zone is parsed once, and every later stage works on the scenario
+    scenario = Scenario.from_geojson_str(input_data.danger_zones_geopandas_json)
+    logging.info(f"Danger zone bounds: {scenario.bounds}")
+    conf.danger_zones = scenario.danger_zone
+    conf.G = load_osm_graph(scenario.osm_polygon, cache=osm_cache)
     match input_data.simulation_type:
         case SimulationType.CASE_STUDIES:
-            if input_data.danger_zones_geopandas_json == "":
-                logging.fatal("Danger zone geojson is empty")
-                raise ValueError("Danger zone geojson is empty")
-            conf.G = download_osm_graph_from_polygon(
-                input_data.danger_zones_geopandas_json
-            )
-            conf.danger_zones = load_danger_zone_from_str(
-                input_data.danger_zones_geopandas_json, "EPSG:4326"
-            )
             conf.danger_zone_population_data = population_data_from_geojson(
                 input_data.pop_geo_json_filepath
             )
@@ -76,15 +113,8 @@ def controller_input_data(input_data: InputData) -> ProgramConfig:
             conf.population_type = PopulationType.GEO_JSON_FILE
 
         case SimulationType.EXPLORE:
-            conf.danger_zones = load_danger_zone_from_str(
-                input_data.danger_zones_geopandas_json, "EPSG:4326"
-            )
-            conf.G = download_osm_graph_from_polygon(
-                input_data.danger_zones_geopandas_json
-            )
-            conf.danger_zones = load_danger_zone_from_str(
-                input_data.danger_zones_geopandas_json, "EPSG:4326"
-            )
+            # Explore runs are repeated with small changes to the danger zone, so unaffected routes are reused
+            conf.route_algos = [incremental(algorithm) for algorithm in route_algos]
             match input_data.population_type:
                 case PopulationType.TIFF_FILE:
                     conf.danger_zone_population_data = population_data_from_tiff(
@@ -95,15 +125,23 @@ def controller_input_data(input_data: InputData) -> ProgramConfig:
                     conf.population_type = PopulationType.TIFF_FILE
                 case PopulationType.NUMBER:
                     conf.danger_zone_population_data = population_data_from_number(
-                        danger_zone=conf.danger_zones,
+                        danger_zone=scenario.geometry,
                         population_number=input_data.population_number,
                         G=conf.G,
                     )
                     conf.population_type = PopulationType.NUMBER
                 case PopulationType.GEO_JSON_FILE:
                     raise ValueError("Geojson file cannot be given in explore case")
+    conf.compact_graph = load_compact_graph(
+        scenario.osm_polygon, conf.G, cache=osm_cache
+    )
+    conf.safe_exits = SafeExitCatalogue.from_graph(
+        conf.compact_graph,
+        DangerZoneIndex.from_compact_graph(conf.compact_graph, scenario.geometry),
+    )
+    logging.info(f"Danger zone has {len(conf.safe_exits)} exit edges")
     conf.origin_points = get_origin_points(
-        conf.danger_zone_population_data, dangerzone=conf.danger_zones
+        conf.danger_zone_population_data, dangerzone=scenario.geometry
     )
     conf.departure_end_time_sec = input_data.departure_end_time_sec
     conf.diversifying_routes = input_data.diversifying_routes
@@ -1,12 +1,20 @@
 import json
 import logging
+from dataclasses import dataclass
 
 import geopandas as gpd
+import numpy as np
+import shapely
+from numpy.typing import NDArray
 from shapely.geometry import shape
+from shapely.geometry.polygon import Polygon
 
 from data_loader import DATA_DIR, load_json_file
+from data_loader.osm import geojson_as_polygon
 
 DANGER_ZONES_DIR = DATA_DIR / "danger_zones"
+METERS_PER_DEGREE = 111_320
+"""Length in meters of a degree of latitude."""
 
 
 def load_danger_zone(file_name: str, crs: str) -> gpd.GeoDataFrame:
@@ -43,6 +51,139 @@ def load_danger_zone_from_str(geo_json: str, crs: str) -> gpd.GeoDataFrame:
     return gpd.GeoDataFrame(geometry=polygons, crs=crs)
 
 
+class DangerZoneGeometry:
+    """
+    The union of the danger zone polygons, prepared for membership tests of many points. Drawn danger zones can have
+    thousands of vertices, so points may be tested against a simplified copy instead. Only points within the
+    simplification tolerance of its boundary could be classified differently by the two, and those are tested
+    against the exact geometry, so the result is always that of the exact geometry.
+    """
+
+    def __init__(
+        self, geometry: shapely.Geometry, tolerance: float | None = None
+    ) -> None:
+        """
+        :param geometry: The danger zone, e.g. the union of its polygons.
+        :param tolerance: The simplification tolerance in the units of the coordinates, no simplification if None.
+        """
+        self.exact = geometry
+        shapely.prepare(self.exact)
+        self.tolerance = tolerance
+        self.simplified: shapely.Geometry | None = None
+        if tolerance:
+            self.simplified = shapely.simplify(
+                geometry, tolerance, preserve_topology=True
+            )
+            # Points inside the inner or outside the outer buffer are at least the tolerance away from the boundary
+            # of the simplified geometry, so the exact geometry agrees with it. The buffers are twice as wide as
+            # needed, a margin for the polygonal approximation of their round corners.
+            self._inner = shapely.buffer(self.simplified, -2 * tolerance)
+            self._outer = shapely.buffer(self.simplified, 2 * tolerance)
+            shapely.prepare(self._inner)
+            shapely.prepare(self._outer)
+
+    @classmethod
+    def from_frame(
+        cls, danger_zone: gpd.GeoDataFrame, tolerance: float | None = None
+    ) -> "DangerZoneGeometry":
+        """
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+        :param tolerance: The simplification tolerance in the units of its CRS, no simplification if None.
+        :return: The geometry of the danger zone.
+        """
+        return cls(shapely.union_all(danger_zone.geometry.values), tolerance)
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """
+        The bounds of the danger zone as (min x, min y, max x, max y).
+        """
+        min_x, min_y, max_x, max_y = self.exact.bounds
+        return min_x, min_y, max_x, max_y
+
+    def intersects_xy(
+        self, x: NDArray[np.float64], y: NDArray[np.float64]
+    ) -> NDArray[np.bool_]:
+        """
+        Returns whether every point lies in the danger zone, counting points on the boundary as inside, matching
+        GeoDataFrame.intersects.
+
+        :param x: The x coordinate of every point.
+        :param y: The y coordinate of every point, aligned with x.
+        :return: Whether every point lies in the danger zone.
+        """
+        if self.simplified is None:
+            exact: NDArray[np.bool_] = shapely.intersects_xy(self.exact, x, y)
+            return exact
+        inside: NDArray[np.bool_] = shapely.intersects_xy(self._inner, x, y)
+        near = ~inside & shapely.intersects_xy(self._outer, x, y)
+        inside[near] = shapely.intersects_xy(self.exact, x[near], y[near])
+        return inside
+
+
+def as_danger_zone_geometry(
+    danger_zone: gpd.GeoDataFrame | DangerZoneGeometry,
+) -> DangerZoneGeometry:
+    """
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s), or their geometry, e.g. the geometry
+        of a Scenario.
+    :return: The geometry of the danger zone, prepared without simplification if a GeoDataFrame is given.
+    """
+    if isinstance(danger_zone, DangerZoneGeometry):
+        return danger_zone
+    return DangerZoneGeometry.from_frame(danger_zone)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    The danger zone of a run, parsed from its GeoJSON once into every form the loading, routing and analysis
+    stages need.
+    """
+
+    danger_zone: gpd.GeoDataFrame
+    """The danger zone polygon(s)."""
+    geometry: DangerZoneGeometry
+    """The union of the danger zone polygons, prepared for point membership tests."""
+    osm_polygon: Polygon
+    """The polygon the road network is loaded for, the polygon of the first feature."""
+
+    @property
+    def bounds(self) -> tuple[float, float, float, float]:
+        """
+        The bounds of the danger zone as (min x, min y, max x, max y).
+        """
+        return self.geometry.bounds
+
+    @classmethod
+    def from_geojson_str(
+        cls,
+        geo_json: str,
+        crs: str = "EPSG:4326",
+        simplify_tolerance_m: float | None = None,
+    ) -> "Scenario":
+        """
+        Parses a danger zone GeoJSON string.
+
+        :param geo_json: GeoJSON string
+        :param crs: Geographic Coordinate Reference System
+        :param simplify_tolerance_m: The tolerance in meters of the simplified geometry used for membership tests,
+            no simplification if None.
+        :return: The scenario of the danger zone.
+        """
+        data = json.loads(geo_json)
+        polygons = [shape(feature["geometry"]) for feature in data["features"]]
+        tolerance = None
+        if simplify_tolerance_m is not None:
+            # A degree of longitude is never longer than a degree of latitude, so this never exceeds the tolerance
+            tolerance = simplify_tolerance_m / METERS_PER_DEGREE
+        return cls(
+            danger_zone=gpd.GeoDataFrame(geometry=polygons, crs=crs),
+            geometry=DangerZoneGeometry(shapely.union_all(polygons), tolerance),
+            osm_polygon=geojson_as_polygon(data),
+        )
+
+
 def set_danger_zone_crs(danger_zone: gpd.GeoDataFrame, crs: str) -> gpd.GeoDataFrame:
     if danger_zone.crs is None:
         danger_zone.set_crs(crs, inplace=True)
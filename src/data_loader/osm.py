@@ -1,26 +1,66 @@
+import hashlib
 import json
 import logging
+import pickle
+import shutil
+from collections import Counter
+from pathlib import Path
 
 import networkx as nx
 import osmnx as ox
+import shapely
 from shapely.geometry import shape
 from shapely.geometry.polygon import Polygon
 
 from data_loader import DATA_DIR
+from utils import DANISH_DEFAULT_SPEED_LIMIT, kmh_to_ms, parse_min_int
 
 OSM_DIR = DATA_DIR / "osm_graph"
+OSM_CACHE_DIR = OSM_DIR / "cache"
+"""Directory of the graph cache, see OsmGraphCache."""
+NETWORK_TYPE = "drive_service"
+"""OSMnx network type of the downloaded road networks."""
+DOWNLOAD_BUFFER_M = 500
+"""Buffer in meters around a polygon that graph_from_polygon downloads and simplifies the road network in."""
+POLYGON_GRID_SIZE = 1e-7
+"""Grid size in degrees, about a centimeter, that polygons are snapped to before they are hashed."""
+SPEED_KMH = "speed_kmh"
+"""Edge attribute holding the speed limit in km/h, parsed from maxspeed."""
+TRAVEL_TIME = "travel_time_s"
+"""Edge attribute holding the time in seconds it takes to traverse the edge at its speed limit."""
 
 
-def download_osm_graph_from_polygon(geo_json: str) -> nx.MultiDiGraph:
+def download_osm_graph_from_polygon(
+    geo_json: str, cache: "OsmGraphCache | None" = None
+) -> nx.MultiDiGraph:
     """
     Loads a GeoJSON string containing a single polygon with exactly 5 coordinates
-    and extracts its bounding box.
+    and extracts its bounding box. The graph is only downloaded if it is not in the graph cache.
 
     :param geo_json: GeoJSON string.
+    :param cache: The graph cache, by default the one in the OSM data directory.
     :return: OSM graph containing the road network in the bounding box.
     """
     polygon = geojson_str_to_polygon(geo_json)
-    return download_osm_graph(polygon)
+    return load_osm_graph(polygon, cache=cache)
+
+
+def load_osm_graph(
+    polygon: Polygon, simplify: bool = True, cache: "OsmGraphCache | None" = None
+) -> nx.MultiDiGraph:
+    """
+    Loads the OSM graph within the given polygon from the graph cache, downloading and caching it if it is missing.
+    :param polygon: Polygon representing the area of interest.
+    :param simplify: Whether to simplify the graph.
+    :param cache: The graph cache, by default the one in the OSM data directory.
+    :return: OSM graph containing the road network in the polygon.
+    """
+    cache = cache or OsmGraphCache()
+    graph = cache.get(polygon, simplify=simplify)
+    if graph is None:
+        graph = download_osm_graph(polygon, simplify)
+        cache.put(polygon, graph, simplify=simplify)
+    return graph
 
 
 def download_osm_graph(polygon: Polygon, simplify: bool = True) -> nx.MultiDiGraph:
@@ -33,7 +73,7 @@ def download_osm_graph(polygon: Polygon, simplify: bool = True) -> nx.MultiDiGra
     logging.info(f"Downloading OSM graph with bounding polygon: {polygon.bounds}")
     graph = ox.graph_from_polygon(
         polygon=polygon,
-        network_type="drive_service",
+        network_type=NETWORK_TYPE,
         simplify=simplify,
         truncate_by_edge=True,
     )
@@ -43,6 +83,44 @@ def download_osm_graph(polygon: Polygon, simplify: bool = True) -> nx.MultiDiGra
     return graph
 
 
+def add_edge_travel_times(graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+    """
+    Annotate every edge of an OSM graph with its parsed speed limit and travel time, so that neither routing
+    nor the MATSim network writer has to parse maxspeed again.
+    The minimum speed limit is used for edges with several, and edges with a missing or invalid speed limit
+    get the Danish default speed limit.
+    :param graph: OSM graph to annotate in place.
+    :return: The annotated OSM graph.
+    """
+    invalid_speeds: Counter[str] = Counter()
+    for _, _, data in graph.edges(data=True):
+        speed = _parse_speed_limit(data.get("maxspeed"))
+        if speed is None:
+            if data.get("maxspeed") is not None:
+                invalid_speeds[str(data["maxspeed"])] += 1
+            speed = DANISH_DEFAULT_SPEED_LIMIT
+        data[SPEED_KMH] = speed
+        data[TRAVEL_TIME] = data.get("length", float("inf")) / kmh_to_ms(speed)
+
+    if invalid_speeds:
+        logging.warning(
+            f"{invalid_speeds.total()} edges have a maxspeed that cannot be parsed, "
+            f"using {DANISH_DEFAULT_SPEED_LIMIT} km/h instead. "
+            f"Most common values: {dict(invalid_speeds.most_common(5))}"
+        )
+    return graph
+
+
+def _parse_speed_limit(maxspeed: list[str] | str | None) -> int | None:
+    if maxspeed is None:
+        return None
+    try:
+        speed = parse_min_int(maxspeed)
+    except ValueError:
+        return None
+    return speed if speed > 0 else None
+
+
 def save_osm(graph: nx.MultiDiGraph, filename: str) -> None:
     """
     Save an OSM graph to a file in the OSM data directory.
@@ -68,6 +146,182 @@ def load_osm(filename: str) -> nx.MultiDiGraph:
     return graph
 
 
+class OsmGraphCache:
+    """
+    A cache of downloaded OSM graphs on disk, pickled since that loads far faster than GraphML. Graphs are keyed by
+    a hash of their polygon and download options, so the same area is never downloaded twice. A polygon whose
+    download buffer lies inside the polygon of a cached graph is cut out of that graph instead of being downloaded.
+
+    Next to every graph the cache can keep its routing graph in the columnar format of routes.compact_graph, see
+    compact_graph_dir.
+    """
+
+    def __init__(self, cache_dir: Path = OSM_CACHE_DIR) -> None:
+        """
+        :param cache_dir: The directory the graphs and their index are kept in.
+        """
+        self.cache_dir = cache_dir
+        self.index_file = cache_dir / "index.json"
+
+    def get(
+        self,
+        polygon: Polygon,
+        network_type: str = NETWORK_TYPE,
+        simplify: bool = True,
+        truncate_by_edge: bool = True,
+    ) -> nx.MultiDiGraph | None:
+        """
+        Returns the cached graph of a polygon, or None if neither it nor a polygon containing it is cached.
+
+        :param polygon: Polygon representing the area of interest.
+        :param network_type: OSMnx network type of the graph.
+        :param simplify: Whether the graph is simplified.
+        :param truncate_by_edge: Whether the graph keeps nodes outside the polygon with an edge to a node inside it.
+        :return: OSM graph containing the road network in the polygon.
+        """
+        key = graph_cache_key(polygon, network_type, simplify, truncate_by_edge)
+        index = self._load_index()
+        if key in index:
+            logging.info(f"Loading cached OSM graph {key[:16]}")
+            return self._load_graph(key)
+
+        candidates = [
+            (shapely.from_wkt(entry["polygon"]), entry_key)
+            for entry_key, entry in index.items()
+            if entry["network_type"] == network_type
+            and entry["simplify"] == simplify
+            and entry["truncate_by_edge"] == truncate_by_edge
+        ]
+        # graph_from_polygon simplifies the road network in a buffer around the polygon before cutting it out, so
+        # a cached graph only gives the same graph if it holds that buffer as well
+        download_area = buffered_polygon(polygon)
+        covering = [
+            (area, entry_key)
+            for area, entry_key in candidates
+            if area.covers(download_area)
+        ]
+        if not covering:
+            return None
+
+        # The smallest covering graph is the fastest to load and cut
+        _, larger_key = min(covering, key=lambda entry: entry[0].area)
+        logging.info(f"Cutting OSM graph out of cached graph {larger_key[:16]}")
+        graph = ox.truncate.truncate_graph_polygon(
+            self._load_graph(larger_key), polygon, truncate_by_edge=truncate_by_edge
+        )
+        # graph_from_polygon keeps only the largest weakly connected component as well
+        graph = ox.truncate.largest_component(graph)
+        self.put(polygon, graph, network_type, simplify, truncate_by_edge)
+        return graph
+
+    def put(
+        self,
+        polygon: Polygon,
+        graph: nx.MultiDiGraph,
+        network_type: str = NETWORK_TYPE,
+        simplify: bool = True,
+        truncate_by_edge: bool = True,
+    ) -> None:
+        """
+        Caches the graph of a polygon.
+
+        :param polygon: Polygon the graph covers.
+        :param graph: OSM graph to cache.
+        :param network_type: OSMnx network type of the graph.
+        :param simplify: Whether the graph is simplified.
+        :param truncate_by_edge: Whether the graph keeps nodes outside the polygon with an edge to a node inside it.
+        """
+        key = graph_cache_key(polygon, network_type, simplify, truncate_by_edge)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # A routing graph left from an earlier graph of the polygon would not match the new graph
+        shutil.rmtree(self.cache_dir / f"{key}.compact", ignore_errors=True)
+        with open(self.cache_dir / f"{key}.pkl", "wb") as f:
+            pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        index = self._load_index()
+        index[key] = {
+            "polygon": shapely.to_wkt(polygon),
+            "network_type": network_type,
+            "simplify": simplify,
+            "truncate_by_edge": truncate_by_edge,
+        }
+        with open(self.index_file, "w") as f:
+            json.dump(index, f, indent=2)
+        logging.info(f"Cached OSM graph {key[:16]}")
+
+    def compact_graph_dir(
+        self,
+        polygon: Polygon,
+        network_type: str = NETWORK_TYPE,
+        simplify: bool = True,
+        truncate_by_edge: bool = True,
+    ) -> Path:
+        """
+        Returns the directory the routing graph of the cached graph of a polygon is kept in. The directory is emptied
+        whenever the graph of the polygon is cached again.
+
+        :param polygon: Polygon the graph covers.
+        :param network_type: OSMnx network type of the graph.
+        :param simplify: Whether the graph is simplified.
+        :param truncate_by_edge: Whether the graph keeps nodes outside the polygon with an edge to a node inside it.
+        :return: The directory, which may not exist.
+        """
+        key = graph_cache_key(polygon, network_type, simplify, truncate_by_edge)
+        return self.cache_dir / f"{key}.compact"
+
+    def _load_index(self) -> dict[str, dict]:  # type: ignore[type-arg]
+        if not self.index_file.exists():
+            return {}
+        with open(self.index_file, "r") as f:
+            return json.load(f)  # type: ignore[no-any-return]
+
+    def _load_graph(self, key: str) -> nx.MultiDiGraph:
+        with open(self.cache_dir / f"{key}.pkl", "rb") as f:
+            graph: nx.MultiDiGraph = pickle.load(f)
+        return graph
+
+
+def buffered_polygon(polygon: Polygon, buffer_m: float = DOWNLOAD_BUFFER_M) -> Polygon:
+    """
+    Returns a polygon buffered by a distance in meters, the way graph_from_polygon buffers it.
+
+    :param polygon: Polygon in longitude and latitude.
+    :param buffer_m: The buffer in meters.
+    :return: The buffered polygon in longitude and latitude.
+    """
+    projected, crs = ox.projection.project_geometry(polygon)
+    buffered, _ = ox.projection.project_geometry(
+        projected.buffer(buffer_m), crs=crs, to_latlong=True
+    )
+    return buffered
+
+
+def graph_cache_key(
+    polygon: Polygon, network_type: str, simplify: bool, truncate_by_edge: bool
+) -> str:
+    """
+    Returns the key of a graph in the graph cache, a hash of its polygon and download options. The polygon is
+    normalised first, so the same area gives the same key regardless of where its ring starts or its orientation.
+
+    :param polygon: Polygon the graph covers.
+    :param network_type: OSMnx network type of the graph.
+    :param simplify: Whether the graph is simplified.
+    :param truncate_by_edge: Whether the graph keeps nodes outside the polygon with an edge to a node inside it.
+    :return: The hexadecimal key.
+    """
+    normalised = shapely.normalize(shapely.set_precision(polygon, POLYGON_GRID_SIZE))
+    content = json.dumps(
+        {
+            "polygon": shapely.to_wkb(normalised, hex=True),
+            "network_type": network_type,
+            "simplify": simplify,
+            "truncate_by_edge": truncate_by_edge,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 def geojson_str_to_polygon(geo_json: str) -> Polygon:
     """
     Loads a GeoJSON string containing a single polygon with exactly 5 coordinates
@@ -76,10 +330,16 @@ def geojson_str_to_polygon(geo_json: str) -> Polygon:
     :param geo_json: GeoJSON string.
     :return: Polygon containing the bounding box.
     """
-    return _geojson_as_polygon(json.loads(geo_json))
+    return geojson_as_polygon(json.loads(geo_json))
 
 
-def _geojson_as_polygon(data: dict) -> Polygon:  # type: ignore[type-arg]
+def geojson_as_polygon(data: dict) -> Polygon:  # type: ignore[type-arg]
+    """
+    Extracts the polygon of the first feature of parsed GeoJSON.
+
+    :param data: The parsed GeoJSON.
+    :return: The polygon of the first feature.
+    """
     polygon = shape(data["features"][0]["geometry"])
     if not isinstance(polygon, Polygon):
         raise ValueError("Bounding box must be a single Polygon.")
@@ -2,8 +2,9 @@ import logging
 
 import geopandas as gpd
 import networkx as nx
-from shapely.geometry import Point
+import numpy as np
 
+from data_loader.danger_zones import DangerZoneGeometry, as_danger_zone_geometry
 from data_loader.population.population_utils import (
     GEOMETRY,
     NODE_ID,
@@ -11,15 +12,17 @@ from data_loader.population.population_utils import (
     POPULATION_DIR,
     save_tiff_population_to_geojson,
 )
+from routes.route_utils import vertex
 
 
 def get_origin_points(
-    population_df: gpd.GeoDataFrame, dangerzone: gpd.GeoDataFrame
-) -> list[str]:
+    population_df: gpd.GeoDataFrame,
+    dangerzone: gpd.GeoDataFrame | DangerZoneGeometry,
+) -> list[vertex]:
     """
     Returns the origin points for the shortest path algorithm.
     :param population_df: A GeoDataFrame containing the population data.
-    :param dangerzone: A GeoDataFrame containing the danger zone polygon(s).
+    :param dangerzone: A GeoDataFrame containing the danger zone polygon(s), or their geometry.
     :return: A list of origin points in the dangerzone
     """
     # Get the origin points from the population data
@@ -27,8 +30,9 @@ def get_origin_points(
         danger_zone=dangerzone, population=population_df
     )
 
-    # Convert the origin points to a list of strings
-    return list(origin_points["id"])
+    # Convert the NumPy node IDs to Python ints, which are hashed and compared faster in the routers' dictionaries
+    origin_ids: list[vertex] = origin_points[NODE_ID].tolist()
+    return origin_ids
 
 
 def population_data_from_geojson(file_name: str) -> gpd.GeoDataFrame:
@@ -47,14 +51,18 @@ def population_data_from_geojson(file_name: str) -> gpd.GeoDataFrame:
 
 
 def distribute_population(
-    danger_zone: gpd.GeoDataFrame, population: gpd.GeoDataFrame
+    danger_zone: gpd.GeoDataFrame | DangerZoneGeometry, population: gpd.GeoDataFrame
 ) -> gpd.GeoDataFrame:
     """
     Returns the nodes in the danger zone and the number of people at each node.
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s), or their geometry.
+    :param population: A GeoDataFrame containing the population of every node as a point.
     :return: A geopandas dataframe with id corresponding to OSM IDS and population, within the dangerzone.
     """
-    # List to store nodes in the danger zone and their population
-    return gpd.sjoin(population, danger_zone, how="inner", predicate="intersects")
+    inside = as_danger_zone_geometry(danger_zone).intersects_xy(
+        population.geometry.x.to_numpy(), population.geometry.y.to_numpy()
+    )
+    return population[inside]
 
 
 def population_data_from_tiff(
@@ -77,23 +85,22 @@ def population_data_from_tiff(
 
 
 def population_data_from_number(
-    danger_zone: gpd.GeoDataFrame, population_number: int, G: nx.MultiDiGraph
+    danger_zone: gpd.GeoDataFrame | DangerZoneGeometry,
+    population_number: int,
+    G: nx.MultiDiGraph,
 ) -> gpd.GeoDataFrame:
     """
     Creates a dataframe with the population number divided by the number of nodes, where each node has a evenly distributed population.
-    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s), or their geometry.
     :param population_number: The population number.
     :return: A geopandas dataframe with id corresponding to OSM IDS and population, within the dangerzone.
     """
-    nodes = [
-        node
-        for node, data in G.nodes(data=True)
-        if any(
-            polygon.intersects(Point(data["x"], data["y"]))
-            for polygon in danger_zone.geometry
-        )
-    ]
-    num_nodes = len(nodes)
+    num_graph_nodes = G.number_of_nodes()
+    all_nodes = np.array(list(G.nodes))
+    x = np.fromiter((x for _, x in G.nodes(data="x")), np.float64, num_graph_nodes)
+    y = np.fromiter((y for _, y in G.nodes(data="y")), np.float64, num_graph_nodes)
+    inside = as_danger_zone_geometry(danger_zone).intersects_xy(x, y)
+    num_nodes = int(np.count_nonzero(inside))
     if num_nodes == 0:
         raise ValueError("No nodes found within the danger zone.")
 
@@ -104,20 +111,19 @@ def population_data_from_number(
 
     missing = int(population_number - (population_per_node * num_nodes))
 
-    result = gpd.GeoDataFrame(
+    population = np.full(num_nodes, population_per_node)
+    # The people left over after the even split go to the first nodes, one each
+    population[: max(missing, 0)] += 1
+
+    kept = population > 0
+    return gpd.GeoDataFrame(
         {
-            NODE_ID: nodes,
-            POPULATION: [population_per_node] * num_nodes,
-            GEOMETRY: [Point(G.nodes[node]["x"], G.nodes[node]["y"]) for node in nodes],
+            NODE_ID: all_nodes[inside][kept],
+            POPULATION: population[kept],
+            GEOMETRY: gpd.points_from_xy(x[inside][kept], y[inside][kept]),
         },
         geometry=GEOMETRY,
     )
-    if missing > 0:
-        for i in range(missing):
-            result.at[i, POPULATION] += 1
-
-    result = result[result[POPULATION] > 0].reset_index(drop=True)
-    return result
 
 
 def get_total_population(
@@ -2,6 +2,7 @@ import argparse
 import logging
 import signal
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -11,6 +12,11 @@ from analysis.analysis import write_analysis_data_simwrapper
 from config import (
     CASE_STUDIES_OUTPUT_FOLDER,
     EXPLORE_OUTPUT_FOLDER,
+    MATSIM_CPUS_PER_SIMULATION,
+    MATSIM_DEFAULT_HEAP_SIMULATIONS,
+    MATSIM_MEMORY_PER_SIMULATION_MB,
+    OPTIONAL_ROUTE_ALGOS,
+    SEARCHES,
     SIM_WRAPPER_LINK,
     ProgramConfig,
     set_amager_input_data,
@@ -39,7 +45,9 @@ from matsim_io.dashboards import (
     create_comparison_dashboard,
     remove_unclassified_from_trip_stats_by_road_type_and_hour_csv,
 )
-from routes.route import create_route_objects
+from routes.compact_graph import as_compact_graph
+from routes.heuristics import Search
+from routes.route import Route, create_route_objects, get_vehicle_demand
 from routes.route_algo import RouteAlgo
 
 logging.basicConfig(
@@ -50,21 +58,33 @@ logging.basicConfig(
 
 
 def compute_and_save_matsim_paths(
-    program_config: ProgramConfig, algorithm: RouteAlgo
-) -> dict[str, int]:
+    program_config: ProgramConfig,
+    algorithm: RouteAlgo,
+    input_dir: Path | None = None,
+) -> tuple[dict[str, int], list[Route]]:
     """
     Compute the paths out of the danger zone to safety using the given algorithm and
         save the graph and paths to MATSim input files.
     :param program_config: The program configuration, including the graph, origin points, and danger zones.
     :param algorithm: The algorithm to use for routing.
+    :param input_dir: Directory to save the MATSim input files in. Defaults to the MATSim data directory.
     :return: A dictionary of statistics about the routes, including the number of routes and the number of
-        nodes with no route to safety.
+        nodes with no route to safety, and the routes.
     """
+    graph = as_compact_graph(program_config.compact_graph or program_config.G)
     origin_to_paths = algorithm.route_to_safety(
         program_config.origin_points,
         program_config.danger_zones,
-        program_config.G,
+        graph,
         diversifying_routes=program_config.diversifying_routes,
+        workers=program_config.routing_workers,
+        safe_exits=program_config.safe_exits,
+        demand=get_vehicle_demand(
+            program_config.danger_zone_population_data,
+            program_config.cars_per_person,
+            program_config.departure_end_time_sec,
+        ),
+        departure_window=(0, program_config.departure_end_time_sec),
     )
     routes = create_route_objects(
         origin_to_paths=origin_to_paths,
@@ -72,6 +92,7 @@ def compute_and_save_matsim_paths(
         start=0,
         end=program_config.departure_end_time_sec,
         cars_per_person=program_config.cars_per_person,
+        ordered_by_departure=getattr(algorithm, "routes_ordered_by_departure", False),
     )
 
     logging.info("Routes done")
@@ -81,16 +102,17 @@ def compute_and_save_matsim_paths(
         - len(origin_to_paths.keys()),
     }
 
-    write_network(program_config.G)
-    write_plans(routes)
+    link_ids = write_network(graph, output_dir=input_dir)
+    write_plans(routes, link_ids, output_dir=input_dir)
 
-    return stats
+    return stats, routes
 
 
 def save_analysis_files(
     program_config: ProgramConfig,
     stats: dict[str, int],
     output_dir_name: str = "output",
+    routes: Optional[list[Route]] = None,
 ) -> None:
     """
     Save the analysis files to the MATSIM_DATA_DIR.
@@ -99,6 +121,7 @@ def save_analysis_files(
         program_conf=program_config,
         stats=stats,
         output_dir=MATSIM_DATA_DIR / output_dir_name / "analysis",
+        routes=routes,
     )
 
 
@@ -122,52 +145,131 @@ def run_simwrapper_serve(
     logging.info("SimWrapper server done")
 
 
-def start_up(input_data: InputData, run_simulator: bool) -> None:
+def start_up(
+    input_data: InputData,
+    run_simulator: bool,
+    optional_route_algos: list[str] | None = None,
+    search: Search = "dijkstra",
+) -> None:
     """
     Start up the program.
+    :param input_data: The input data of the run.
+    :param run_simulator: Whether to route and simulate, or only serve the existing results.
+    :param optional_route_algos: Names of algorithms in OPTIONAL_ROUTE_ALGOS to simulate as well.
+    :param search: How the fastest and shortest path routers search for routes, one of SEARCHES.
     """
     if run_simulator:
         logging.info("Starting up...")
-        program_config = controller_input_data(input_data)
+        program_config = controller_input_data(input_data, optional_route_algos, search)
         logging.info("Input data loaded")
 
-        results = [
-            SimulationResult(
-                run_simulation(program_config, algorithm),
-                algorithm.title,
-            )
-            for algorithm in program_config.route_algos
-        ]
+        results = run_simulations(program_config)
         create_comparison_dashboard(results)
 
     run_simwrapper_serve(input_data.simulation_type)
 
 
-def run_simulation(conf: ProgramConfig, algorithm: RouteAlgo) -> str:
+def concurrent_simulations(conf: ProgramConfig) -> int:
+    """
+    Determine how many simulations can run at the same time within the CPU and memory budget.
+    :param conf: The program configuration, including the algorithms and the budget.
+    :return: The number of simulations to run concurrently, at least 1.
+    """
+    by_cpu = conf.simulation_cpu_budget // MATSIM_CPUS_PER_SIMULATION
+    by_memory = MATSIM_DEFAULT_HEAP_SIMULATIONS
+    if conf.simulation_memory_budget_mb is not None:
+        by_memory = conf.simulation_memory_budget_mb // MATSIM_MEMORY_PER_SIMULATION_MB
+    concurrency: int = max(1, min(len(conf.route_algos), by_cpu, by_memory))
+    return concurrency
+
+
+def run_simulations(conf: ProgramConfig) -> list[SimulationResult]:
     """
-    Run the simulation with the given configuration and algorithm.
+    Run a simulation for every configured algorithm, running as many at the same time as the budget allows.
+    Every simulation works in its own input and output directories, and the dashboards are copied in the
+    order of the algorithms once all simulations are done.
+    :param conf: The program configuration, including the graph, origin points, and danger zones.
+    :return: The results of the simulations, in the order of the algorithms.
+    """
+    # Routing forks worker processes, and a process forked while other threads run can deadlock on a lock
+    # one of them holds, e.g. of logging, so every algorithm is routed before the simulation threads start
+    routed = [route_simulation(conf, algorithm) for algorithm in conf.route_algos]
+
+    concurrency = concurrent_simulations(conf)
+    logging.info(
+        f"Running {len(conf.route_algos)} simulations, {concurrency} at a time"
+    )
+    # The JVM default heap is kept unless a memory budget is configured
+    memory_mb = None
+    if conf.simulation_memory_budget_mb is not None:
+        memory_mb = conf.simulation_memory_budget_mb // concurrency
+
+    # Threads are sufficient, as MATSim runs in a subprocess
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        output_dirs = list(
+            executor.map(
+                lambda algorithm, routing: run_simulation(
+                    conf, algorithm, routing[0], routing[1], memory_mb
+                ),
+                conf.route_algos,
+                routed,
+            )
+        )
+
+    results = []
+    for algorithm, output_dir in zip(conf.route_algos, output_dirs):
+        copy_dashboard(output_dir, algorithm.title)
+        results.append(SimulationResult(output_dir, algorithm.title))
+    return results
+
+
+def route_simulation(
+    conf: ProgramConfig, algorithm: RouteAlgo
+) -> tuple[dict[str, int], list[Route]]:
+    """
+    Compute the paths to safety with the given algorithm and save them to the MATSim input directory of its
+    simulation.
     :param conf: The program configuration, including the graph, origin points, and danger zones.
     :param algorithm: The algorithm to use for routing.
+    :return: The statistics about the routes and the routes, see compute_and_save_matsim_paths.
+    """
+    logging.info(f"Computing paths to safety with algorithm: {algorithm.title}")
+    input_dir = slugify(f"{algorithm.title}-input")
+    return compute_and_save_matsim_paths(conf, algorithm, MATSIM_DATA_DIR / input_dir)
+
+
+def run_simulation(
+    conf: ProgramConfig,
+    algorithm: RouteAlgo,
+    stats: dict[str, int],
+    routes: list[Route],
+    memory_mb: int | None = None,
+) -> str:
+    """
+    Run the simulation of the routes of the given algorithm, saved by route_simulation.
+    The dashboard is not copied to the MATSim data directory, see copy_dashboard.
+    :param conf: The program configuration, including the graph, origin points, and danger zones.
+    :param algorithm: The algorithm the routes were computed with.
+    :param stats: The statistics about the routes.
+    :param routes: The routes given to MATSim.
+    :param memory_mb: The maximum heap size of MATSim in megabytes. If None, the JVM default is used.
     :return: The name of the output directory where the simulation results are saved.
     """
     logging.info(f"Starting simulation with algorithm: {algorithm.title}")
+    input_dir = slugify(f"{algorithm.title}-input")
     output_dir = slugify(f"{algorithm.title}-output")
 
-    logging.info("Computing paths to safety...")
-    stats = compute_and_save_matsim_paths(conf, algorithm)
-
     logging.info("Simulating path towards safety in MATSim...")
-    run_matsim(output_dir)
+    run_matsim(output_dir, input_dir, memory_mb)
 
     logging.info("Creating SimWrapper dashboard...")
-    save_analysis_files(conf, stats, output_dir)
+    save_analysis_files(conf, stats, output_dir, routes)
     append_breakpoints_to_congestion_map(output_dir)
     change_population_visuals_map(
         output_dir, conf.danger_zone_population_data, conf.population_type
     )
     change_departure_arrivals_bar_graph(output_dir)
     remove_unclassified_from_trip_stats_by_road_type_and_hour_csv(output_dir)
-    copy_dashboard(output_dir, algorithm.title)
 
     return str(output_dir)
 
@@ -187,18 +289,20 @@ def main(args: argparse.Namespace) -> None:
         input_data = gui_handler()
         return
     elif args.dev:
-        start_up(set_dev_input_data(), True)
+        start_up(set_dev_input_data(), True, args.route_algo, args.search)
     elif args.small:
-        start_up(set_small_data_input_data(), True)
+        start_up(set_small_data_input_data(), True, args.route_algo, args.search)
     elif args.amager:
-        start_up(set_amager_input_data(), True)
+        start_up(set_amager_input_data(), True, args.route_algo, args.search)
     elif args.ravenna:
-        start_up(set_ravenna_input_data(), True)
+        start_up(set_ravenna_input_data(), True, args.route_algo, args.search)
     else:  ## normal program, no flag set
         input_data = gui_handler()
         start_up(
             input_data,
             run_simulator=input_data.simulation_type == SimulationType.EXPLORE,
+            optional_route_algos=args.route_algo,
+            search=args.search,
         )
 
 
@@ -225,6 +329,18 @@ if __name__ == "__main__":
         action="store_true",
         help="Run Matsim only (precomputed routes on Copenhagen)",
     )
+    parser.add_argument(
+        "-route-algo",
+        action="append",
+        choices=OPTIONAL_ROUTE_ALGOS,
+        help="Simulate an optional routing algorithm as well, can be given several times",
+    )
+    parser.add_argument(
+        "-search",
+        default="dijkstra",
+        choices=SEARCHES,
+        help="How the fastest and shortest path routers search for routes to safety",
+    )
     args = parser.parse_args()
     signal.signal(signal.SIGTSTP, gui_close)
     main(args)
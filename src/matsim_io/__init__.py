@@ -1,18 +1,20 @@
 import gzip
 import logging
 import os
+from pathlib import Path
 
 import networkx as nx
 from matsim.writers import Id
 
 from data_loader import DATA_DIR
 from matsim_io.writers import NetworkWriter, PlansWriter
+from routes.compact_graph import MISSING, CompactRoadGraph, as_compact_graph
 from routes.route import Route
 
 MATSIM_DATA_DIR = DATA_DIR / "matsim"
 """Directory where MATSim network and plan files are saved."""
-LINK_IDS: dict[str, int] = {}
-"""Dictionary mapping OSM link IDs to MATSim link IDs."""
+LinkIds = dict[tuple[Id, Id], int]
+"""Dictionary mapping the OSM node IDs at both ends of a link to MATSim link IDs."""
 
 
 def mat_sim_files_exist(plans_file: str, networks_file: str) -> bool:
@@ -22,70 +24,83 @@ def mat_sim_files_exist(plans_file: str, networks_file: str) -> bool:
 
 
 def write_network(
-    graph: nx.MultiDiGraph,
+    graph: nx.MultiDiGraph | CompactRoadGraph,
     network_name: str | None = None,
     network_filename: str = "network.xml",
     gzip_compress: bool = True,
-) -> None:
+    output_dir: Path | None = None,
+) -> LinkIds:
     """
     Write a network to a MATSim network file.
-    :param graph: NetworkX graph representing the network.
+    :param graph: NetworkX graph, or its compact form, representing the network.
     :param network_name: Name of the network.
     :param network_filename: Name of the output file.
     :param gzip_compress: Whether to save the file as a .gz compressed file.
+    :param output_dir: Directory to save the file in. Defaults to the MATSim data directory.
+    :return: The MATSim link IDs of the network, needed to write plans on it.
     """
     network_filename = _validate_and_format_filename(network_filename, gzip_compress)
     logging.info(f"Writing MATSim network to {network_filename}")
+    compact_graph = as_compact_graph(graph)
 
+    link_ids: LinkIds = {}
+    network_path = _output_path(network_filename, output_dir)
     open_func = gzip.open if gzip_compress else open
-    with open_func(MATSIM_DATA_DIR / network_filename, "wb+") as f_write:
+    with open_func(network_path, "wb+") as f_write:
         writer = NetworkWriter(f_write)
         writer.start_network(network_name)
 
         writer.start_nodes()
-        for node_id, node_data in graph.nodes(data=True):
-            writer.add_node(node_id, node_data["x"], node_data["y"])
+        for node_id, x, y in zip(compact_graph.nodes, compact_graph.x, compact_graph.y):
+            writer.add_node(node_id, x, y)
         writer.end_nodes()
 
         def _add_link(v: Id, w: Id, link_id: int) -> None:
-            _add_link_id(v, w, link_id)
+            link_ids[_link_key(v, w)] = link_id
             writer.add_link(
                 link_id,
                 from_node=v,
                 to_node=w,
-                length=link_data["length"],
-                speed_limit=_try_parse_min_int(link_data, "maxspeed"),
-                perm_lanes=_try_parse_min_int(link_data, "lanes"),
+                length=float(compact_graph.length[edge]),
+                speed_limit=int(compact_graph.speed_limit[edge]),
+                perm_lanes=_optional_int(compact_graph.lanes[edge]),
             )
 
         writer.start_links()
-        for link_id, (from_node, to_node, link_data) in enumerate(
-            graph.edges(data=True)
+        for edge, (from_index, to_index) in enumerate(
+            zip(compact_graph.sources(), compact_graph.targets)
         ):
-            _add_link(from_node, to_node, link_id * 2)
-            if not link_data["oneway"]:
-                _add_link(to_node, from_node, link_id * 2 + 1)
+            from_node = compact_graph.nodes[from_index]
+            to_node = compact_graph.nodes[to_index]
+            _add_link(from_node, to_node, edge * 2)
+            if not compact_graph.oneway[edge]:
+                _add_link(to_node, from_node, edge * 2 + 1)
         writer.end_links()
 
         writer.end_network()
 
     logging.info(f"Finished writing MATSim network to {network_filename}")
+    return link_ids
 
 
 def write_plans(
     routes: list[Route],
+    link_ids: LinkIds,
     plan_filename: str = "plans.xml",
     gzip_compress: bool = True,
     mat_sim_routing: bool = False,
+    output_dir: Path | None = None,
 ) -> None:
     """
     Write a MATSim plan file based on a given network and routes.
     :param routes: List of routes to turn into MATSim plans.
+    :param link_ids: The link IDs of the network the routes run on, returned by write_network.
     :param plan_filename: Name of the output file.
     :param gzip_compress: Whether to save the file as a .gz compressed file.
     :param mat_sim_routing: Whether to use MATSim routing or not.
+    :param output_dir: Directory to save the file in. Defaults to the MATSim data directory.
     """
-    if not LINK_IDS:
+    if not link_ids:
         raise ValueError("No link IDs found. Please write the network first.")
     if not routes:
         logging.warning("No routes given. Writing empty MATSim plan file.")
@@ -93,24 +108,29 @@ def write_plans(
     plan_filename = _validate_and_format_filename(plan_filename, gzip_compress)
     logging.info(f"Writing MATSim plans to {plan_filename}")
 
+    plan_path = _output_path(plan_filename, output_dir)
     open_func = gzip.open if gzip_compress else open
-    with open_func(MATSIM_DATA_DIR / plan_filename, "wb+") as f_write:
+    with open_func(plan_path, "wb+") as f_write:
         writer = PlansWriter(f_write)
         writer.start_population()
 
         count = 1
         for route in routes:
-            count = _write_plan(route, writer, count, mat_sim_routing)
+            count = _write_plan(route, writer, count, mat_sim_routing, link_ids)
         writer.end_population()
 
     logging.info(f"Finished writing MATSim plans to {plan_filename}")
 
 
 def _write_plan(
-    route: Route, writer: PlansWriter, count: int, mat_sim_routing: bool
+    route: Route,
+    writer: PlansWriter,
+    count: int,
+    mat_sim_routing: bool,
+    network_link_ids: LinkIds,
 ) -> int:
     node_pairs = list(zip(route.path[:-1], route.path[1:]))
-    link_ids = [_get_link_id(v, w) for v, w in node_pairs]
+    link_ids = [network_link_ids[_link_key(v, w)] for v, w in node_pairs]
     num_people = route.num_people_on_route
     for i in range(num_people):
         writer.start_person(count)
@@ -146,48 +166,32 @@ def _validate_and_format_filename(network_filename: str, gzip_compress: bool) ->
     return network_filename
 
 
-def _add_link_id(v: Id, w: Id, link_id: int) -> None:
+def _output_path(filename: str, output_dir: Path | None) -> Path:
     """
-    Helper function to add a link ID to the LINK_IDS dictionary.
-    :param v: OSM node ID.
-    :param w: OSM node ID.
-    :param link_id: MATSim link ID.
-    """
-    LINK_IDS[_link_key(v, w)] = link_id
-
-
-def _get_link_id(v: Id, w: Id) -> int:
-    """
-    Helper function to get the link ID from the LINK_IDS dictionary.
-    :param v: OSM node ID.
-    :param w: OSM node ID.
-    :return: MATSim link ID.
-    :raises KeyError: If the link ID does not exist.
+    Helper function to get the path of an output file, creating its directory if needed.
+    :param filename: Name of the output file.
+    :param output_dir: Directory to save the file in, or None for the MATSim data directory.
+    :return: Path of the output file.
     """
-    return LINK_IDS[_link_key(v, w)]
+    if output_dir is None:
+        default_path: Path = MATSIM_DATA_DIR / filename
+        return default_path
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir / filename
 
 
-def _link_key(v: Id, w: Id) -> str:
+def _link_key(v: Id, w: Id) -> tuple[Id, Id]:
     """
-    Helper function to create a unique key for the LINK_IDS dictionary.
+    Helper function to create a unique key for the link IDs of a network.
     :param v: OSM node ID.
     :param w: OSM node ID.
-    :return: Unique key for the LINK_IDS dictionary.
+    :return: Unique key for the link IDs of a network.
     """
-    return f"{v}-{w}"
+    return v, w
 
 
-def _try_parse_min_int(link_data: dict[str, list[str] | str], key: str) -> int | None:
+def _optional_int(value: int) -> int | None:
     """
-    Helper function to extract the minimum integer from a string or list of strings.
-    In some cases, when a road has different speed limits, the max_speed of the simplified edge is a list.
-    In those cases, we choose the minimum speed limit of the road.
+    Helper function to convert an integer edge attribute of a compact graph to an int, or None if it is missing.
     """
-    value = link_data.get(key)
-    if value is None:
-        return None
-    try:
-        return min(map(int, value)) if isinstance(value, list) else int(value)
-    except ValueError:
-        logging.warning(f"Invalid {key} value for link {link_data['osmid']}: {value}")
-        return None
+    return None if value == MISSING else int(value)
@@ -2,9 +2,7 @@ from typing import BinaryIO, Optional
 
 from matsim.writers import Id, PopulationWriter, XmlWriter
 
-from utils import kmh_to_ms
-
-DANISH_DEFAULT_SPEED_LIMIT = 50  # km/h
+from utils import DANISH_DEFAULT_SPEED_LIMIT, compute_capacity, kmh_to_ms
 
 
 class NetworkWriter(XmlWriter):  # type: ignore[misc]
@@ -100,7 +98,7 @@ class NetworkWriter(XmlWriter):  # type: ignore[misc]
         )
 
         free_speed = kmh_to_ms(speed_limit)
-        capacity = _compute_capacity(free_speed)
+        capacity = compute_capacity(free_speed)
         self._require_scope(self.LINKS_SCOPE)
         self._write_line(
             f'<link id="{link_id}"'
@@ -166,23 +164,3 @@ class PlansWriter(PopulationWriter):  # type: ignore[misc]
         self.indent -= 1
 
         self._write_line("</leg>")
-
-
-def _compute_capacity(
-    speed_limit: float,
-    vehicle_length: float = 5,
-    min_gap: float = 2.5,
-    tau: float = 1,
-) -> float:
-    """
-    Compute the capacity of a link based on its speed limit.
-    :param speed_limit: Maximum allowed speed of the link in meters per second.
-    :param vehicle_length: Physical length of a vehicle in meters.
-    :param min_gap: Minimum gap between vehicles in a standing queue in meters.
-    :param tau: Desired minimum time headway in seconds.
-    :return: The capacity of the link in vehicles per hour.
-    Reference: https://sumo.dlr.de/docs/Simulation/RoadCapacity.html
-    """
-    # The time it takes for two vehicles to pass the same location.
-    gross_time_headway = (vehicle_length + min_gap) / speed_limit + tau
-    return 3600 / gross_time_headway
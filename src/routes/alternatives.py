@@ -0,0 +1,270 @@
+import bisect
+import heapq as hq
+import math
+from collections import OrderedDict
+from typing import Collection
+
+import numpy as np
+from numpy.typing import NDArray
+
+from routes.compact_graph import CompactRoadGraph
+
+MAX_OVERLAP = 0.5
+"""Largest share of the cost of an alternative route that may also be part of a route chosen before it."""
+SUFFIX_CACHE_SIZE = 100_000
+"""Maximum number of nodes whose suffixes to safety are kept by a SuffixCache."""
+
+Suffix = tuple[float, int, list[int], list[float]]
+"""The cost, start position, route and edge costs of the part of a route from the start position onwards."""
+
+
+class SuffixCache:
+    """
+    Keeps the suffixes to safety of the routes found so far, so that a later origin point on one of the routes can
+    reuse them instead of running its own search. The suffixes of at most max_nodes nodes are kept, evicting the
+    node that was least recently used.
+    """
+
+    def __init__(
+        self, max_nodes: int = SUFFIX_CACHE_SIZE, nodes: Collection[int] | None = None
+    ) -> None:
+        """
+        :param max_nodes: The maximum number of nodes to keep suffixes for.
+        :param nodes: The dense indices of the nodes to keep suffixes for, typically the origin points that have yet
+            to be routed. All nodes if None.
+        """
+        self.max_nodes = max_nodes
+        self.nodes = set(nodes) if nodes is not None else None
+        self._suffixes: OrderedDict[int, list[Suffix]] = OrderedDict()
+
+    def add(self, route: list[int], edge_costs: list[float], max_per_node: int) -> None:
+        """
+        Keeps the suffixes of a route for every node on it, except its first and last node.
+
+        :param route: The route as a list of dense node indices.
+        :param edge_costs: The cost of every edge on the route.
+        :param max_per_node: The maximum number of suffixes to keep for a node, keeping the cheapest.
+        """
+        remaining = sum(edge_costs) - edge_costs[0]
+        for start in range(1, len(route) - 1):
+            node = route[start]
+            if self.nodes is None or node in self.nodes:
+                self._insert(node, (remaining, start, route, edge_costs), max_per_node)
+            remaining -= edge_costs[start]
+
+    def get(self, node: int) -> list[Suffix]:
+        """
+        Returns the suffixes kept for a node, ordered by cost.
+        """
+        suffixes = self._suffixes.get(node)
+        if suffixes is None:
+            return []
+        self._suffixes.move_to_end(node)
+        return suffixes
+
+    def __len__(self) -> int:
+        return len(self._suffixes)
+
+    def _insert(self, node: int, suffix: Suffix, max_per_node: int) -> None:
+        suffixes = self._suffixes.get(node)
+        if suffixes is None:
+            suffixes = self._suffixes[node] = []
+            if len(self._suffixes) > self.max_nodes:
+                self._suffixes.popitem(last=False)
+        else:
+            self._suffixes.move_to_end(node)
+            if any(_same_suffix(suffix, other) for other in suffixes):
+                return  # Routes of different origin points often end the same way
+
+        bisect.insort(suffixes, suffix, key=lambda entry: entry[0])
+        del suffixes[max_per_node:]
+
+
+def _same_suffix(a: Suffix, b: Suffix) -> bool:
+    return a[0] == b[0] and a[2][a[1] :] == b[2][b[1] :]
+
+
+class PlateauAlternatives:
+    """
+    Finds dissimilar routes to safety with the plateau method. A forward search from the origin and the safety tree,
+    a reverse search from every exit of the danger zone, are combined: every node settled by the forward search
+    gives a candidate route, its forward path followed by its safety tree path. Nodes whose candidate routes are
+    identical form a plateau, a path shared by both trees, so only the first node of every plateau is considered.
+    Candidates are accepted by increasing cost as long as they do not overlap too much with an accepted route.
+
+    The safety tree is shared by all origin points, so the cost per origin point is a single forward search that
+    stops once the requested number of routes is found, independent of how many candidates are rejected. With a
+    suffix cache, an origin point on the routes of an earlier one skips the search if the cache holds enough
+    dissimilar suffixes from it, the cheapest being its fastest route to safety.
+    """
+
+    def __init__(
+        self,
+        graph: CompactRoadGraph,
+        danger_zone_mask: NDArray[np.bool_],
+        weights: NDArray[np.float64],
+        safety_dist: list[float],
+        safety_successor: list[int | None],
+        max_overlap: float = MAX_OVERLAP,
+        suffix_cache: SuffixCache | None = None,
+    ) -> None:
+        """
+        :param graph: A compact graph corresponding to the road network
+        :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+        :param weights: The weight of every edge in the graph.
+        :param safety_dist: The distance from every node to safety, as returned by build_safety_tree.
+        :param safety_successor: The next node on the best route to safety, as returned by build_safety_tree.
+        :param max_overlap: The largest share of the cost of a route that may be shared with an accepted route.
+        :param suffix_cache: A cache of the suffixes of the routes found so far, or None to always search.
+        """
+        # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+        self.offsets = graph.offsets.tolist()
+        self.targets = graph.targets.tolist()
+        self.edge_weights = weights.tolist()
+        self.in_danger = danger_zone_mask.tolist()
+        self.safety_dist = safety_dist
+        self.safety_successor = safety_successor
+        self.max_overlap = max_overlap
+        self.suffix_cache = suffix_cache
+        self.cache_hits = 0
+
+    def routes(self, source: int, k: int) -> list[list[int]]:
+        """
+        Finds up to k dissimilar routes from the source to safety, ordered by cost.
+
+        :param source: The dense index of the origin node.
+        :param k: The maximum number of routes to find.
+        :return: The routes as lists of dense node indices, each ending at a safe node.
+        """
+        if not self.in_danger[source]:
+            return [[source]]
+        if self.suffix_cache is not None:
+            cached = self._cached_routes(source, k)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        dist = {source: 0.0}
+        predecessor: dict[int, int | None] = {source: None}
+        settled: set[int] = set()
+        frontier: list[tuple[float, int]] = [(0.0, source)]
+        candidates: list[tuple[float, int]] = []
+        accepted: list[list[int]] = []
+        accepted_edges: list[dict[tuple[int, int], float]] = []
+
+        def accept_candidates(bound: float) -> None:
+            # Candidates costing at most the bound are final, as every later candidate costs at least the bound
+            while candidates and candidates[0][0] <= bound and len(accepted) < k:
+                cost, via = hq.heappop(candidates)
+                route, edges = self._via_route(via, dist, predecessor)
+                if route is not None and self._is_dissimilar(
+                    edges, cost, accepted_edges
+                ):
+                    accepted.append(route)
+                    accepted_edges.append(edges)
+
+        while frontier and len(accepted) < k:
+            priority, node = hq.heappop(frontier)
+            if node in settled:
+                continue  # This node has already been processed with a better path
+            settled.add(node)
+            accept_candidates(priority)
+
+            previous = predecessor[node]
+            if self.safety_dist[node] != float("inf") and (
+                previous is None or self.safety_successor[previous] != node
+            ):
+                # The node starts a plateau, otherwise its route equals that of its predecessor
+                hq.heappush(candidates, (priority + self.safety_dist[node], node))
+
+            if not self.in_danger[node]:
+                continue  # Routes end at the first safe node
+            for edge in range(self.offsets[node], self.offsets[node + 1]):
+                neighbour = self.targets[edge]
+                new_distance = priority + self.edge_weights[edge]
+                if new_distance < dist.get(neighbour, float("inf")):
+                    dist[neighbour] = new_distance
+                    predecessor[neighbour] = node
+                    hq.heappush(frontier, (new_distance, neighbour))
+
+        accept_candidates(float("inf"))
+
+        if self.suffix_cache is not None:
+            for route, edges in zip(accepted, accepted_edges):
+                edge_costs = [edges[edge] for edge in zip(route, route[1:])]
+                self.suffix_cache.add(route, edge_costs, 2 * k)
+        return accepted
+
+    def _cached_routes(self, source: int, k: int) -> list[list[int]] | None:
+        """
+        Selects k dissimilar routes from the cached suffixes of the source, in the same way as candidates are accepted.
+
+        :return: The routes, or None if the cache does not hold the fastest route or enough dissimilar routes.
+        """
+        assert self.suffix_cache is not None
+        suffixes = self.suffix_cache.get(source)
+        if len(suffixes) < k or not math.isclose(
+            suffixes[0][0], self.safety_dist[source]
+        ):
+            return None
+
+        chosen: list[list[int]] = []
+        chosen_edges: list[dict[tuple[int, int], float]] = []
+        for cost, start, route, edge_costs in suffixes:
+            edges = {
+                (route[i], route[i + 1]): edge_costs[i]
+                for i in range(start, len(route) - 1)
+            }
+            if self._is_dissimilar(edges, cost, chosen_edges):
+                chosen.append(route[start:])
+                chosen_edges.append(edges)
+                if len(chosen) == k:
+                    return chosen
+        return None
+
+    def _via_route(
+        self,
+        via: int,
+        dist: dict[int, float],
+        predecessor: dict[int, int | None],
+    ) -> tuple[list[int] | None, dict[tuple[int, int], float]]:
+        """
+        Builds the route through the via node, and the cost of each of its edges.
+
+        :return: The route, or None if it visits a node twice, and the cost of every edge on the route.
+        """
+        edges: dict[tuple[int, int], float] = {}
+        route = [via]
+        node = via
+        while (previous := predecessor[node]) is not None:
+            edges[(previous, node)] = dist[node] - dist[previous]
+            route.append(previous)
+            node = previous
+        route.reverse()
+
+        node = via
+        while (successor := self.safety_successor[node]) is not None:
+            edges[(node, successor)] = (
+                self.safety_dist[node] - self.safety_dist[successor]
+            )
+            route.append(successor)
+            node = successor
+
+        if len(set(route)) != len(route):
+            return None, edges
+        return route, edges
+
+    def _is_dissimilar(
+        self,
+        edges: dict[tuple[int, int], float],
+        cost: float,
+        accepted_edges: list[dict[tuple[int, int], float]],
+    ) -> bool:
+        """
+        Returns whether a route shares at most max_overlap of its cost with every accepted route.
+        """
+        for other in accepted_edges:
+            shared = sum(weight for edge, weight in edges.items() if edge in other)
+            if shared > self.max_overlap * cost:
+                return False
+        return True
@@ -0,0 +1,127 @@
+import logging
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+from numpy.typing import NDArray
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.heuristics import Metric
+from routes.path_store import PathStore
+from routes.route_utils import RouteDict, vertex
+from routes.safe_exits import SafeExitCatalogue
+
+
+def route_to_safety_batch(
+    origin_points: list[vertex],
+    danger_zone: gpd.GeoDataFrame,
+    G: nx.MultiDiGraph | CompactRoadGraph,
+    metric: Metric = "travel_time",
+    safe_exits: SafeExitCatalogue | None = None,
+) -> RouteDict:
+    """
+    Routes every origin point to the nearest safe location, like FastestPath or ShortestPath with a single route
+    per origin point. Instead of a search per origin point, a single multi-source Dijkstra from the exits runs on
+    the reversed graph in SciPy's compiled code, and the routes are read from the resulting safety tree.
+
+    :param origin_points: A list of vertices given as OSM node IDs
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+    :param G: A graph corresponding to the road network
+    :param metric: The edge attribute the routes minimise, travel_time for the fastest and length for the shortest
+        routes.
+    :param safe_exits: The exits of the danger zone, found from the danger zone if None
+    :return: A dictionary from an origin point to a list containing its route
+    """
+    logging.info("Routing all origin points to safety in a single batch")
+    full_graph = as_compact_graph(G)
+    danger_zone_index = DangerZoneIndex.from_compact_graph(full_graph, danger_zone)
+    subgraph = DangerZoneSubgraph.from_index(
+        full_graph, danger_zone_index, origin_points, safe_exits
+    )
+    graph = subgraph.graph
+    dist, successor = safety_tree(
+        graph, subgraph.mask, getattr(graph, metric), subgraph.exits
+    )
+
+    origins: list[vertex] = []
+    for origin in origin_points:
+        source = graph.index.get(origin)
+        if source is None:
+            logging.error(f"Origin node {origin} is not in the graph")
+            continue
+        if graph.out_degree(source) == 0:
+            logging.info(f"Node {origin} has no neighbors")
+            continue  # Skip if the origin node doesn't have neighbors
+        if subgraph.mask[source] and dist[source] == np.inf:
+            logging.info(f"Node {origin} cannot reach any nodes outside the dangerzone")
+            continue
+        origins.append(origin)
+
+    # Only the part of the safety tree on the routes of the origin points is kept, found a step at a time
+    sources = np.array([graph.index[origin] for origin in origins], dtype=np.int64)
+    on_routes = np.zeros(graph.num_nodes, dtype=np.bool_)
+    frontier = np.unique(sources)
+    while len(frontier):
+        on_routes[frontier] = True
+        next_nodes = successor[frontier]
+        next_nodes = next_nodes[next_nodes >= 0]
+        frontier = np.unique(next_nodes[~on_routes[next_nodes]])
+    tree_nodes = np.flatnonzero(on_routes & (successor >= 0))
+    return PathStore.from_tree(
+        {
+            graph.nodes[node]: graph.nodes[next_node]
+            for node, next_node in zip(
+                tree_nodes.tolist(), successor[tree_nodes].tolist()
+            )
+        },
+        origins,
+    )
+
+
+def safety_tree(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    exits: NDArray[np.int64],
+) -> tuple[NDArray[np.float64], NDArray[np.int64]]:
+    """
+    Builds the safety tree of build_safety_tree with scipy.sparse.csgraph.dijkstra, seeded from every exit of the
+    reversed graph at once.
+
+    :param graph: A compact graph corresponding to the road network
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :param weights: The weight of every edge in the graph.
+    :param exits: The dense indices of the safe nodes with an incoming edge from the danger zone.
+    :return: The distance from every dense node index to safety, infinite if safety cannot be reached, and the
+        next node on its best route, -1 for safe nodes and nodes that cannot reach safety.
+    """
+    if len(exits) == 0:
+        return (
+            np.full(graph.num_nodes, np.inf),
+            np.full(graph.num_nodes, -1, dtype=np.int64),
+        )
+
+    # Only edges leaving a danger zone node are kept, reversed so the search runs from the exits
+    sources = graph.sources()
+    kept = danger_zone_mask[sources]
+    rows, columns, edge_weights = graph.targets[kept], sources[kept], weights[kept]
+    # A sparse matrix sums the weights of parallel edges, so only the lightest of them is kept
+    order = np.lexsort((edge_weights, columns, rows))
+    rows, columns, edge_weights = rows[order], columns[order], edge_weights[order]
+    lightest = np.ones(len(rows), dtype=np.bool_)
+    lightest[1:] = (rows[1:] != rows[:-1]) | (columns[1:] != columns[:-1])
+    matrix = csr_matrix(
+        (edge_weights[lightest], (rows[lightest], columns[lightest])),
+        shape=(graph.num_nodes, graph.num_nodes),
+    )
+
+    dist, predecessors, _ = dijkstra(
+        matrix, indices=exits, min_only=True, return_predecessors=True
+    )
+    # The predecessor of a node in the reversed search is its next node towards safety
+    successor = np.where(predecessors < 0, -1, predecessors).astype(np.int64)
+    return dist, successor
@@ -0,0 +1,194 @@
+import logging
+import math
+from collections import Counter
+from typing import Dict, Mapping
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import zope.interface
+from numpy.typing import NDArray
+
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.multi_source import build_safety_tree_edges, follow_safety_tree
+from routes.route_algo import RouteAlgo
+from routes.route_utils import path, vertex
+from routes.safe_exits import SafeExitCatalogue
+
+BPR_ALPHA = 0.15
+BPR_BETA = 4
+"""Parameters of the Bureau of Public Roads (BPR) function relating the flow on an edge to its travel time."""
+
+
+@zope.interface.implementer(RouteAlgo)
+class CapacityAwareFastestPath:
+    def __init__(self, max_iterations: int = 20, tolerance: float = 1e-3) -> None:
+        """
+        :param max_iterations: The maximum number of assignment iterations.
+        :param tolerance: The relative gap at which the assignment is considered converged.
+        """
+        self.title = "MSA - Capacity-Aware Fastest Path"
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+
+    def route_to_safety(
+        self,
+        origin_points: list[vertex],
+        danger_zone: gpd.GeoDataFrame,
+        G: nx.MultiDiGraph | CompactRoadGraph,
+        diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
+    ) -> Dict[vertex, list[path]]:
+        """
+        Assigns the origin points to routes to safety with the method of successive averages (MSA). Every iteration
+        routes all origin points along the safety tree of the congested travel times, and averages the resulting
+        edge flows with those of the earlier iterations. The travel time of an edge grows with the ratio of its flow
+        to its capacity, so traffic moves away from edges and exits that are over capacity.
+
+        :param origin_points: A list of vertices given as OSM node IDs
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+        :param G: A graph corresponding to the road network
+        :param diversifying_routes: The number of slots the routes of an origin point are apportioned to by the
+            share of iterations they were chosen in. A route is repeated once per slot, so the vehicles of the origin
+            point are split between its routes by their shares.
+        :param workers: Ignored, every iteration routes all origin points with a single search
+        :param safe_exits: The exits of the danger zone, found from the danger zone if None
+        :param demand: The vehicles per hour leaving every origin point. Every origin point has a demand of 1 if None.
+        :param departure_window: Ignored, routes do not depend on the departure time
+        :return: A dictionary from an origin point to a list of 1 or more paths
+        """
+        logging.info("Routing capacity-aware fastest paths to safety")
+        if demand is None:
+            logging.info(f"{self.title} got no demand, assuming 1 vehicle per hour")
+            demand = {}.fromkeys(origin_points, 1.0)
+
+        full_graph = as_compact_graph(G)
+        danger_zone_index = DangerZoneIndex.from_compact_graph(full_graph, danger_zone)
+        subgraph = DangerZoneSubgraph.from_index(
+            full_graph, danger_zone_index, origin_points, safe_exits
+        )
+        graph = subgraph.graph
+        capacity = graph.capacity()
+        flow = np.zeros(graph.num_edges, dtype=np.float64)
+
+        routes: Dict[vertex, list[path]] = {}
+        origins: list[vertex] = []
+        sources: list[int] = []
+        for origin in origin_points:
+            source = graph.index.get(origin)
+            if source is None:
+                logging.error(f"Origin node {origin} is not in the graph")
+                continue
+            if graph.out_degree(source) == 0:
+                logging.info(f"Node {origin} has no neighbors")
+                continue  # Skip if the origin node doesn't have neighbors
+            if not subgraph.mask[source]:
+                routes[origin] = [[origin]]
+                continue  # The origin point is already safe
+            origins.append(origin)
+            sources.append(source)
+        origin_demand = [demand.get(origin, 0.0) for origin in origins]
+        node_demand = np.zeros(graph.num_nodes, dtype=np.float64)
+        np.add.at(node_demand, sources, origin_demand)
+
+        chosen_routes: list[Counter[tuple[int, ...]]] = [Counter() for _ in sources]
+        iterations = 0
+        for iteration in range(1, self.max_iterations + 1):
+            travel_time = bpr_travel_time(graph.travel_time, flow, capacity)
+            dist, successor, successor_edge = build_safety_tree_edges(
+                graph, subgraph.mask, travel_time, subgraph.exits
+            )
+            if iteration > 1:
+                gap = _relative_gap(flow, travel_time, node_demand, dist)
+                logging.info(f"MSA iteration {iteration}: relative gap {gap:.4f}")
+                if gap < self.tolerance:
+                    break
+
+            # All-or-nothing flow: the demand of every origin point follows its route in the safety tree
+            tree_flow = [0.0] * graph.num_edges
+            for counter, source, vehicles in zip(chosen_routes, sources, origin_demand):
+                if dist[source] == float("inf"):
+                    continue
+                route = follow_safety_tree(successor, source)
+                counter[tuple(route)] += 1
+                for node in route[:-1]:
+                    tree_flow[successor_edge[node]] += vehicles
+            flow += (np.array(tree_flow) - flow) / iteration
+            iterations = iteration
+
+        for origin, counter in zip(origins, chosen_routes):
+            if not counter:
+                logging.info(
+                    f"Node {origin} cannot reach any nodes outside the dangerzone"
+                )
+                continue
+            routes[origin] = [
+                graph.to_path(list(route))
+                for route in _apportion(counter, iterations, diversifying_routes)
+            ]
+        return routes
+
+
+def bpr_travel_time(
+    free_flow_time: NDArray[np.float64],
+    flow: NDArray[np.float64],
+    capacity: NDArray[np.float64],
+) -> NDArray[np.float64]:
+    """
+    Returns the travel time of every edge under the given flow with the BPR function.
+
+    :param free_flow_time: The travel time of every edge without traffic.
+    :param flow: The flow on every edge in vehicles per hour.
+    :param capacity: The capacity of every edge in vehicles per hour.
+    :return: The congested travel time of every edge.
+    """
+    result: NDArray[np.float64] = free_flow_time * (
+        1 + BPR_ALPHA * (flow / capacity) ** BPR_BETA
+    )
+    return result
+
+
+def _relative_gap(
+    flow: NDArray[np.float64],
+    travel_time: NDArray[np.float64],
+    node_demand: NDArray[np.float64],
+    dist: list[float],
+) -> float:
+    """
+    Returns how much longer the vehicles travel under the current flow than on the fastest routes, relative to the
+    fastest routes. The gap is zero when no vehicle can switch to a faster route.
+    """
+    distances = np.array(dist)
+    routed = (node_demand > 0) & np.isfinite(distances)
+    shortest = float(np.dot(node_demand[routed], distances[routed]))
+    if shortest == 0:
+        return 0.0
+    return float(np.dot(flow, travel_time)) / shortest - 1
+
+
+def _apportion(
+    counter: Counter[tuple[int, ...]], total: int, slots: int
+) -> list[tuple[int, ...]]:
+    """
+    Apportions slots to routes by the share of iterations they were chosen in, with the largest remainder method.
+
+    :return: The routes, each repeated in proportion to its slots, ordered by share.
+    """
+    slots = max(1, slots)
+    ranked = counter.most_common()
+    quotas = [count * slots / total for _, count in ranked]
+    seats = [int(quota) for quota in quotas]
+    by_remainder = sorted(
+        range(len(ranked)), key=lambda i: quotas[i] - seats[i], reverse=True
+    )
+    for i in by_remainder[: slots - sum(seats)]:
+        seats[i] += 1
+    # Only the ratio of the seats matters, so e.g. a route with all seats is returned once
+    divisor = math.gcd(*seats)
+    seats = [n // divisor for n in seats]
+    return [route for (route, _), n in zip(ranked, seats) for _ in range(n)]
@@ -0,0 +1,319 @@
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+from numpy.typing import NDArray
+from shapely.geometry.polygon import Polygon
+
+from data_loader.osm import (
+    SPEED_KMH,
+    TRAVEL_TIME,
+    OsmGraphCache,
+    add_edge_travel_times,
+)
+from routes.route_utils import vertex
+from utils import compute_capacity, kmh_to_ms, try_parse_min_int
+
+MISSING = 0
+"""Value stored in the integer edge attribute arrays when the attribute is missing or cannot be parsed."""
+COLUMNS = (
+    "x",
+    "y",
+    "offsets",
+    "targets",
+    "length",
+    "travel_time",
+    "speed_limit",
+    "lanes",
+    "oneway",
+)
+"""The arrays of a CompactRoadGraph, each saved to its own file by CompactRoadGraph.save."""
+FORMAT_VERSION = 1
+"""Version of the on-disk format of CompactRoadGraph.save, bumped whenever the columns change."""
+
+
+@dataclass
+class CompactRoadGraph:
+    """
+    A read-only snapshot of a road network in compressed sparse row (CSR) form.
+
+    Nodes are numbered densely in the order of the source graph, and the outgoing edges of node i are the
+    edges offsets[i] to offsets[i + 1] - 1. Edges are stored in the same order as the source graph's
+    edges(data=True), so an edge position can be used wherever the source graph's edge enumeration is used.
+    """
+
+    nodes: list[vertex]
+    """OSM node ID of every dense node index."""
+    x: NDArray[np.float64]
+    """Longitude of every node."""
+    y: NDArray[np.float64]
+    """Latitude of every node."""
+    offsets: NDArray[np.int64]
+    """Start of the outgoing edges of every node, with a final entry equal to the number of edges."""
+    targets: NDArray[np.int64]
+    """Dense index of the node every edge points to."""
+    length: NDArray[np.float64]
+    """Length of every edge in meters."""
+    travel_time: NDArray[np.float64]
+    """Time in seconds it takes to traverse every edge at its speed limit."""
+    speed_limit: NDArray[np.int64]
+    """Speed limit of every edge in km/h."""
+    lanes: NDArray[np.int64]
+    """Number of lanes of every edge, or MISSING."""
+    oneway: NDArray[np.bool_]
+    """Whether every edge is a one-way road."""
+    index: dict[vertex, int] = field(init=False, repr=False)
+    """Dense index of every OSM node ID."""
+
+    def __post_init__(self) -> None:
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The index is rebuilt on unpickling, keeping the pickled graph small.
+        state = self.__dict__.copy()
+        del state["index"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    @classmethod
+    def from_graph(cls, G: nx.MultiDiGraph) -> "CompactRoadGraph":
+        """
+        Builds a compact snapshot of a graph. The edges of G are annotated with their travel time first, so
+        routing and the MATSim network use the same speed limits.
+
+        :param G: A graph corresponding to the road network
+        :return: The compact road graph.
+        """
+        add_edge_travel_times(G)
+        nodes = list(G.nodes)
+        index = {node: i for i, node in enumerate(nodes)}
+        num_edges = G.number_of_edges()
+
+        sources = np.empty(num_edges, dtype=np.int64)
+        targets = np.empty(num_edges, dtype=np.int64)
+        length = np.empty(num_edges, dtype=np.float64)
+        travel_time = np.empty(num_edges, dtype=np.float64)
+        speed_limit = np.empty(num_edges, dtype=np.int64)
+        lanes = np.empty(num_edges, dtype=np.int64)
+        oneway = np.empty(num_edges, dtype=np.bool_)
+        # Edges are yielded grouped by source node in node order, which is exactly CSR order
+        for i, (u, v, edge_data) in enumerate(G.edges(data=True)):
+            sources[i] = index[u]
+            targets[i] = index[v]
+            length[i] = edge_data.get("length", float("inf"))
+            travel_time[i] = edge_data[TRAVEL_TIME]
+            speed_limit[i] = edge_data[SPEED_KMH]
+            lanes[i] = try_parse_min_int(edge_data, "lanes") or MISSING
+            # Without the attribute, only the given direction of the edge is known to exist
+            oneway[i] = edge_data.get("oneway", True)
+
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(nodes)), out=offsets[1:])
+
+        return cls(
+            nodes=nodes,
+            x=np.array([G.nodes[node]["x"] for node in nodes], dtype=np.float64),
+            y=np.array([G.nodes[node]["y"] for node in nodes], dtype=np.float64),
+            offsets=offsets,
+            targets=targets,
+            length=length,
+            travel_time=travel_time,
+            speed_limit=speed_limit,
+            lanes=lanes,
+            oneway=oneway,
+        )
+
+    @classmethod
+    def from_graphml(cls, file: Path) -> "CompactRoadGraph":
+        """
+        Builds a compact snapshot of a GraphML file, such as one written by save_osm.
+
+        :param file: The GraphML file.
+        :return: The compact road graph.
+        """
+        logging.info(f"Converting {file.name} to a compact graph")
+        return cls.from_graph(ox.load_graphml(file))
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "CompactRoadGraph":
+        """
+        Loads a graph saved by save. The arrays are memory-mapped by default, so loading takes no time and only
+        the parts of the graph that are used are read from disk.
+
+        :param directory: The directory the graph was saved to.
+        :param mmap: Whether to memory-map the arrays instead of reading them into memory.
+        :return: The compact road graph.
+        """
+        with open(directory / "format.json", "r") as f:
+            version = json.load(f)["version"]
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"{directory} holds a compact graph in format {version}, expected {FORMAT_VERSION}"
+            )
+        mmap_mode: Literal["r"] | None = "r" if mmap else None
+        arrays = {
+            column: np.load(directory / f"{column}.npy", mmap_mode=mmap_mode)
+            for column in COLUMNS
+        }
+        return cls(nodes=np.load(directory / "nodes.npy").tolist(), **arrays)
+
+    def save(self, directory: Path) -> None:
+        """
+        Saves the graph in a columnar format, a NumPy file for the node IDs and every array, which load can
+        memory-map.
+
+        :param directory: The directory to save the graph to.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "nodes.npy", np.asarray(self.nodes))
+        for column in COLUMNS:
+            np.save(directory / f"{column}.npy", getattr(self, column))
+        # Written last, so a directory without it holds an incomplete graph
+        with open(directory / "format.json", "w") as f:
+            json.dump({"version": FORMAT_VERSION}, f)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def out_degree(self, node: int) -> int:
+        """
+        Returns the number of edges leaving the node with the given dense index.
+        """
+        return int(self.offsets[node + 1] - self.offsets[node])
+
+    def capacity(self) -> NDArray[np.float64]:
+        """
+        Returns the capacity of every edge in vehicles per hour, as given to MATSim.
+        """
+        speed_limits, inverse = np.unique(self.speed_limit, return_inverse=True)
+        capacities = [compute_capacity(kmh_to_ms(speed)) for speed in speed_limits]
+        return np.array(capacities, dtype=np.float64)[inverse]
+
+    def sources(self) -> NDArray[np.int64]:
+        """
+        Returns the dense index of the node every edge starts at.
+        """
+        return np.repeat(
+            np.arange(self.num_nodes, dtype=np.int64), np.diff(self.offsets)
+        )
+
+    def reverse_csr(
+        self,
+    ) -> tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.int64]]:
+        """
+        Returns the incoming edges of every node in CSR form.
+
+        :return: The offsets into the incoming edges of every node, the dense index of the node every incoming edge
+            starts at, and the position of every incoming edge in the edge arrays.
+        """
+        edge_ids = np.argsort(self.targets, kind="stable")
+        offsets = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.targets, minlength=self.num_nodes), out=offsets[1:])
+        return offsets, self.sources()[edge_ids], edge_ids
+
+    def subgraph(
+        self,
+        node_mask: NDArray[np.bool_],
+        edge_mask: NDArray[np.bool_] | None = None,
+    ) -> "CompactRoadGraph":
+        """
+        Returns the subgraph of the selected nodes, keeping the order of the nodes and edges.
+
+        :param node_mask: Whether every node is part of the subgraph.
+        :param edge_mask: Whether every edge is part of the subgraph if both its nodes are. All edges if None.
+        :return: The compact subgraph.
+        """
+        sources = self.sources()
+        kept_edges = node_mask[sources] & node_mask[self.targets]
+        if edge_mask is not None:
+            kept_edges &= edge_mask
+        new_index = np.cumsum(node_mask, dtype=np.int64) - 1
+        num_nodes = int(np.count_nonzero(node_mask))
+
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(new_index[sources[kept_edges]], minlength=num_nodes),
+            out=offsets[1:],
+        )
+        return CompactRoadGraph(
+            nodes=[node for node, kept in zip(self.nodes, node_mask.tolist()) if kept],
+            x=self.x[node_mask],
+            y=self.y[node_mask],
+            offsets=offsets,
+            targets=new_index[self.targets[kept_edges]],
+            length=self.length[kept_edges],
+            travel_time=self.travel_time[kept_edges],
+            speed_limit=self.speed_limit[kept_edges],
+            lanes=self.lanes[kept_edges],
+            oneway=self.oneway[kept_edges],
+        )
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash of the nodes and edges of the graph, identifying data derived from it such as landmark tables.
+        """
+        digest = hashlib.sha256("\n".join(map(str, self.nodes)).encode())
+        for array in (self.offsets, self.targets, self.length, self.travel_time):
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def to_path(self, route: list[int]) -> list[vertex]:
+        """
+        Converts a route of dense node indices to a route of OSM node IDs.
+        """
+        return [self.nodes[i] for i in route]
+
+
+def as_compact_graph(G: nx.MultiDiGraph | CompactRoadGraph) -> CompactRoadGraph:
+    """
+    Returns the compact form of a graph, building it if it is a NetworkX graph.
+
+    :param G: A graph corresponding to the road network
+    :return: The compact road graph.
+    """
+    if isinstance(G, CompactRoadGraph):
+        return G
+    return CompactRoadGraph.from_graph(G)
+
+
+def load_compact_graph(
+    polygon: Polygon,
+    G: nx.MultiDiGraph,
+    simplify: bool = True,
+    cache: OsmGraphCache | None = None,
+) -> CompactRoadGraph:
+    """
+    Loads the compact form of the OSM graph of a polygon from the graph cache, building and caching it from G if it
+    is missing, so a cached area is only converted once.
+
+    :param polygon: Polygon representing the area of interest.
+    :param G: The OSM graph of the polygon, as returned by load_osm_graph with the same cache.
+    :param simplify: Whether the graph is simplified.
+    :param cache: The graph cache, by default the one in the OSM data directory.
+    :return: The compact road graph.
+    """
+    cache = cache or OsmGraphCache()
+    directory = cache.compact_graph_dir(polygon, simplify=simplify)
+    if (directory / "format.json").exists():
+        try:
+            logging.info(f"Loading compact graph from {directory}")
+            return CompactRoadGraph.load(directory)
+        except ValueError as e:
+            logging.warning(f"{e}, building it again")
+    graph = CompactRoadGraph.from_graph(G)
+    graph.save(directory)
+    return graph
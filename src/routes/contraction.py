@@ -0,0 +1,435 @@
+import heapq as hq
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from tqdm import tqdm
+
+from data_loader.osm import OSM_DIR
+from routes.compact_graph import CompactRoadGraph
+from routes.dijkstra import log_expansions
+from routes.heuristics import Metric
+from routes.route_utils import RouteDict, vertex
+from routes.safe_exits import SafeExitCatalogue
+
+WITNESS_SETTLE_LIMIT = 50
+"""Maximum number of nodes settled by a witness search. A search stopped early adds a shortcut that may not be
+needed, which costs query time but never correctness."""
+
+
+@dataclass
+class ContractionHierarchy:
+    """
+    A contraction hierarchy (CH) of a road network. Nodes are contracted one at a time in order of importance, adding
+    shortcut edges that preserve the distances between the remaining nodes, so every shortest path can be found by
+    searching upwards in the order from both ends.
+
+    The hierarchy only depends on the graph and the metric, so it is built once per city and persisted to disk.
+    A danger zone only changes the targets of the queries, the exits, which are prepared by a single backward search
+    from all exits in customise.
+    """
+
+    rank: NDArray[np.int64]
+    """Position of every node in the contraction order."""
+    up_offsets: NDArray[np.int64]
+    """Start of the upward edges of every node in CSR form, edges to nodes of a higher rank."""
+    up_targets: NDArray[np.int64]
+    """Node every upward edge points to."""
+    up_weights: NDArray[np.float64]
+    """Weight of every upward edge."""
+    down_offsets: NDArray[np.int64]
+    """Start of the downward edges into every node in CSR form, edges from nodes of a higher rank."""
+    down_sources: NDArray[np.int64]
+    """Node every downward edge starts at."""
+    down_weights: NDArray[np.float64]
+    """Weight of every downward edge."""
+    shortcut_from: NDArray[np.int64]
+    """Node every shortcut starts at."""
+    shortcut_to: NDArray[np.int64]
+    """Node every shortcut points to."""
+    shortcut_via: NDArray[np.int64]
+    """The contracted node every shortcut bypasses."""
+    _via: dict[tuple[int, int], int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._via = dict(
+            zip(
+                zip(self.shortcut_from.tolist(), self.shortcut_to.tolist()),
+                self.shortcut_via.tolist(),
+            )
+        )
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The shortcut lookup is rebuilt on unpickling, keeping the pickled hierarchy small.
+        state = self.__dict__.copy()
+        del state["_via"]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__post_init__()
+
+    @classmethod
+    def build(
+        cls,
+        graph: CompactRoadGraph,
+        weights: NDArray[np.float64],
+        witness_settle_limit: int = WITNESS_SETTLE_LIMIT,
+    ) -> "ContractionHierarchy":
+        """
+        Contracts every node of a graph, ordered by the edge difference: the shortcuts a contraction adds minus the
+        edges it removes, plus the number of contracted neighbours to spread the contractions over the graph.
+
+        :param graph: A compact graph corresponding to the road network
+        :param weights: The weight of every edge in the graph.
+        :param witness_settle_limit: The maximum number of nodes settled by a witness search.
+        :return: The contraction hierarchy of the graph.
+        """
+        num_nodes = graph.num_nodes
+        # The edges between the nodes that are not contracted yet
+        out_edges: dict[int, dict[int, float]] = {node: {} for node in range(num_nodes)}
+        in_edges: dict[int, dict[int, float]] = {node: {} for node in range(num_nodes)}
+        for u, v, weight in zip(
+            graph.sources().tolist(), graph.targets.tolist(), weights.tolist()
+        ):
+            if u != v and weight < out_edges[u].get(v, float("inf")):
+                # Only the lightest of parallel edges can be on a shortest path
+                out_edges[u][v] = in_edges[v][u] = weight
+        via: dict[tuple[int, int], int] = {}
+        contracted_neighbours = [0] * num_nodes
+
+        def witness_distances(source: int, skip: int, limit: float) -> dict[int, float]:
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap and settled < witness_settle_limit:
+                priority, node = hq.heappop(heap)
+                if priority > dist[node]:
+                    continue  # This node has already been processed with a better path
+                if priority > limit:
+                    break
+                settled += 1
+                for neighbour, weight in out_edges[node].items():
+                    new_distance = priority + weight
+                    if neighbour != skip and new_distance < dist.get(
+                        neighbour, float("inf")
+                    ):
+                        dist[neighbour] = new_distance
+                        hq.heappush(heap, (new_distance, neighbour))
+            return dist
+
+        def shortcuts(node: int, add: bool) -> int:
+            """Counts the shortcuts needed to contract the node, adding them if add is set."""
+            if not in_edges[node] or not out_edges[node]:
+                return 0
+            count = 0
+            max_out = max(out_edges[node].values())
+            for u, in_weight in list(in_edges[node].items()):
+                dist = witness_distances(u, node, in_weight + max_out)
+                for w, out_weight in list(out_edges[node].items()):
+                    through = in_weight + out_weight
+                    if w == u or dist.get(w, float("inf")) <= through:
+                        continue  # A path avoiding the node is at least as short
+                    count += 1
+                    if add and through < out_edges[u].get(w, float("inf")):
+                        out_edges[u][w] = in_edges[w][u] = through
+                        via[(u, w)] = node
+            return count
+
+        def priority(node: int) -> int:
+            return (
+                shortcuts(node, False)
+                - len(in_edges[node])
+                - len(out_edges[node])
+                + contracted_neighbours[node]
+            )
+
+        rank = np.zeros(num_nodes, dtype=np.int64)
+        up: list[tuple[int, int, float]] = []
+        down: list[tuple[int, int, float]] = []
+        heap = [(priority(node), node) for node in range(num_nodes)]
+        hq.heapify(heap)
+        progress = tqdm(total=num_nodes, desc="Contracting nodes")
+        while heap:
+            _, node = hq.heappop(heap)
+            if node not in out_edges:
+                continue  # The node has already been contracted
+            # Priorities change as neighbours are contracted, so they are updated lazily
+            current = priority(node)
+            if heap and current > heap[0][0]:
+                hq.heappush(heap, (current, node))
+                continue
+
+            shortcuts(node, True)
+            rank[node] = progress.n
+            for w, weight in out_edges.pop(node).items():
+                up.append((node, w, weight))
+                del in_edges[w][node]
+                contracted_neighbours[w] += 1
+            for u, weight in in_edges.pop(node).items():
+                down.append((u, node, weight))
+                del out_edges[u][node]
+                contracted_neighbours[u] += 1
+            progress.update()
+        progress.close()
+        logging.info(f"Contracted {num_nodes} nodes, adding {len(via)} shortcuts")
+
+        up_offsets, up_targets, up_weights = _csr(up, num_nodes, key=0, other=1)
+        down_offsets, down_sources, down_weights = _csr(down, num_nodes, key=1, other=0)
+        shortcut_array = np.array(
+            [(u, w, node) for (u, w), node in via.items()], dtype=np.int64
+        ).reshape(-1, 3)
+        return cls(
+            rank=rank,
+            up_offsets=up_offsets,
+            up_targets=up_targets,
+            up_weights=up_weights,
+            down_offsets=down_offsets,
+            down_sources=down_sources,
+            down_weights=down_weights,
+            shortcut_from=shortcut_array[:, 0],
+            shortcut_to=shortcut_array[:, 1],
+            shortcut_via=shortcut_array[:, 2],
+        )
+
+    @classmethod
+    def load_or_build(
+        cls,
+        graph: CompactRoadGraph,
+        metric: Metric,
+        cache_dir: Path = OSM_DIR,
+    ) -> "ContractionHierarchy":
+        """
+        Loads the hierarchy of a graph from the cache directory, building and caching it if it is missing.
+
+        :param graph: A compact graph corresponding to the road network
+        :param metric: The edge attribute the hierarchy preserves the distances of.
+        :param cache_dir: The directory the hierarchy is cached in, by default next to the OSM graphs.
+        :return: The contraction hierarchy of the graph.
+        """
+        file = cache_dir / f"ch-{graph.fingerprint()[:16]}-{metric}.npz"
+        if file.exists():
+            logging.info(f"Loading contraction hierarchy from {file}")
+            return cls.load(file)
+
+        logging.info(f"Building contraction hierarchy for the {metric} of the graph")
+        hierarchy = cls.build(graph, getattr(graph, metric))
+        hierarchy.save(file)
+        return hierarchy
+
+    @classmethod
+    def load(cls, file: Path) -> "ContractionHierarchy":
+        with np.load(file) as data:
+            return cls(**{name: data[name] for name in data.files})
+
+    def save(self, file: Path) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(file, **self.__getstate__())
+
+    def customise(self, exits: NDArray[np.int64]) -> "ExitQueries":
+        """
+        Prepares the queries to a set of exits with a backward search from all exits on the downward edges.
+
+        :param exits: The dense indices of the exits.
+        :return: The queries to the nearest of the exits.
+        """
+        offsets = self.down_offsets.tolist()
+        sources = self.down_sources.tolist()
+        weights = self.down_weights.tolist()
+        dist: dict[int, float] = {}
+        successor: dict[int, int] = {}
+        for node in exits.tolist():
+            dist[node] = 0.0
+        heap = [(0.0, node) for node in exits.tolist()]
+        while heap:
+            priority, node = hq.heappop(heap)
+            if priority > dist[node]:
+                continue  # This node has already been processed with a better path
+            for edge in range(offsets[node], offsets[node + 1]):
+                previous = sources[edge]
+                new_distance = priority + weights[edge]
+                if new_distance < dist.get(previous, float("inf")):
+                    dist[previous] = new_distance
+                    successor[previous] = node
+                    hq.heappush(heap, (new_distance, previous))
+        return ExitQueries(self, dist, successor)
+
+    def unpack(self, u: int, w: int) -> list[int]:
+        """
+        Returns the nodes of the original graph an edge of the hierarchy passes through, excluding u.
+        """
+        nodes: list[int] = []
+        stack = [(u, w)]
+        while stack:
+            start, end = stack.pop()
+            middle = self._via.get((start, end))
+            if middle is None:
+                nodes.append(end)
+            else:
+                stack.append((middle, end))
+                stack.append((start, middle))
+        return nodes
+
+    def route_to_safety(
+        self,
+        graph: CompactRoadGraph,
+        danger_zone_mask: NDArray[np.bool_],
+        origin_points: list[vertex],
+        safe_exits: SafeExitCatalogue | None = None,
+        expansions: dict[vertex, int] | None = None,
+    ) -> RouteDict:
+        """
+        Routes every origin point to the nearest exit with hierarchy queries.
+
+        :param graph: The compact graph the hierarchy was built from.
+        :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+        :param origin_points: A list of vertices given as OSM node IDs
+        :param safe_exits: The exits of the danger zone, found from the danger zone mask if None
+        :param expansions: If given, filled with the number of nodes settled by the query of every origin point.
+        :return: A dictionary from an origin point to a list of 1 path
+        """
+        mask = danger_zone_mask
+        if safe_exits is not None:
+            exits = np.array(
+                [graph.index[node] for node in safe_exits.exit_nodes()], dtype=np.int64
+            )
+        else:
+            exits = np.unique(
+                graph.targets[mask[graph.sources()] & ~mask[graph.targets]]
+            )
+        queries = self.customise(exits)
+        in_danger = mask.tolist()
+
+        routes: RouteDict = {}
+        searched: dict[vertex, int] = {}
+        for origin in tqdm(origin_points):
+            source = graph.index.get(origin)
+            if source is None:
+                logging.error(f"Origin node {origin} is not in the graph")
+                continue
+            if graph.out_degree(source) == 0:
+                logging.info(f"Node {origin} has no neighbors")
+                continue  # Skip if the origin node doesn't have neighbors
+            if not in_danger[source]:
+                routes[origin] = [[origin]]
+                continue  # The origin point is already safe
+
+            route = queries.route(source)
+            searched[origin] = queries.settled
+            if route is None:
+                logging.info(
+                    f"Node {origin} cannot reach any nodes outside the dangerzone"
+                )
+                continue
+            # With equally short routes, a route may pass another exit before the one it was found for
+            end = next(i for i, node in enumerate(route) if not in_danger[node])
+            routes[origin] = [graph.to_path(route[: end + 1])]
+
+        log_expansions("contraction hierarchy", searched)
+        if expansions is not None:
+            expansions.update(searched)
+        return routes
+
+
+class ExitQueries:
+    """
+    Queries from any node to the nearest of a set of exits in a contraction hierarchy. Every query is a forward
+    search on the upward edges, meeting the backward search of customise at the highest node of the route.
+    """
+
+    def __init__(
+        self,
+        hierarchy: ContractionHierarchy,
+        exit_dist: dict[int, float],
+        exit_successor: dict[int, int],
+    ) -> None:
+        """
+        :param hierarchy: The contraction hierarchy.
+        :param exit_dist: The distance from every node reached by the backward search to the nearest exit.
+        :param exit_successor: The next node towards the nearest exit of every node reached by the backward search.
+        """
+        self.hierarchy = hierarchy
+        self.exit_dist = exit_dist
+        self.exit_successor = exit_successor
+        # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+        self.offsets = hierarchy.up_offsets.tolist()
+        self.targets = hierarchy.up_targets.tolist()
+        self.weights = hierarchy.up_weights.tolist()
+        # Number of nodes settled by the last query
+        self.settled = 0
+
+    def distance(self, source: int) -> tuple[float, int | None, dict[int, int]]:
+        """
+        Runs the forward search from the source.
+
+        :return: The distance to the nearest exit, the highest node of the route or None if no exit can be reached,
+            and the predecessor of every node reached by the forward search.
+        """
+        dist = {source: 0.0}
+        predecessor: dict[int, int] = {}
+        best, meeting = float("inf"), None
+        heap = [(0.0, source)]
+        self.settled = 0
+        while heap:
+            priority, node = hq.heappop(heap)
+            if priority >= best:
+                break  # Every remaining route is at least as long
+            if priority > dist[node]:
+                continue  # This node has already been processed with a better path
+            self.settled += 1
+            remaining = self.exit_dist.get(node)
+            if remaining is not None and priority + remaining < best:
+                best, meeting = priority + remaining, node
+            for edge in range(self.offsets[node], self.offsets[node + 1]):
+                neighbour = self.targets[edge]
+                new_distance = priority + self.weights[edge]
+                if new_distance < dist.get(neighbour, float("inf")):
+                    dist[neighbour] = new_distance
+                    predecessor[neighbour] = node
+                    hq.heappush(heap, (new_distance, neighbour))
+        return best, meeting, predecessor
+
+    def route(self, source: int) -> list[int] | None:
+        """
+        Returns the route from the source to the nearest exit in the original graph, or None if there is none.
+        """
+        _, meeting, predecessor = self.distance(source)
+        if meeting is None:
+            return None
+
+        upward = [meeting]
+        while upward[-1] != source:
+            upward.append(predecessor[upward[-1]])
+        upward.reverse()
+        route = [source]
+        for u, w in zip(upward, upward[1:]):
+            route.extend(self.hierarchy.unpack(u, w))
+        node = meeting
+        while node in self.exit_successor:
+            successor = self.exit_successor[node]
+            route.extend(self.hierarchy.unpack(node, successor))
+            node = successor
+        return route
+
+
+def _csr(
+    edges: list[tuple[int, int, float]], num_nodes: int, key: int, other: int
+) -> tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.float64]]:
+    """
+    Groups edges by one of their nodes in CSR form.
+
+    :param edges: The edges as tuples of start node, end node and weight.
+    :param num_nodes: The number of nodes.
+    :param key: The position in the tuples of the node to group by.
+    :param other: The position in the tuples of the node to store.
+    :return: The offsets, the other node and the weight of every edge.
+    """
+    array = np.array([edge[:2] for edge in edges], dtype=np.int64).reshape(-1, 2)
+    weights = np.array([edge[2] for edge in edges], dtype=np.float64)
+    order = np.argsort(array[:, key], kind="stable")
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(array[:, key], minlength=num_nodes), out=offsets[1:])
+    return offsets, array[order, other], weights[order]
@@ -0,0 +1,84 @@
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+from numpy.typing import NDArray
+
+from data_loader.danger_zones import DangerZoneGeometry, as_danger_zone_geometry
+from routes.compact_graph import CompactRoadGraph
+from routes.route_utils import vertex
+
+
+class DangerZoneIndex:
+    """
+    Classifies every node of a road network as inside or outside the danger zone once, so routing can look up
+    the danger zone membership of a node without any geometric computation.
+    """
+
+    def __init__(
+        self,
+        nodes: list[vertex],
+        x: NDArray[np.float64],
+        y: NDArray[np.float64],
+        danger_zone: gpd.GeoDataFrame | DangerZoneGeometry,
+        index: dict[vertex, int] | None = None,
+    ) -> None:
+        """
+        :param nodes: The node IDs, defining the dense index of every node.
+        :param x: The longitude of every node, aligned with nodes.
+        :param y: The latitude of every node, aligned with nodes.
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s), or their geometry.
+        :param index: The dense index of every node ID, built from nodes if not given.
+        """
+        self.nodes = nodes
+        self.index = (
+            index if index is not None else {node: i for i, node in enumerate(nodes)}
+        )
+        # Points on the boundary count as inside, matching GeoDataFrame.intersects
+        self.mask: NDArray[np.bool_] = as_danger_zone_geometry(
+            danger_zone
+        ).intersects_xy(x, y)
+
+    @classmethod
+    def from_graph(
+        cls, G: nx.MultiDiGraph, danger_zone: gpd.GeoDataFrame
+    ) -> "DangerZoneIndex":
+        """
+        Builds the index for every node of a graph, using the node order of the graph as the dense index.
+
+        :param G: A graph corresponding to the road network
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+        :return: The danger zone index of the graph.
+        """
+        nodes = list(G.nodes)
+        x = np.fromiter((G.nodes[node]["x"] for node in nodes), np.float64, len(nodes))
+        y = np.fromiter((G.nodes[node]["y"] for node in nodes), np.float64, len(nodes))
+        return cls(nodes, x, y, danger_zone)
+
+    @classmethod
+    def from_compact_graph(
+        cls, graph: CompactRoadGraph, danger_zone: gpd.GeoDataFrame | DangerZoneGeometry
+    ) -> "DangerZoneIndex":
+        """
+        Builds the index for every node of a compact graph, sharing its dense index.
+
+        :param graph: A compact graph corresponding to the road network
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s), or their geometry.
+        :return: The danger zone index of the graph.
+        """
+        return cls(graph.nodes, graph.x, graph.y, danger_zone, graph.index)
+
+    def __contains__(self, node: vertex) -> bool:
+        """
+        Returns whether a node lies in the danger zone.
+        :raises KeyError: If the node is not part of the index.
+        """
+        return bool(self.mask[self.index[node]])
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def danger_zone_nodes(self) -> list[vertex]:
+        """
+        Returns the IDs of every node in the danger zone.
+        """
+        return [self.nodes[i] for i in np.flatnonzero(self.mask)]
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.route_utils import vertex
+from routes.safe_exits import SafeExitCatalogue
+
+
+@dataclass
+class DangerZoneSubgraph:
+    """
+    The part of a road network that routing to safety can explore: every danger zone node and every exit, the safe
+    nodes that can be reached directly from the danger zone. Since routes end at the first safe node, only the
+    edges leaving danger zone nodes are kept, so the exits form a set of sinks.
+    """
+
+    graph: CompactRoadGraph
+    """The compact subgraph, with its own dense node indices."""
+    mask: NDArray[np.bool_]
+    """Whether every node of the subgraph lies in the danger zone."""
+    exits: NDArray[np.int64]
+    """Dense indices in the subgraph of the exits."""
+
+    @classmethod
+    def from_index(
+        cls,
+        graph: CompactRoadGraph,
+        danger_zone_index: DangerZoneIndex,
+        origin_points: list[vertex] | None = None,
+        safe_exits: SafeExitCatalogue | None = None,
+    ) -> "DangerZoneSubgraph":
+        """
+        Extracts the danger zone subgraph of a graph.
+
+        :param graph: A compact graph corresponding to the road network
+        :param danger_zone_index: The danger zone membership of every node in the graph.
+        :param origin_points: Origin points to keep in the subgraph even if they are safe, along with their edges to
+            other nodes of the subgraph.
+        :param safe_exits: The exits of the scenario, found from the danger zone index if None.
+        :return: The danger zone subgraph.
+        """
+        mask = danger_zone_index.mask
+        sources = graph.sources()
+        is_exit = np.zeros(graph.num_nodes, dtype=np.bool_)
+        if safe_exits is not None:
+            is_exit[[graph.index[node] for node in safe_exits.exit_nodes()]] = True
+        else:
+            is_exit[graph.targets[mask[sources] & ~mask[graph.targets]]] = True
+
+        node_mask = mask | is_exit
+        edge_mask = mask[sources]
+        if origin_points:
+            origins = np.zeros(graph.num_nodes, dtype=np.bool_)
+            origins[
+                [graph.index[node] for node in origin_points if node in graph.index]
+            ] = True
+            node_mask |= origins
+            edge_mask |= origins[sources]
+
+        subgraph = graph.subgraph(node_mask, edge_mask)
+        return cls(
+            graph=subgraph,
+            mask=mask[node_mask],
+            exits=np.flatnonzero(is_exit[node_mask]),
+        )
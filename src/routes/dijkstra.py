@@ -0,0 +1,499 @@
+import heapq as hq
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numpy.typing import NDArray
+from tqdm import tqdm
+
+from routes.alternatives import PlateauAlternatives, SuffixCache
+from routes.compact_graph import CompactRoadGraph
+from routes.multi_source import (
+    build_safety_ball,
+    build_safety_tree,
+    follow_safety_tree,
+)
+from routes.path_store import PathStore
+from routes.route_utils import RouteDict, reconstruct_route, vertex
+
+SHARDS_PER_WORKER = 4
+"""Number of shards of origin points per worker process, trading path reuse within a shard for load balancing."""
+BALL_SHARE = 0.2
+"""Share of the nodes of the graph in the ball around safety that bidirectional searches meet."""
+
+SafetyTree = tuple[list[float], list[int | None]]
+"""The distance to safety and the next node towards safety of every node, as returned by build_safety_tree."""
+SafetyBall = tuple[list[float], list[int | None], float]
+"""The distance to safety and the next node towards safety of the nodes closest to safety, and the radius of the
+ball they form, as returned by build_safety_ball."""
+
+_worker_state: (
+    tuple[
+        CompactRoadGraph,
+        NDArray[np.bool_],
+        NDArray[np.float64],
+        int,
+        SafetyTree | None,
+        NDArray[np.float64] | None,
+        SafetyBall | None,
+    ]
+    | None
+) = None
+"""The graph, danger zone mask, edge weights, number of routes, safety tree, heuristic and safety ball of a worker
+process, set once per worker."""
+
+
+def dijkstra_to_safety(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    diversifying_routes: int = 1,
+    workers: int = 1,
+    heuristic: NDArray[np.float64] | None = None,
+    expansions: dict[vertex, int] | None = None,
+    bidirectional: bool = False,
+) -> RouteDict:
+    """
+    Runs a Dijkstra search from every origin point that stops at the first safe node it settles. Only edges leaving
+    a danger zone node are relaxed, so a route never passes through a safe node. If more than one route is
+    requested, dissimilar alternative routes are found with PlateauAlternatives instead.
+
+    With a heuristic, the searches are A* searches directed towards safety. The heuristic must be a consistent lower
+    bound on the distance to safety, see routes.heuristics, so the routes are the same as without it.
+
+    With bidirectional searches, a single search backwards from safety first finds the routes of the nodes closest
+    to safety, a ball around safety. The search from an origin point stops where it meets the ball, as soon as no
+    route leaving the nodes it has not settled can beat the best route through the ball. Every such route reaches
+    the ball from a node outside it, which is at least the radius of the ball away from safety. Origin points in
+    the ball need no search at all, which makes this fast for the many origin points near the danger zone edge.
+
+    :param graph: A compact graph corresponding to the road network
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :param origin_points: A list of vertices given as OSM node IDs
+    :param weights: The weight of every edge in the graph.
+    :param diversifying_routes: The number of routes to find for each origin point
+    :param workers: The number of processes to shard the origin points across.
+    :param heuristic: A lower bound on the distance from every node to safety, or None for Dijkstra searches.
+        Only used if a single route is requested.
+    :param expansions: If given, filled with the number of nodes settled by the search of every origin point that
+        was searched from, as opposed to reusing the route of an earlier search.
+    :param bidirectional: Whether the searches meet a ball around safety instead of searching until safety. Only
+        used if a single route is requested, and without a heuristic.
+    :return: A dictionary from an origin point to a list of 1 or more paths
+    """
+    safety_tree = None
+    ball = None
+    # The safety tree and ball are shared by all origin points, so they are built once before sharding
+    if diversifying_routes > 1:
+        safety_tree = build_safety_tree(graph, danger_zone_mask, weights)
+    elif bidirectional:
+        ball = build_safety_ball(
+            graph,
+            danger_zone_mask,
+            weights,
+            max_settled=max(1, int(BALL_SHARE * graph.num_nodes)),
+        )
+    if workers > 1 and len(origin_points) > workers:
+        routes, searched = _dijkstra_to_safety_parallel(
+            graph,
+            danger_zone_mask,
+            origin_points,
+            weights,
+            diversifying_routes,
+            workers,
+            safety_tree,
+            heuristic,
+            ball,
+        )
+    else:
+        routes, searched = _route_origin_points(
+            graph,
+            danger_zone_mask,
+            origin_points,
+            weights,
+            diversifying_routes,
+            safety_tree,
+            heuristic,
+            ball,
+        )
+
+    kind = "A*" if heuristic is not None else "Dijkstra"
+    if ball is not None:
+        kind = "bidirectional"
+    log_expansions(kind, searched)
+    if expansions is not None:
+        expansions.update(searched)
+    return routes
+
+
+def log_expansions(kind: str, expansions: dict[vertex, int]) -> None:
+    """
+    Logs the mean and maximum number of nodes settled by the searches of the origin points.
+
+    :param kind: The kind of search, as shown in the log.
+    :param expansions: The number of nodes settled by the search of every origin point that was searched from.
+    """
+    if not expansions:
+        return
+    logging.info(
+        f"{len(expansions)} {kind} searches settled {sum(expansions.values()) / len(expansions):.1f} nodes on "
+        f"average and {max(expansions.values())} at most"
+    )
+
+
+def _dijkstra_to_safety_parallel(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    diversifying_routes: int,
+    workers: int,
+    safety_tree: SafetyTree | None,
+    heuristic: NDArray[np.float64] | None,
+    ball: SafetyBall | None,
+) -> tuple[RouteDict, dict[vertex, int]]:
+    """
+    Splits the origin points into contiguous shards that are routed in a process pool. Every worker receives the
+    graph once through the pool initializer, and the shards are merged in order so the result does not depend on
+    the scheduling of the workers.
+    """
+    num_shards = min(len(origin_points), workers * SHARDS_PER_WORKER)
+    shard_size = -(-len(origin_points) // num_shards)  # ceiling division
+    shards = [
+        origin_points[i : i + shard_size]
+        for i in range(0, len(origin_points), shard_size)
+    ]
+    logging.info(
+        f"Routing {len(origin_points)} origin points in {len(shards)} shards on {workers} processes"
+    )
+
+    routes = PathStore()
+    expansions: dict[vertex, int] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(
+            graph,
+            danger_zone_mask,
+            weights,
+            diversifying_routes,
+            safety_tree,
+            heuristic,
+            ball,
+        ),
+    ) as executor:
+        for shard_routes, shard_expansions in tqdm(
+            executor.map(_route_shard, shards), total=len(shards)
+        ):
+            routes.merge(shard_routes)
+            expansions.update(shard_expansions)
+    return routes, expansions
+
+
+def _init_worker(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    diversifying_routes: int,
+    safety_tree: SafetyTree | None,
+    heuristic: NDArray[np.float64] | None,
+    ball: SafetyBall | None,
+) -> None:
+    global _worker_state
+    _worker_state = (
+        graph,
+        danger_zone_mask,
+        weights,
+        diversifying_routes,
+        safety_tree,
+        heuristic,
+        ball,
+    )
+
+
+def _route_shard(origin_points: list[vertex]) -> tuple[RouteDict, dict[vertex, int]]:
+    assert _worker_state is not None, "Worker process has not been initialised"
+    (
+        graph,
+        danger_zone_mask,
+        weights,
+        diversifying_routes,
+        safety_tree,
+        heuristic,
+        ball,
+    ) = _worker_state
+    return _route_origin_points(
+        graph,
+        danger_zone_mask,
+        origin_points,
+        weights,
+        diversifying_routes,
+        safety_tree,
+        heuristic,
+        ball,
+        show_progress=False,
+    )
+
+
+def _route_origin_points(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    diversifying_routes: int,
+    safety_tree: SafetyTree | None,
+    heuristic: NDArray[np.float64] | None,
+    ball: SafetyBall | None,
+    show_progress: bool = True,
+) -> tuple[RouteDict, dict[vertex, int]]:
+    if ball is not None:
+        return _bidirectional_to_safety_serial(
+            graph, danger_zone_mask, origin_points, weights, ball, show_progress
+        )
+    if safety_tree is None:
+        return _dijkstra_to_safety_serial(
+            graph, danger_zone_mask, origin_points, weights, heuristic, show_progress
+        )
+    routes = _alternatives_to_safety_serial(
+        graph,
+        danger_zone_mask,
+        origin_points,
+        weights,
+        diversifying_routes,
+        safety_tree,
+        show_progress,
+    )
+    return routes, {}
+
+
+def _alternatives_to_safety_serial(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    diversifying_routes: int,
+    safety_tree: SafetyTree,
+    show_progress: bool = True,
+) -> RouteDict:
+    # Only the suffixes from origin points are ever looked up
+    suffix_cache = SuffixCache(
+        nodes=[graph.index[node] for node in origin_points if node in graph.index]
+    )
+    alternatives = PlateauAlternatives(
+        graph, danger_zone_mask, weights, *safety_tree, suffix_cache=suffix_cache
+    )
+    routes: RouteDict = {}
+
+    for origin in tqdm(origin_points, disable=not show_progress):
+        source = graph.index.get(origin)
+        if source is None:
+            logging.error(f"Origin node {origin} is not in the graph")
+            continue
+        if graph.out_degree(source) == 0:
+            logging.info(f"Node {origin} has no neighbors")
+            continue  # Skip if the origin node doesn't have neighbors
+
+        found = alternatives.routes(source, diversifying_routes)
+        if not found:
+            logging.info(f"Node {origin} cannot reach any nodes outside the dangerzone")
+            continue
+        routes[origin] = [graph.to_path(route) for route in found]
+
+    logging.info(f"Reused cached routes for {alternatives.cache_hits} origin points")
+    return routes
+
+
+def _dijkstra_to_safety_serial(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    heuristic: NDArray[np.float64] | None,
+    show_progress: bool = True,
+) -> tuple[RouteDict, dict[vertex, int]]:
+    has_path_been_calculated = dict((node, False) for node in origin_points)
+    # Routes through the same nodes share their suffix in the store instead of each copying it
+    routes = PathStore()
+    expansions: dict[vertex, int] = {}
+
+    # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+    offsets = graph.offsets.tolist()
+    targets = graph.targets.tolist()
+    edge_weights = weights.tolist()
+    in_danger = danger_zone_mask.tolist()
+    potential = heuristic.tolist() if heuristic is not None else [0.0] * graph.num_nodes
+
+    # The search state is allocated once and only the nodes touched by a search are reset after it, so the cost
+    # of a search is proportional to the region it explores rather than to the size of the graph
+    sptSet = [False] * graph.num_nodes
+    node_priority = [float("inf")] * graph.num_nodes
+    predecessor: list[int | None] = [None] * graph.num_nodes
+    touched: list[int] = []
+
+    for origin in tqdm(origin_points, disable=not show_progress):
+        if has_path_been_calculated[origin]:
+            continue  # path has already been calculated in another iteration
+
+        source = graph.index.get(origin)
+        if source is None:
+            logging.error(f"Origin node {origin} is not in the graph")
+            continue
+        if graph.out_degree(source) == 0:
+            logging.info(f"Node {origin} has no neighbors")
+            continue  # Skip if the origin node doesn't have neighbors
+
+        for node in touched:
+            sptSet[node] = False
+            node_priority[node] = float("inf")
+            predecessor[node] = None
+        touched.clear()
+
+        node_priority[source] = 0.0
+        touched.append(source)
+        # The heap is ordered by the distance plus the potential, making the search an A* search with a heuristic
+        dist: list[tuple[float, int]] = [(potential[source], source)]
+        settled = 0
+
+        while dist:
+            _, smallest_node = hq.heappop(dist)
+            if sptSet[smallest_node]:
+                continue  # This node has already been processed with a better path
+            sptSet[smallest_node] = True
+            settled += 1
+            priority = node_priority[smallest_node]
+
+            if in_danger[smallest_node]:
+                for edge in range(offsets[smallest_node], offsets[smallest_node + 1]):
+                    neighbour = targets[edge]
+                    new_distance = priority + edge_weights[edge]
+                    if new_distance < node_priority[neighbour]:
+                        if node_priority[neighbour] == float("inf"):
+                            touched.append(neighbour)
+                        node_priority[neighbour] = new_distance
+                        predecessor[neighbour] = smallest_node
+                        hq.heappush(
+                            dist, (new_distance + potential[neighbour], neighbour)
+                        )
+                continue
+
+            # We have found the best route to a node outside the danger zone
+            final_route = graph.to_path(reconstruct_route(predecessor, smallest_node))
+            _store_route(routes, final_route, has_path_been_calculated)
+            break  # there is no need to find other routes for this origin point
+
+        expansions[origin] = settled
+        logging.debug(f"Search from {origin} settled {settled} nodes")
+        if not has_path_been_calculated[origin]:
+            logging.info(f"Node {origin} cannot reach any nodes outside the dangerzone")
+    return routes, expansions
+
+
+def _bidirectional_to_safety_serial(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+    weights: NDArray[np.float64],
+    ball: SafetyBall,
+    show_progress: bool = True,
+) -> tuple[RouteDict, dict[vertex, int]]:
+    has_path_been_calculated = dict((node, False) for node in origin_points)
+    routes = PathStore()
+    expansions: dict[vertex, int] = {}
+    ball_dist, ball_successor, radius = ball
+
+    # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+    offsets = graph.offsets.tolist()
+    targets = graph.targets.tolist()
+    edge_weights = weights.tolist()
+    in_danger = danger_zone_mask.tolist()
+
+    sptSet = [False] * graph.num_nodes
+    node_priority = [float("inf")] * graph.num_nodes
+    predecessor: list[int | None] = [None] * graph.num_nodes
+    touched: list[int] = []
+
+    for origin in tqdm(origin_points, disable=not show_progress):
+        if has_path_been_calculated[origin]:
+            continue  # path has already been calculated in another iteration
+
+        source = graph.index.get(origin)
+        if source is None:
+            logging.error(f"Origin node {origin} is not in the graph")
+            continue
+        if graph.out_degree(source) == 0:
+            logging.info(f"Node {origin} has no neighbors")
+            continue  # Skip if the origin node doesn't have neighbors
+
+        for node in touched:
+            sptSet[node] = False
+            node_priority[node] = float("inf")
+            predecessor[node] = None
+        touched.clear()
+
+        node_priority[source] = 0.0
+        touched.append(source)
+        dist: list[tuple[float, int]] = [(0.0, source)]
+        settled = 0
+        # The best route found so far ends where the search met the ball, or at a safe node outside it
+        best = ball_dist[source] if in_danger[source] else 0.0
+        meeting = source if best < float("inf") else None
+
+        while dist:
+            priority, smallest_node = hq.heappop(dist)
+            if sptSet[smallest_node]:
+                continue  # This node has already been processed with a better path
+            if priority + radius >= best:
+                break  # Routes through nodes that have not been settled are at least as long
+            sptSet[smallest_node] = True
+            settled += 1
+
+            for edge in range(offsets[smallest_node], offsets[smallest_node + 1]):
+                neighbour = targets[edge]
+                new_distance = priority + edge_weights[edge]
+                if new_distance >= node_priority[neighbour]:
+                    continue
+                if node_priority[neighbour] == float("inf"):
+                    touched.append(neighbour)
+                node_priority[neighbour] = new_distance
+                predecessor[neighbour] = smallest_node
+                if in_danger[neighbour] and ball_dist[neighbour] == float("inf"):
+                    hq.heappush(dist, (new_distance, neighbour))
+                    continue
+                # The search does not continue into the ball or past safety, whose routes are already known
+                remaining = ball_dist[neighbour] if in_danger[neighbour] else 0.0
+                if new_distance + remaining < best:
+                    best = new_distance + remaining
+                    meeting = neighbour
+
+        expansions[origin] = settled
+        if meeting is None:
+            logging.info(f"Node {origin} cannot reach any nodes outside the dangerzone")
+            continue
+        # Safe nodes outside the ball have no successor, so the route ends there
+        route = reconstruct_route(predecessor, meeting)
+        route += follow_safety_tree(ball_successor, meeting)[1:]
+        _store_route(routes, graph.to_path(route), has_path_been_calculated)
+    return routes, expansions
+
+
+def _store_route(
+    routes: PathStore,
+    final_route: list[vertex],
+    has_path_been_calculated: dict[vertex, bool],
+) -> None:
+    """
+    Stores the route of an origin point, and the rest of the route for every other origin point on it.
+    """
+    routes.add(final_route)
+    has_path_been_calculated[final_route[0]] = True
+    for i in range(
+        len(final_route) - 1
+    ):  # -1 since the last node is outside the danger zone and therefore does not need a path
+        if (
+            final_route[i] in has_path_been_calculated
+            and not has_path_been_calculated[final_route[i]]
+        ):
+            routes.add_origin(final_route[i])
+            # we take the route from i and forward
+            has_path_been_calculated[final_route[i]] = True
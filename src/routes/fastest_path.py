@@ -1,150 +1,98 @@
-import heapq as hq
 import logging
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Mapping
 
 import geopandas as gpd
 import networkx as nx
 import zope.interface
-from tqdm import tqdm
 
+from data_loader.osm import OSM_DIR
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.contraction import ContractionHierarchy
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.dijkstra import dijkstra_to_safety
+from routes.heuristics import Metric, Search, search_heuristic
 from routes.route_algo import RouteAlgo
-from routes.route_utils import (
-    get_final_route,
-    is_in_dangerzone,
-    path,
-    update_priority,
-    vertex,
-)
-from utils import kmh_to_ms
+from routes.route_utils import path, vertex
+from routes.safe_exits import SafeExitCatalogue
 
 
 @zope.interface.implementer(RouteAlgo)
 class FastestPath:
-    def __init__(self) -> None:
+    def __init__(self, search: Search = "dijkstra", cache_dir: Path = OSM_DIR) -> None:
+        """
+        :param search: How to search for routes to safety. The A* searches, bidirectional searches and
+            contraction hierarchy queries find equally good routes as Dijkstra, but settle fewer nodes. Dijkstra is
+            used instead of bidirectional searches or a contraction hierarchy if more than one route is requested.
+        :param cache_dir: The directory the landmark tables and contraction hierarchies are cached in.
+        """
         self.title = "Dijkstra - Fastest Path"
+        self.metric: Metric = "travel_time"
+        self.search = search
+        self.cache_dir = cache_dir
+        # Number of nodes settled by the search of every origin point in the last call to route_to_safety
+        self.expansions: dict[vertex, int] = {}
 
     def route_to_safety(
         self,
         origin_points: list[vertex],
         danger_zone: gpd.GeoDataFrame,
-        G: nx.MultiDiGraph,
+        G: nx.MultiDiGraph | CompactRoadGraph,
         diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
     ) -> Dict[vertex, list[path]]:
         """
         Routes a list of origin points to the nearest safe location.
 
-        :param origin_points: A list of vertices given as str IDs
+        :param origin_points: A list of vertices given as OSM node IDs
         :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
         :param G: A graph corresponding to the road network
         :param diversifying_routes: The number of routes to find for each origin point
+        :param workers: The number of processes to route the origin points with
+        :param safe_exits: The exits of the danger zone, found from the danger zone if None
+        :param demand: Ignored, routes do not depend on traffic
+        :param departure_window: Ignored, routes do not depend on the departure time
         :return: A list of routes where each route corresponds to the origin point at the same index.
         """
-        should_reuse_paths = diversifying_routes == 1
-        has_path_been_calculated = dict((node, False) for node in origin_points)
-        routes: dict[vertex, list[path]] = {}
-
         logging.info("Routing fastest path to safety for all origin points")
-
-        for origin in tqdm(origin_points):
-            amount_of_routes = 0
-            if has_path_been_calculated[origin] and should_reuse_paths:
-                continue  # path has already been calculated in another iteration
-
-            try:
-                if len(list(G.neighbors(origin))) == 0:
-                    logging.info(f"Node {origin} has no neighbors")
-                    continue  # Skip if the origin node doesn't have neighbors
-            except nx.NetworkXError:
-                logging.error(f"Origin node {origin} is not in the graph")
-                continue
-
-            sptSet = dict((node, False) for node in list(G.nodes))
-            dist: list[tuple[float, str]] = [(float("inf"), node) for node in G.nodes]
-            node_priority = {node: float("inf") for node in G.nodes}
-            hq.heapify(dist)
-            predecessor: dict[str, str | None] = {
-                node: None for node in G.nodes
-            }  # To track the fastest path
-
-            update_priority(dist, node_priority, origin, 0)
-            while dist:
-                priority, smallest_node = hq.heappop(
-                    dist
-                )  # popping the node with the current fastest path to origin
-                if priority == float("inf"):
-                    logging.info(
-                        f"Node {origin} cannot reach any nodes outside the dangerzone"
-                    )
-                    break
-                if (
-                    priority == node_priority[smallest_node]
-                ):  # Only use values that are not outdated
-                    if not sptSet[smallest_node]:
-                        sptSet[smallest_node] = True
-                        for _, neighbour, edge_data in G.edges(
-                            smallest_node, data=True
-                        ):  # looping through all adjacent vertices
-                            length = edge_data.get(
-                                "length", float("inf")
-                            )  # Default weight to inf, weight of edge between smallest_node and neighbour
-
-                            maxspeed = edge_data.get(
-                                "maxspeed", 50
-                            )  # speed limit km/h, default 50
-                            maxspeed = (
-                                maxspeed[0] if isinstance(maxspeed, list) else maxspeed
-                            )  # take the first speed limit in case there are more
-                            try:
-                                maxspeed = kmh_to_ms(
-                                    float(maxspeed)
-                                )  # converting km/h to m/s
-                            except ValueError:
-                                logging.error(
-                                    f"Maxspeed with value {maxspeed} cannot be parsed as an int"
-                                )
-                                maxspeed = kmh_to_ms(
-                                    50
-                                )  # default to 50 if parsing fails
-
-                            weight = length / maxspeed
-
-                            new_distance = priority + weight
-                            if is_in_dangerzone(smallest_node, danger_zone, G):
-                                if new_distance < node_priority[neighbour]:
-                                    update_priority(
-                                        dist, node_priority, neighbour, new_distance
-                                    )
-                                    predecessor[neighbour] = smallest_node
-                else:
-                    # This node has already been processed with a better path
-                    continue
-                if not is_in_dangerzone(
-                    smallest_node, danger_zone, G
-                ):  # We have found the fastest route to node outside danger zone
-                    final_route, amount_of_routes = get_final_route(
-                        amount_of_routes=amount_of_routes,
-                        predecessor=predecessor,
-                        smallest_node=smallest_node,
-                        origin=origin,
-                    )
-
-                    if final_route[0] in routes:
-                        routes[final_route[0]].append(final_route)
-                    else:
-                        routes[final_route[0]] = [final_route]
-
-                    if should_reuse_paths:
-                        has_path_been_calculated[origin] = True
-                        for i in range(
-                            len(final_route) - 1
-                        ):  # -1 since the last node is outside the danger zone and therefore does not need a path
-                            if (
-                                final_route[i] in has_path_been_calculated
-                                and not has_path_been_calculated[final_route[i]]
-                            ):
-                                routes[final_route[i]] = [final_route[i:]]
-                                # we take the route from i and forward
-                                has_path_been_calculated[final_route[i]] = True
-                    if amount_of_routes >= diversifying_routes:
-                        break  # there is no need to find other routes for this origin point
+        graph = as_compact_graph(G)
+        self.expansions = {}
+        danger_zone_index = DangerZoneIndex.from_compact_graph(graph, danger_zone)
+        if self.search == "ch" and diversifying_routes == 1:
+            hierarchy = ContractionHierarchy.load_or_build(
+                graph, self.metric, self.cache_dir
+            )
+            ch_routes: Dict[vertex, list[path]] = hierarchy.route_to_safety(
+                graph,
+                danger_zone_index.mask,
+                origin_points,
+                safe_exits,
+                self.expansions,
+            )
+            return ch_routes
+        subgraph = DangerZoneSubgraph.from_index(
+            graph, danger_zone_index, origin_points, safe_exits
+        )
+        routes: Dict[vertex, list[path]] = dijkstra_to_safety(
+            subgraph.graph,
+            subgraph.mask,
+            origin_points,
+            subgraph.graph.travel_time,
+            diversifying_routes,
+            workers,
+            heuristic=search_heuristic(
+                self.search,
+                graph,
+                subgraph,
+                danger_zone,
+                self.metric,
+                self.cache_dir,
+            ),
+            expansions=self.expansions,
+            bidirectional=self.search == "bidirectional",
+        )
         return routes
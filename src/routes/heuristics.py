@@ -0,0 +1,250 @@
+import heapq as hq
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from numpy.typing import NDArray
+
+from data_loader.osm import OSM_DIR
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from utils import kmh_to_ms
+
+Search = Literal["dijkstra", "astar", "alt", "ch", "bidirectional"]
+"""How routers search for routes to safety: Dijkstra, A* towards the danger zone boundary, A* with landmarks,
+queries on a contraction hierarchy, or Dijkstra meeting a ball around safety."""
+Metric = Literal["travel_time", "length"]
+"""The edge attribute of a CompactRoadGraph that routes minimise."""
+
+LANDMARK_COUNT = 8
+"""Number of landmarks selected for A* with landmarks (ALT)."""
+BOUNDARY_SLACK = 0.99
+"""Factor applied to projected distances to the danger zone boundary, keeping them below the distances along the
+roads despite the scale distortion of the projection."""
+
+
+def search_heuristic(
+    search: Search,
+    graph: CompactRoadGraph,
+    subgraph: DangerZoneSubgraph,
+    danger_zone: gpd.GeoDataFrame,
+    metric: Metric,
+    landmark_dir: Path = OSM_DIR,
+) -> NDArray[np.float64] | None:
+    """
+    Returns the heuristic for the searches of a router, a consistent lower bound on the distance to safety.
+
+    :param search: How the router searches for routes to safety.
+    :param graph: The compact graph of the whole road network, which landmarks are selected from.
+    :param subgraph: The danger zone subgraph that is searched.
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+    :param metric: The edge attribute the routes minimise.
+    :param landmark_dir: The directory landmark tables are cached in.
+    :return: The lower bound for every node of the subgraph, or None for searches without a heuristic.
+    """
+    match search:
+        case "dijkstra" | "ch" | "bidirectional":
+            return None
+        case "astar":
+            bound = boundary_distance(subgraph.graph, subgraph.mask, danger_zone)
+            if metric == "length":
+                return bound
+            # No edge of the subgraph is traversed faster than its highest speed limit
+            max_speed = kmh_to_ms(int(subgraph.graph.speed_limit.max(initial=1)))
+            result: NDArray[np.float64] = bound / max_speed
+            return result
+        case "alt":
+            landmarks = Landmarks.load_or_compute(graph, metric, cache_dir=landmark_dir)
+            in_graph = np.array(
+                [graph.index[node] for node in subgraph.graph.nodes], dtype=np.int64
+            )
+            return landmarks.lower_bound(in_graph[subgraph.exits])[in_graph]
+    raise ValueError(f"Unknown search {search}")
+
+
+def boundary_distance(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    danger_zone: gpd.GeoDataFrame,
+) -> NDArray[np.float64]:
+    """
+    Returns a lower bound on the distance in meters from every danger zone node to safety: the straight line
+    distance to the danger zone boundary, which every route to safety crosses.
+
+    :param graph: A compact graph corresponding to the road network
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+    :return: The distance of every node, 0 for safe nodes.
+    """
+    distance = np.zeros(graph.num_nodes, dtype=np.float64)
+    if danger_zone.crs is None:
+        logging.warning("The danger zone has no CRS, so A* searches fall back to 0")
+        return distance
+
+    points = gpd.GeoSeries(
+        gpd.points_from_xy(graph.x[danger_zone_mask], graph.y[danger_zone_mask]),
+        crs=danger_zone.crs,
+    )
+    crs = points.estimate_utm_crs() if len(points) else danger_zone.crs
+    boundary = shapely.union_all(danger_zone.to_crs(crs).geometry.values).boundary
+    distance[danger_zone_mask] = BOUNDARY_SLACK * shapely.distance(
+        boundary, points.to_crs(crs).values
+    )
+    return distance
+
+
+@dataclass
+class Landmarks:
+    """
+    The distances from and to a few landmark nodes of a graph, bounding the distance between any two nodes by the
+    triangle inequality (ALT). The tables only depend on the graph, so they are cached on disk and shared by every
+    danger zone on the same graph.
+    """
+
+    landmarks: NDArray[np.int64]
+    """Dense index of every landmark."""
+    from_landmark: NDArray[np.float64]
+    """Distance from every landmark to every node, with shape (number of landmarks, number of nodes)."""
+    to_landmark: NDArray[np.float64]
+    """Distance from every node to every landmark, with shape (number of landmarks, number of nodes)."""
+
+    @classmethod
+    def compute(
+        cls,
+        graph: CompactRoadGraph,
+        weights: NDArray[np.float64],
+        count: int = LANDMARK_COUNT,
+    ) -> "Landmarks":
+        """
+        Selects landmarks far apart from each other and computes their distance tables.
+
+        :param graph: A compact graph corresponding to the road network
+        :param weights: The weight of every edge in the graph.
+        :param count: The number of landmarks.
+        :return: The landmarks of the graph.
+        """
+        reverse_offsets, reverse_sources, reverse_edges = graph.reverse_csr()
+        reverse_weights = weights[reverse_edges]
+        from_landmark: list[NDArray[np.float64]] = []
+        to_landmark: list[NDArray[np.float64]] = []
+        landmarks: list[int] = []
+        # Every landmark is the node farthest from those chosen before it, starting from the node farthest from node 0
+        spread = _distances(graph.offsets, graph.targets, weights, 0)
+        for _ in range(min(count, graph.num_nodes)):
+            candidates = np.where(np.isfinite(spread), spread, -1.0)
+            candidates[landmarks] = -1.0
+            landmark = int(np.argmax(candidates))
+            distances = _distances(graph.offsets, graph.targets, weights, landmark)
+            spread = np.minimum(spread, distances) if landmarks else distances
+            landmarks.append(landmark)
+            from_landmark.append(distances)
+            to_landmark.append(
+                _distances(reverse_offsets, reverse_sources, reverse_weights, landmark)
+            )
+
+        return cls(
+            landmarks=np.array(landmarks, dtype=np.int64),
+            from_landmark=np.array(from_landmark, dtype=np.float64),
+            to_landmark=np.array(to_landmark, dtype=np.float64),
+        )
+
+    @classmethod
+    def load_or_compute(
+        cls,
+        graph: CompactRoadGraph,
+        metric: Metric,
+        count: int = LANDMARK_COUNT,
+        cache_dir: Path = OSM_DIR,
+    ) -> "Landmarks":
+        """
+        Loads the landmarks of a graph from the cache directory, computing and caching them if they are missing.
+
+        :param graph: A compact graph corresponding to the road network
+        :param metric: The edge attribute the distances are measured in.
+        :param count: The number of landmarks.
+        :param cache_dir: The directory the landmark tables are cached in, by default next to the OSM graphs.
+        :return: The landmarks of the graph.
+        """
+        file = cache_dir / f"landmarks-{graph.fingerprint()[:16]}-{metric}-{count}.npz"
+        if file.exists():
+            logging.info(f"Loading landmarks from {file}")
+            return cls.load(file)
+
+        logging.info(f"Computing {count} landmarks for the {metric} of the graph")
+        landmarks = cls.compute(graph, getattr(graph, metric), count)
+        landmarks.save(file)
+        return landmarks
+
+    @classmethod
+    def load(cls, file: Path) -> "Landmarks":
+        with np.load(file) as data:
+            return cls(
+                landmarks=data["landmarks"],
+                from_landmark=data["from_landmark"],
+                to_landmark=data["to_landmark"],
+            )
+
+    def save(self, file: Path) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            file,
+            landmarks=self.landmarks,
+            from_landmark=self.from_landmark,
+            to_landmark=self.to_landmark,
+        )
+
+    def lower_bound(self, targets: NDArray[np.int64]) -> NDArray[np.float64]:
+        """
+        Returns a consistent lower bound on the distance from every node to the nearest of the targets.
+
+        :param targets: The dense indices of the targets, e.g. the exits of a danger zone.
+        :return: The lower bound for every node of the graph, infinite for nodes that cannot reach any target.
+        """
+        if len(targets) == 0:
+            return np.full(self.from_landmark.shape[1], np.inf)
+        # d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L) for every landmark L and target t
+        with np.errstate(invalid="ignore"):
+            ahead = (
+                self.from_landmark[:, targets].min(axis=1, keepdims=True)
+                - self.from_landmark
+            )
+            behind = self.to_landmark - self.to_landmark[:, targets].max(
+                axis=1, keepdims=True
+            )
+        # Differences of two infinite distances bound nothing, and are ignored by fmax as NaN
+        bound = np.fmax(np.fmax.reduce(ahead, axis=0), np.fmax.reduce(behind, axis=0))
+        result: NDArray[np.float64] = np.maximum(np.nan_to_num(bound, nan=0.0), 0.0)
+        return result
+
+
+def _distances(
+    offsets: NDArray[np.int64],
+    targets: NDArray[np.int64],
+    weights: NDArray[np.float64],
+    source: int,
+) -> NDArray[np.float64]:
+    """
+    Returns the distance from the source to every node of a graph in CSR form, infinite for unreachable nodes.
+    """
+    # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+    offset_list = offsets.tolist()
+    target_list = targets.tolist()
+    edge_weights = weights.tolist()
+    dist = [float("inf")] * (len(offset_list) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        priority, node = hq.heappop(heap)
+        if priority > dist[node]:
+            continue  # This node has already been processed with a better path
+        for edge in range(offset_list[node], offset_list[node + 1]):
+            neighbour = target_list[edge]
+            new_distance = priority + edge_weights[edge]
+            if new_distance < dist[neighbour]:
+                dist[neighbour] = new_distance
+                hq.heappush(heap, (new_distance, neighbour))
+    return np.array(dist, dtype=np.float64)
@@ -0,0 +1,273 @@
+import heapq as hq
+import logging
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Mapping
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import zope.interface
+from numpy.typing import NDArray
+from slugify import slugify
+
+from data_loader import DATA_DIR
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.fastest_path import FastestPath
+from routes.route_algo import RouteAlgo
+from routes.route_utils import RouteDict, path, vertex
+from routes.safe_exits import SafeExitCatalogue
+from routes.shortest_path import ShortestPath
+
+ROUTING_CACHE_DIR = DATA_DIR / "routing_cache"
+
+
+@dataclass
+class RoutingSnapshot:
+    """
+    The routes of a run together with the graph and danger zone they were found for, kept between runs so a run with
+    a changed danger zone can reuse the routes that the change cannot affect.
+    """
+
+    node_digests: dict[vertex, int]
+    """The digest of every node of the graph the routes were found on, see node_digests."""
+    origin_to_paths: RouteDict
+    """The routes of every origin point."""
+
+    @classmethod
+    def load(cls, file: Path) -> "RoutingSnapshot | None":
+        """
+        Loads a snapshot, or returns None if there is none.
+        """
+        if not file.exists():
+            return None
+        with open(file, "rb") as f:
+            snapshot: RoutingSnapshot = pickle.load(f)
+        if not hasattr(snapshot, "node_digests"):
+            return None  # Written by an earlier version
+        return snapshot
+
+    def save(self, file: Path) -> None:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with open(file, "wb") as f:
+            pickle.dump(self, f)
+
+
+@zope.interface.implementer(RouteAlgo)
+class IncrementalRouting:
+    """
+    Wraps a router that sends every origin point to its nearest exit, so that a run only reroutes the origin points
+    a change of the danger zone can affect, reusing the routes of the previous run for all others.
+
+    A search from an origin point only looks at the nodes closer to it than the end of its route. If none of them
+    changed between inside and outside the danger zone, including the end of the route, the search would find the
+    same route again. The distance from every node to the nearest changed node is found with a single backward
+    search from the changed nodes, bounded by the longest cached route.
+
+    Nodes are matched between runs by their OSM node ID, as every run loads the road network around its own danger
+    zone. A node also counts as changed if its outgoing edges changed or it was not in the previous graph, so only
+    the routes near the edge of the loaded area or near a change of the danger zone are found again.
+    """
+
+    def __init__(
+        self,
+        router: FastestPath | ShortestPath,
+        cache_dir: Path = ROUTING_CACHE_DIR,
+    ) -> None:
+        """
+        :param router: The router to wrap.
+        :param cache_dir: The directory the routes of the previous run are kept in.
+        """
+        self.router = router
+        self.title = router.title
+        self.snapshot_file = cache_dir / f"{slugify(router.title)}.pkl"
+
+    def route_to_safety(
+        self,
+        origin_points: list[vertex],
+        danger_zone: gpd.GeoDataFrame,
+        G: nx.MultiDiGraph | CompactRoadGraph,
+        diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
+    ) -> Dict[vertex, list[path]]:
+        """
+        Routes the origin points with the wrapped router, reusing the routes of the previous run where possible.
+        Routes are only reused with a single route per origin point, as alternative routes depend on a larger part
+        of the graph.
+
+        See RouteAlgo.route_to_safety for the parameters.
+        """
+        graph = as_compact_graph(G)
+        weights = getattr(graph, self.router.metric)
+        mask = DangerZoneIndex.from_compact_graph(graph, danger_zone).mask
+
+        reused: RouteDict = {}
+        to_route = origin_points
+        snapshot = RoutingSnapshot.load(self.snapshot_file)
+        if diversifying_routes == 1 and snapshot is not None:
+            reused, to_route = reusable_routes(
+                graph, weights, snapshot, mask, origin_points
+            )
+            logging.info(
+                f"Reusing the routes of {len(reused)} origin points, rerouting {len(to_route)}"
+            )
+
+        routes: Dict[vertex, list[path]] = self.router.route_to_safety(
+            to_route,
+            danger_zone,
+            graph,
+            diversifying_routes,
+            workers,
+            safe_exits,
+            demand,
+            departure_window,
+        )
+        routes.update(reused)
+        if diversifying_routes == 1:
+            RoutingSnapshot(node_digests(graph, weights, mask), routes).save(
+                self.snapshot_file
+            )
+        return routes
+
+
+def incremental(algorithm: RouteAlgo) -> RouteAlgo:
+    """
+    Wraps a router in IncrementalRouting if its routes can be reused, otherwise returns it unchanged.
+    """
+    if isinstance(algorithm, (FastestPath, ShortestPath)):
+        return IncrementalRouting(algorithm)
+    return algorithm
+
+
+def reusable_routes(
+    graph: CompactRoadGraph,
+    weights: NDArray[np.float64],
+    snapshot: RoutingSnapshot,
+    danger_zone_mask: NDArray[np.bool_],
+    origin_points: list[vertex],
+) -> tuple[RouteDict, list[vertex]]:
+    """
+    Splits the origin points into those whose cached route is still the best, and those that must be rerouted.
+
+    :param graph: The compact graph of the new run, which may differ from the graph the snapshot was taken on.
+    :param weights: The weight of every edge in the graph, as minimised by the router.
+    :param snapshot: The routes of the previous run.
+    :param danger_zone_mask: Whether every node in the graph lies in the new danger zone.
+    :param origin_points: The origin points of the new run.
+    :return: The reusable routes, and the origin points to reroute.
+    """
+    digests = node_digests(graph, weights, danger_zone_mask)
+    changed = np.array(
+        [
+            graph.index[node]
+            for node, digest in digests.items()
+            if snapshot.node_digests.get(node) != digest
+        ],
+        dtype=np.int64,
+    )
+    costs: dict[vertex, float] = {}
+    for origin in origin_points:
+        routes = snapshot.origin_to_paths.get(origin, [])
+        if len(routes) != 1 or any(node not in graph.index for node in routes[0]):
+            continue
+        route_cost = _route_cost(graph, weights, routes[0])
+        if route_cost < float("inf"):
+            costs[origin] = route_cost
+    distance_to_change = _distance_to_nodes(
+        graph, weights, changed, max(costs.values(), default=0.0)
+    )
+
+    reused: RouteDict = {}
+    to_route: list[vertex] = []
+    for origin in origin_points:
+        cost = costs.get(origin)
+        # A change at exactly the cost of the route could give an equally good route, so it is rerouted too
+        if (
+            cost is None
+            or distance_to_change.get(graph.index[origin], float("inf")) <= cost
+        ):
+            to_route.append(origin)
+        else:
+            # Copied out of the cached store, so the next snapshot does not keep the previous one alive
+            reused[origin] = [list(route) for route in snapshot.origin_to_paths[origin]]
+    return reused, to_route
+
+
+def node_digests(
+    graph: CompactRoadGraph,
+    weights: NDArray[np.float64],
+    danger_zone_mask: NDArray[np.bool_],
+) -> dict[vertex, int]:
+    """
+    Returns a digest of every node of a graph that changes when the node enters or leaves the danger zone, or when
+    one of its outgoing edges is added, removed or changes its weight.
+
+    :param graph: A compact graph corresponding to the road network
+    :param weights: The weight of every edge in the graph, as minimised by the router.
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :return: The digest of every node, keyed by its OSM node ID.
+    """
+    offsets, targets = graph.offsets.tolist(), graph.targets.tolist()
+    edge_weights = weights.tolist()
+    nodes = graph.nodes
+    return {
+        node: hash(
+            (
+                in_danger,
+                tuple(
+                    sorted(
+                        (nodes[targets[edge]], edge_weights[edge])
+                        for edge in range(offsets[i], offsets[i + 1])
+                    )
+                ),
+            )
+        )
+        for i, (node, in_danger) in enumerate(zip(nodes, danger_zone_mask.tolist()))
+    }
+
+
+def _route_cost(
+    graph: CompactRoadGraph, weights: NDArray[np.float64], route: path
+) -> float:
+    """
+    Returns the cost of a route, taking the lightest of parallel edges.
+    """
+    cost = 0.0
+    for u, v in zip(route, route[1:]):
+        start, end = graph.offsets[graph.index[u]], graph.offsets[graph.index[u] + 1]
+        parallel = graph.targets[start:end] == graph.index[v]
+        cost += float(weights[start:end][parallel].min(initial=float("inf")))
+    return cost
+
+
+def _distance_to_nodes(
+    graph: CompactRoadGraph,
+    weights: NDArray[np.float64],
+    nodes: NDArray[np.int64],
+    limit: float,
+) -> dict[int, float]:
+    """
+    Returns the distance from every node to the nearest of the given nodes, for the nodes at most limit away.
+    """
+    offsets, previous_nodes, edge_ids = (a.tolist() for a in graph.reverse_csr())
+    edge_weights = weights.tolist()
+    dist = {node: 0.0 for node in nodes.tolist()}
+    heap = [(0.0, node) for node in nodes.tolist()]
+    while heap:
+        priority, node = hq.heappop(heap)
+        if priority > limit:
+            break
+        if priority > dist[node]:
+            continue  # This node has already been processed with a better path
+        for i in range(offsets[node], offsets[node + 1]):
+            previous = previous_nodes[i]
+            new_distance = priority + edge_weights[edge_ids[i]]
+            if new_distance < dist.get(previous, float("inf")):
+                dist[previous] = new_distance
+                hq.heappush(heap, (new_distance, previous))
+    return dist
@@ -0,0 +1,233 @@
+import heapq as hq
+import logging
+from typing import Dict, Mapping
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import zope.interface
+from numpy.typing import NDArray
+from tqdm import tqdm
+
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.route_algo import RouteAlgo
+from routes.route_utils import path, vertex
+from routes.safe_exits import SafeExitCatalogue
+
+
+@zope.interface.implementer(RouteAlgo)
+class MultiSourceFastestPath:
+    def __init__(self) -> None:
+        self.title = "Multi-Source Dijkstra - Fastest Path"
+
+    def route_to_safety(
+        self,
+        origin_points: list[vertex],
+        danger_zone: gpd.GeoDataFrame,
+        G: nx.MultiDiGraph | CompactRoadGraph,
+        diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
+    ) -> Dict[vertex, list[path]]:
+        """
+        Routes every origin point to the nearest safe location using a single Dijkstra search on the reversed
+        graph, seeded from every safe node that can be reached directly from the danger zone.
+
+        :param origin_points: A list of vertices given as OSM node IDs
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+        :param G: A graph corresponding to the road network
+        :param diversifying_routes: Ignored, the search tree only holds the fastest route for each origin point
+        :param workers: Ignored, all origin points are routed by a single search
+        :param safe_exits: The exits of the danger zone, found from the danger zone if None
+        :param demand: Ignored, routes do not depend on traffic
+        :param departure_window: Ignored, routes do not depend on the departure time
+        :return: A dictionary from an origin point to a list containing its fastest path
+        """
+        if diversifying_routes > 1:
+            logging.info(
+                f"{self.title} finds a single route per origin point, ignoring diversifying_routes={diversifying_routes}"
+            )
+
+        logging.info("Routing fastest path to safety for all origin points")
+        full_graph = as_compact_graph(G)
+        danger_zone_index = DangerZoneIndex.from_compact_graph(full_graph, danger_zone)
+        subgraph = DangerZoneSubgraph.from_index(
+            full_graph, danger_zone_index, origin_points, safe_exits
+        )
+        graph = subgraph.graph
+        dist, successor = build_safety_tree(
+            graph, subgraph.mask, graph.travel_time, subgraph.exits
+        )
+
+        routes: dict[vertex, list[path]] = {}
+        for origin in tqdm(origin_points):
+            source = graph.index.get(origin)
+            if source is None:
+                logging.error(f"Origin node {origin} is not in the graph")
+                continue
+            if graph.out_degree(source) == 0:
+                logging.info(f"Node {origin} has no neighbors")
+                continue  # Skip if the origin node doesn't have neighbors
+
+            if subgraph.mask[source] and dist[source] == float("inf"):
+                logging.info(
+                    f"Node {origin} cannot reach any nodes outside the dangerzone"
+                )
+                continue
+            routes[origin] = [graph.to_path(follow_safety_tree(successor, source))]
+        return routes
+
+
+def build_safety_tree(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    exits: NDArray[np.int64] | None = None,
+) -> tuple[list[float], list[int | None]]:
+    """
+    Runs a multi-source Dijkstra on the reversed graph from every safe node with an incoming edge from the danger
+    zone. Only edges leaving a danger zone node are relaxed, so every tree path stays inside the danger zone until
+    its last node.
+
+    :param graph: A compact graph corresponding to the road network
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :param weights: The weight of every edge in the graph.
+    :param exits: The dense indices of the safe nodes with an incoming edge from the danger zone, found from the
+        danger zone mask if None.
+    :return: The distance from every dense node index to safety, infinite if safety cannot be reached, and the
+        next node on its best route, None for safe nodes.
+    """
+    dist, successor, _ = build_safety_tree_edges(
+        graph, danger_zone_mask, weights, exits
+    )
+    return dist, successor
+
+
+def build_safety_tree_edges(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    exits: NDArray[np.int64] | None = None,
+) -> tuple[list[float], list[int | None], list[int]]:
+    """
+    Builds the safety tree like build_safety_tree, additionally returning the edge every node takes towards safety.
+
+    :return: The distance from every dense node index to safety, the next node on its best route, and the position
+        of the edge to the next node in the edge arrays, -1 for nodes without a next node.
+    """
+    dist, successor, successor_edge, _ = _safety_search(
+        graph, danger_zone_mask, weights, exits
+    )
+    return dist, successor, successor_edge
+
+
+def build_safety_ball(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    max_settled: int,
+    exits: NDArray[np.int64] | None = None,
+) -> tuple[list[float], list[int | None], float]:
+    """
+    Builds the part of the safety tree closest to safety, stopping the search once it has settled max_settled
+    nodes. The nodes in the ball have their exact distance to safety, and every node outside it is at least the
+    radius of the ball away from safety.
+
+    :param graph: A compact graph corresponding to the road network
+    :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+    :param weights: The weight of every edge in the graph.
+    :param max_settled: The number of nodes to settle, including the exits.
+    :param exits: The dense indices of the safe nodes with an incoming edge from the danger zone, found from the
+        danger zone mask if None.
+    :return: The distance from every dense node index to safety, infinite outside the ball, the next node on its
+        best route, and the radius of the ball, infinite if it holds every node that can reach safety.
+    """
+    dist, successor, _, radius = _safety_search(
+        graph, danger_zone_mask, weights, exits, max_settled
+    )
+    return dist, successor, radius
+
+
+def _safety_search(
+    graph: CompactRoadGraph,
+    danger_zone_mask: NDArray[np.bool_],
+    weights: NDArray[np.float64],
+    exits: NDArray[np.int64] | None,
+    max_settled: int | None = None,
+) -> tuple[list[float], list[int | None], list[int], float]:
+    """
+    Runs the multi-source Dijkstra of build_safety_tree, optionally stopping after max_settled nodes. Nodes that are
+    not settled are left with an infinite distance and no successor.
+
+    :return: The distance, next node and edge to the next node of every dense node index, and the lowest distance
+        of the nodes that were not settled.
+    """
+    mask = danger_zone_mask
+    if exits is None:
+        exit_edges = mask[graph.sources()] & ~mask[graph.targets]
+        exits = np.unique(graph.targets[exit_edges])
+
+    offsets, previous_nodes, edge_ids = (a.tolist() for a in graph.reverse_csr())
+    edge_weights = weights.tolist()
+    in_danger = mask.tolist()
+
+    dist = [float("inf")] * graph.num_nodes
+    successor: list[int | None] = [None] * graph.num_nodes
+    successor_edge = [-1] * graph.num_nodes
+    settled = [False] * graph.num_nodes
+    num_settled = 0
+    for node in exits.tolist():
+        dist[node] = 0.0
+    heap: list[tuple[float, int]] = [(0.0, node) for node in exits.tolist()]
+
+    while heap:
+        priority, node = heap[0]
+        if settled[node]:
+            hq.heappop(heap)
+            continue  # This node has already been processed with a better path
+        if max_settled is not None and num_settled >= max_settled:
+            break
+        hq.heappop(heap)
+        settled[node] = True
+        num_settled += 1
+        for i in range(offsets[node], offsets[node + 1]):
+            previous = previous_nodes[i]
+            if not in_danger[previous] or settled[previous]:
+                continue
+            edge = edge_ids[i]
+            new_distance = priority + edge_weights[edge]
+            if new_distance < dist[previous]:
+                dist[previous] = new_distance
+                successor[previous] = node
+                successor_edge[previous] = edge
+                hq.heappush(heap, (new_distance, previous))
+
+    radius = float("inf")
+    if heap:
+        radius = heap[0][0]
+        for _, node in heap:
+            if not settled[node]:
+                dist[node] = float("inf")
+                successor[node] = None
+                successor_edge[node] = -1
+    return dist, successor, successor_edge, radius
+
+
+def follow_safety_tree(successor: list[int | None], origin: int) -> list[int]:
+    """
+    Returns the route from the origin to safety by following the safety tree.
+
+    :param successor: The safety tree returned by build_safety_tree.
+    :param origin: The dense index of the origin node.
+    :return: The route as a list of dense node indices, ending at a safe node.
+    """
+    result = [origin]
+    next_node = successor[origin]
+    while next_node is not None:
+        result.append(next_node)
+        next_node = successor[next_node]
+    return result
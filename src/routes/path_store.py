@@ -0,0 +1,114 @@
+from typing import Any, Iterable, Iterator, MutableMapping
+
+from routes.route_utils import RouteDict, path, vertex
+
+
+class PathStore(MutableMapping[vertex, list[path]]):
+    """
+    The routes to safety of origin points as a tree of parent pointers: every node on a route points to the next
+    node, so routes that end the same way share the storage of their common suffix, and a route is only built when
+    it is first read. Routes stored as lists, e.g. alternative routes, are kept as they are.
+
+    Every node keeps the first pointer it is given. A later route reaching a node that already has a pointer
+    continues along it, which is equally short when the routes are shortest routes to the nearest safe node, and
+    keeps the pointers free of cycles.
+    """
+
+    def __init__(self) -> None:
+        self._successor: dict[vertex, vertex] = {}
+        self._origins: dict[vertex, None] = {}
+        self._explicit: dict[vertex, list[path]] = {}
+        self._built: dict[vertex, list[path]] = {}
+
+    @classmethod
+    def from_tree(
+        cls, successor: dict[vertex, vertex], origins: Iterable[vertex]
+    ) -> "PathStore":
+        """
+        Creates a store from a tree of routes to safety, e.g. a safety tree.
+
+        :param successor: The next node of every node on the routes, leading to a node without a next node.
+        :param origins: The origin points, whose routes start at themselves.
+        :return: The routes of the origin points.
+        """
+        store = cls()
+        store._successor = successor
+        store._origins = dict.fromkeys(origins)
+        return store
+
+    def add(self, route: path) -> None:
+        """
+        Stores a route from its first node, the origin point, to safety.
+        """
+        for node, next_node in zip(route, route[1:]):
+            if node in self._successor:
+                break  # The rest of the route is already stored
+            self._successor[node] = next_node
+        self.add_origin(route[0])
+
+    def add_origin(self, node: vertex) -> None:
+        """
+        Stores the route of a node on a stored route, the suffix of that route.
+        """
+        self._explicit.pop(node, None)
+        self._origins[node] = None
+
+    def merge(self, other: RouteDict) -> None:
+        """
+        Adds the routes of another store or dictionary, e.g. of another shard of origin points.
+        """
+        if not isinstance(other, PathStore):
+            self.update(other)
+            return
+        for node, next_node in other._successor.items():
+            self._successor.setdefault(node, next_node)
+        for origin in other._origins:
+            self.add_origin(origin)
+        self._explicit.update(other._explicit)
+
+    def walk(self, origin: vertex) -> Iterator[vertex]:
+        """
+        Yields the nodes of the stored route of an origin point.
+        """
+        node: vertex | None = origin
+        while node is not None:
+            yield node
+            node = self._successor.get(node)
+
+    def __getitem__(self, origin: vertex) -> list[path]:
+        if origin in self._explicit:
+            return self._explicit[origin]
+        if origin not in self._origins:
+            raise KeyError(origin)
+        # Pointers are never changed once set, so a built route stays valid
+        if origin not in self._built:
+            self._built[origin] = [list(self.walk(origin))]
+        return self._built[origin]
+
+    def __setitem__(self, origin: vertex, paths: list[path]) -> None:
+        self._origins.pop(origin, None)
+        self._built.pop(origin, None)
+        self._explicit[origin] = paths
+
+    def __delitem__(self, origin: vertex) -> None:
+        self._built.pop(origin, None)
+        if origin in self._explicit:
+            del self._explicit[origin]
+        else:
+            del self._origins[origin]
+
+    def __iter__(self) -> Iterator[vertex]:
+        yield from self._origins
+        yield from self._explicit
+
+    def __len__(self) -> int:
+        return len(self._origins) + len(self._explicit)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __getstate__(self) -> dict[str, Any]:
+        # The built routes are rebuilt when read again, keeping the pickled store small.
+        state = self.__dict__.copy()
+        state["_built"] = {}
+        return state
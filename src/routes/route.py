@@ -8,7 +8,7 @@ from tqdm import tqdm
 
 from data_loader.population import get_total_population
 from data_loader.population.population_utils import NODE_ID, POPULATION
-from routes.route_utils import path
+from routes.route_utils import RouteDict, path, vertex
 
 
 class Route:
@@ -56,7 +56,7 @@ def _get_normal_dist_departure_time_list(
 
 
 def _get_num_people_on_route(
-    origin_point: str, population_data: gpd.GeoDataFrame, cars_per_person: float
+    origin_point: vertex, population_data: gpd.GeoDataFrame, cars_per_person: float
 ) -> int:
     """
     Returns the number of people on a given route.
@@ -76,12 +76,28 @@ def _get_num_people_on_route(
     return result
 
 
+def get_vehicle_demand(
+    population_data: gpd.GeoDataFrame, cars_per_person: float, departure_window: int
+) -> dict[vertex, float]:
+    """
+    Returns the vehicles per hour leaving every origin point while the population departs.
+    :param population_data: A GeoDataFrame containing the population data.
+    :param cars_per_person: The number of cars per person.
+    :param departure_window: The length of the departure time window in seconds.
+    :return: A dictionary from an origin point to its vehicles per hour.
+    """
+    hours = max(departure_window, 1) / 3600
+    vehicles = population_data[POPULATION] * cars_per_person / hours
+    return dict(zip(population_data[NODE_ID].tolist(), vehicles.tolist()))
+
+
 def create_route_objects(
-    origin_to_paths: dict[str, list[path]],
+    origin_to_paths: RouteDict,
     population_data: gpd.GeoDataFrame,
     start: int,
     end: int,
     cars_per_person: float,
+    ordered_by_departure: bool = False,
 ) -> list[Route]:
     """
     Creates a list of Route objects from a list of routes.
@@ -91,6 +107,8 @@ def create_route_objects(
     :param start: start of normal distribution. Given in seconds.
     :param end: end of normal distribution. Given in seconds.
     :param cars_per_person: The number of cars per person.
+    :param ordered_by_departure: Whether the paths of an origin point are meant for successive departures, so the
+        people of an origin point are given the paths in order of their departure times.
     :return: A list of Route objects.
     """
     total_population = get_total_population(population_data, cars_per_person)
@@ -107,7 +125,12 @@ def create_route_objects(
                 f"Origin point {origin_point} has no routes to safety. Skipping."
             )
             continue
-        elif number_of_diverse_routes == 1:
+        if ordered_by_departure:
+            departures = np.sort(departure_times[:num_people_on_route])
+            # population_diversify_route_math gives the remainder to the first path after splitting the rest evenly
+            remainder = num_people_on_route % number_of_diverse_routes
+            departure_times[:num_people_on_route] = np.roll(departures, -remainder)
+        if number_of_diverse_routes == 1:
             route_path = paths[0]
             route_object, departure_times = _create_route_object(
                 departure_times=departure_times,
@@ -1,10 +1,12 @@
-from typing import Dict
+from typing import Dict, Mapping
 
 import geopandas as gpd
 import networkx as nx
 import zope.interface
 
+from routes.compact_graph import CompactRoadGraph
 from routes.route_utils import path, vertex
+from routes.safe_exits import SafeExitCatalogue
 
 
 class RouteAlgo(zope.interface.Interface):  # type: ignore[misc]
@@ -16,16 +18,25 @@ class RouteAlgo(zope.interface.Interface):  # type: ignore[misc]
         self,
         origin_points: list[vertex],
         danger_zone: gpd.GeoDataFrame,
-        G: nx.MultiDiGraph,
+        G: nx.MultiDiGraph | CompactRoadGraph,
         diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
     ) -> Dict[vertex, list[path]]:
         """
         Finds a list of paths from origin points to a safe location.
 
-        :param origin_points: A list of vertices given as str IDs
+        :param origin_points: A list of vertices given as OSM node IDs
         :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
-        :param G: A graph corresponding to the road network
+        :param G: A graph corresponding to the road network, or its compact form
         :param diversifying_routes: The number of routes to find for each origin point
+        :param workers: The number of processes the algorithm may use
+        :param safe_exits: The exits of the danger zone, found by the algorithm if None
+        :param demand: The vehicles per hour leaving every origin point, for algorithms that take traffic into account
+        :param departure_window: The start and end of the departure time window in seconds, for algorithms that
+            route departures at different times differently
         :return: A dictionary from an origin point to a list of 1 or more paths .
         """
         raise NotImplementedError(
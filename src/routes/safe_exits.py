@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from numpy.typing import NDArray
+
+from routes.compact_graph import MISSING, CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.route import Route
+from routes.route_utils import vertex
+
+
+@dataclass
+class SafeExitCatalogue:
+    """
+    Every edge of a road network that leads from the danger zone to a safe node, built once per scenario.
+    The catalogue only holds plain lists and arrays, so it can be pickled and shared between processes.
+    """
+
+    edges: NDArray[np.int64]
+    """Position of every exit edge in the edge arrays of the compact graph it was built from."""
+    from_nodes: list[vertex]
+    """OSM node ID of the danger zone node every exit edge starts at."""
+    to_nodes: list[vertex]
+    """OSM node ID of the safe node every exit edge leads to."""
+    capacity: NDArray[np.float64]
+    """Capacity of every exit edge in vehicles per hour, as given to MATSim."""
+    lanes: NDArray[np.int64]
+    """Number of lanes of every exit edge, or MISSING."""
+    coordinates: NDArray[np.float64]
+    """Longitude and latitude of the start and end node of every exit edge, with shape (number of exits, 2, 2)."""
+
+    @classmethod
+    def from_graph(
+        cls, graph: CompactRoadGraph, danger_zone_index: DangerZoneIndex
+    ) -> "SafeExitCatalogue":
+        """
+        Finds every exit edge of a graph.
+
+        :param graph: A compact graph corresponding to the road network
+        :param danger_zone_index: The danger zone membership of every node in the graph.
+        :return: The catalogue of exit edges.
+        """
+        mask = danger_zone_index.mask
+        sources = graph.sources()
+        edges = np.flatnonzero(mask[sources] & ~mask[graph.targets])
+        from_index = sources[edges]
+        to_index = graph.targets[edges]
+
+        coordinates = np.stack(
+            [
+                np.column_stack([graph.x[from_index], graph.y[from_index]]),
+                np.column_stack([graph.x[to_index], graph.y[to_index]]),
+            ],
+            axis=1,
+        )
+        return cls(
+            edges=edges,
+            from_nodes=graph.to_path(from_index.tolist()),
+            to_nodes=graph.to_path(to_index.tolist()),
+            capacity=graph.capacity()[edges],
+            lanes=graph.lanes[edges],
+            coordinates=coordinates,
+        )
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    def exit_nodes(self) -> list[vertex]:
+        """
+        Returns the OSM node IDs of the safe nodes reached by the exit edges, without duplicates.
+        """
+        return list(dict.fromkeys(self.to_nodes))
+
+    @property
+    def total_capacity(self) -> float:
+        """
+        The summed capacity of all exit edges in vehicles per hour.
+        """
+        return float(self.capacity.sum())
+
+    def exit_loads(self, routes: list[Route]) -> NDArray[np.int64]:
+        """
+        Counts the vehicles leaving the danger zone through every exit edge.
+
+        :param routes: The routes of the vehicles.
+        :return: The number of vehicles on every exit edge.
+        """
+        exit_of_edge: dict[tuple[vertex, vertex], int] = {}
+        for i, edge in enumerate(zip(self.from_nodes, self.to_nodes)):
+            # Routes are node paths, so the vehicles on parallel edges are counted on the first one
+            exit_of_edge.setdefault(edge, i)
+        loads = np.zeros(len(self), dtype=np.int64)
+        for route in routes:
+            if len(route.path) < 2:
+                continue  # The route starts outside the danger zone
+            exit_edge = exit_of_edge.get((route.path[-2], route.path[-1]))
+            if exit_edge is not None:
+                loads[exit_edge] += route.num_people_on_route
+        return loads
+
+    def to_geodataframe(self) -> gpd.GeoDataFrame:
+        """
+        Returns the exit edges as line geometries with their attributes, e.g. for writing to GeoJSON.
+        """
+        return gpd.GeoDataFrame(
+            {
+                "from_node": self.from_nodes,
+                "to_node": self.to_nodes,
+                "capacity": self.capacity,
+                "lanes": np.where(self.lanes == MISSING, 1, self.lanes),
+            },
+            geometry=shapely.linestrings(self.coordinates),
+            crs="EPSG:4326",
+        )
@@ -0,0 +1,301 @@
+import heapq as hq
+import logging
+from statistics import NormalDist
+from typing import Dict, Mapping
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import zope.interface
+from numpy.typing import NDArray
+from tqdm import tqdm
+
+from routes.capacity_aware import BPR_ALPHA, BPR_BETA
+from routes.compact_graph import CompactRoadGraph, as_compact_graph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.route_algo import RouteAlgo
+from routes.route_utils import path, vertex
+from routes.safe_exits import SafeExitCatalogue
+
+LOAD_BIN_SECONDS = 300
+"""Length of the time bins the predicted link loads are counted in."""
+LOAD_SAMPLES_PER_WAVE = 20
+"""Number of departure times the vehicles of a wave are spread over when they are added to the link loads."""
+
+
+@zope.interface.implementer(RouteAlgo)
+class TimeDependentFastestPath:
+    routes_ordered_by_departure = True
+    """The routes of an origin point are ordered by departure wave, see create_route_objects."""
+
+    def __init__(
+        self, waves: int = 6, load_bin_seconds: int = LOAD_BIN_SECONDS
+    ) -> None:
+        """
+        :param waves: The number of departure waves, each holding the same share of the departures.
+        :param load_bin_seconds: The length of the time bins the predicted link loads are counted in.
+        """
+        self.title = "Time-Dependent Dijkstra - Fastest Path"
+        self.waves = waves
+        self.load_bin_seconds = load_bin_seconds
+
+    def route_to_safety(
+        self,
+        origin_points: list[vertex],
+        danger_zone: gpd.GeoDataFrame,
+        G: nx.MultiDiGraph | CompactRoadGraph,
+        diversifying_routes: int = 1,
+        workers: int = 1,
+        safe_exits: SafeExitCatalogue | None = None,
+        demand: Mapping[vertex, float] | None = None,
+        departure_window: tuple[int, int] | None = None,
+    ) -> Dict[vertex, list[path]]:
+        """
+        Routes the departures of every origin point in waves, splitting the normally distributed departure times of
+        create_route_objects into quantiles. Within a wave every origin point is routed with a time-dependent search
+        departing at the median time of the wave, on the travel times given by the link loads predicted for the time a
+        vehicle would enter each link. The vehicles of a wave are then added to the loads of the time bins they are
+        predicted to enter each link in, spread over the departure times the wave covers, so later waves avoid links
+        saturated by earlier ones. The loads are only updated between waves, so the compute grows with the number of
+        waves rather than the number of vehicles.
+
+        :param origin_points: A list of vertices given as OSM node IDs
+        :param danger_zone: A GeoDataFrame containing the danger zone polygon(s).
+        :param G: A graph corresponding to the road network
+        :param diversifying_routes: Ignored, every origin point gets one route per departure wave
+        :param workers: Ignored, the waves are routed in order as each depends on the loads of the earlier ones
+        :param safe_exits: The exits of the danger zone, found from the danger zone if None
+        :param demand: The vehicles per hour leaving every origin point. Every origin point has a demand of 1 if None.
+        :param departure_window: The start and end of the departure time window in seconds. A single wave departing
+            at time 0 if None.
+        :return: A dictionary from an origin point to its routes, one per departure wave in order of departure,
+            or a single route if all waves take the same route.
+        """
+        logging.info("Routing time-dependent fastest paths to safety")
+        if demand is None:
+            logging.info(f"{self.title} got no demand, assuming 1 vehicle per hour")
+            demand = {}.fromkeys(origin_points, 1.0)
+        if departure_window is None:
+            departure_times, window_hours = [0.0], 1.0
+            wave_departures = [[0.0]]
+        else:
+            departure_times = departure_wave_times(*departure_window, self.waves)
+            wave_departures = departure_wave_samples(
+                *departure_window, self.waves, LOAD_SAMPLES_PER_WAVE
+            )
+            window_hours = max(departure_window[1] - departure_window[0], 1) / 3600
+
+        full_graph = as_compact_graph(G)
+        danger_zone_index = DangerZoneIndex.from_compact_graph(full_graph, danger_zone)
+        subgraph = DangerZoneSubgraph.from_index(
+            full_graph, danger_zone_index, origin_points, safe_exits
+        )
+        graph = subgraph.graph
+        search = TimeDependentSearch(
+            graph,
+            subgraph.mask,
+            LinkLoads(graph.num_edges, self.load_bin_seconds),
+        )
+
+        routes: Dict[vertex, list[path]] = {}
+        origins: list[vertex] = []
+        sources: list[int] = []
+        for origin in origin_points:
+            source = graph.index.get(origin)
+            if source is None:
+                logging.error(f"Origin node {origin} is not in the graph")
+                continue
+            if graph.out_degree(source) == 0:
+                logging.info(f"Node {origin} has no neighbors")
+                continue  # Skip if the origin node doesn't have neighbors
+            if not subgraph.mask[source]:
+                routes[origin] = [[origin]]
+                continue  # The origin point is already safe
+            origins.append(origin)
+            sources.append(source)
+        # Every wave holds the same share of the vehicles of an origin point
+        wave_vehicles = [
+            demand.get(origin, 0.0) * window_hours / len(departure_times)
+            for origin in origins
+        ]
+
+        wave_routes: list[list[list[int]]] = [[] for _ in sources]
+        for departure, samples in tqdm(list(zip(departure_times, wave_departures))):
+            found = [search.route(source, departure) for source in sources]
+            # Vehicles departing earlier or later in the wave enter every link that much earlier or later
+            offsets = [sample - departure for sample in samples]
+            for route_list, trip, vehicles in zip(wave_routes, found, wave_vehicles):
+                if trip is None:
+                    continue
+                route, edges, entry_times = trip
+                route_list.append(route)
+                sample_vehicles = vehicles / len(offsets)
+                for edge, time in zip(edges, entry_times):
+                    for offset in offsets:
+                        search.loads.add(edge, time + offset, sample_vehicles)
+
+        for origin, route_list in zip(origins, wave_routes):
+            if not route_list:
+                logging.info(
+                    f"Node {origin} cannot reach any nodes outside the dangerzone"
+                )
+                continue
+            if all(route == route_list[0] for route in route_list):
+                route_list = route_list[:1]
+            routes[origin] = [graph.to_path(route) for route in route_list]
+        return routes
+
+
+class LinkLoads:
+    """
+    The number of vehicles predicted to enter every link in every time bin.
+    """
+
+    def __init__(self, num_edges: int, bin_seconds: int) -> None:
+        """
+        :param num_edges: The number of edges of the graph.
+        :param bin_seconds: The length of a time bin in seconds.
+        """
+        self.num_edges = num_edges
+        self.bin_seconds = bin_seconds
+        # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+        self._bins: dict[int, list[float]] = {}
+
+    def add(self, edge: int, time: float, vehicles: float) -> None:
+        """
+        Adds vehicles entering an edge at the given time in seconds.
+        """
+        time_bin = int(time // self.bin_seconds)
+        if time_bin not in self._bins:
+            self._bins[time_bin] = [0.0] * self.num_edges
+        self._bins[time_bin][edge] += vehicles
+
+    def flow(self, edge: int, time: float) -> float:
+        """
+        Returns the flow on an edge in vehicles per hour in the time bin of the given time in seconds.
+        """
+        vehicles = self._bins.get(int(time // self.bin_seconds))
+        if vehicles is None:
+            return 0.0
+        return vehicles[edge] * 3600 / self.bin_seconds
+
+
+class TimeDependentSearch:
+    """
+    A Dijkstra search on arrival times, where the travel time of an edge is given by the BPR function of the flow
+    predicted for the time the edge is entered. The search stops at the first safe node it settles.
+    """
+
+    def __init__(
+        self,
+        graph: CompactRoadGraph,
+        danger_zone_mask: NDArray[np.bool_],
+        loads: LinkLoads,
+    ) -> None:
+        """
+        :param graph: A compact graph corresponding to the road network
+        :param danger_zone_mask: Whether every node in the graph lies in the danger zone.
+        :param loads: The predicted link loads, which may change between searches.
+        """
+        # Plain lists are considerably faster than NumPy arrays for scalar access in the search loop
+        self.offsets = graph.offsets.tolist()
+        self.targets = graph.targets.tolist()
+        self.free_flow_time: list[float] = graph.travel_time.tolist()
+        self.capacity: list[float] = graph.capacity().tolist()
+        self.in_danger = danger_zone_mask.tolist()
+        self.loads = loads
+
+    def travel_time(self, edge: int, time: float) -> float:
+        """
+        Returns the travel time of an edge entered at the given time in seconds.
+        """
+        ratio = self.loads.flow(edge, time) / self.capacity[edge]
+        result: float = self.free_flow_time[edge] * (1 + BPR_ALPHA * ratio**BPR_BETA)
+        return result
+
+    def route(
+        self, source: int, departure: float
+    ) -> tuple[list[int], list[int], list[float]] | None:
+        """
+        Finds the route to safety with the earliest arrival when departing from the source at the given time.
+
+        :param source: The dense index of the origin node.
+        :param departure: The departure time in seconds.
+        :return: The route as a list of dense node indices, its edges and the time every edge is entered,
+            or None if the source cannot reach safety.
+        """
+        arrival = {source: departure}
+        predecessor: dict[int, tuple[int, int]] = {}
+        settled: set[int] = set()
+        frontier: list[tuple[float, int]] = [(departure, source)]
+
+        while frontier:
+            time, node = hq.heappop(frontier)
+            if node in settled:
+                continue  # This node has already been processed with an earlier arrival
+            settled.add(node)
+
+            if not self.in_danger[node]:
+                route, edges = [node], []
+                while node in predecessor:
+                    node, edge = predecessor[node]
+                    route.append(node)
+                    edges.append(edge)
+                route.reverse()
+                edges.reverse()
+                return route, edges, [arrival[node] for node in route[:-1]]
+
+            for edge in range(self.offsets[node], self.offsets[node + 1]):
+                neighbour = self.targets[edge]
+                new_arrival = time + self.travel_time(edge, time)
+                if new_arrival < arrival.get(neighbour, float("inf")):
+                    arrival[neighbour] = new_arrival
+                    predecessor[neighbour] = (node, edge)
+                    hq.heappush(frontier, (new_arrival, neighbour))
+        return None
+
+
+def departure_wave_times(start: int, end: int, waves: int) -> list[float]:
+    """
+    Splits the normally distributed departure times of create_route_objects into waves holding the same share of the
+    departures, and returns the median departure time of every wave.
+
+    :param start: The start of the departure time window in seconds.
+    :param end: The end of the departure time window in seconds.
+    :param waves: The number of waves.
+    :return: The departure time of every wave in seconds, in order.
+    """
+    if end <= start:
+        return [float(start)] * waves
+    # Matches the distribution of _get_normal_dist_departure_time_list
+    distribution = NormalDist(mu=(start + end) / 2, sigma=(end - start) / 6)
+    return [distribution.inv_cdf((wave + 0.5) / waves) for wave in range(waves)]
+
+
+def departure_wave_samples(
+    start: int, end: int, waves: int, samples: int
+) -> list[list[float]]:
+    """
+    Splits the departure times like departure_wave_times, and returns departure times spread over every wave, each
+    holding the same share of its departures.
+
+    :param start: The start of the departure time window in seconds.
+    :param end: The end of the departure time window in seconds.
+    :param waves: The number of waves.
+    :param samples: The number of departure times of every wave.
+    :return: The departure times of every wave in seconds, in order.
+    """
+    if end <= start:
+        return [[float(start)] * samples for _ in range(waves)]
+    distribution = NormalDist(mu=(start + end) / 2, sigma=(end - start) / 6)
+    return [
+        [
+            min(
+                max(distribution.inv_cdf((wave + (i + 0.5) / samples) / waves), start),
+                end,
+            )
+            for i in range(samples)
+        ]
+        for wave in range(waves)
+    ]
@@ -1,3 +1,55 @@
+import logging
+
+DANISH_DEFAULT_SPEED_LIMIT = 50  # km/h
+
+
 def kmh_to_ms(kmh: float) -> float:
     """Convert km/h to m/s."""
     return kmh * 1000 / 3600
+
+
+def compute_capacity(
+    speed_limit: float,
+    vehicle_length: float = 5,
+    min_gap: float = 2.5,
+    tau: float = 1,
+) -> float:
+    """
+    Compute the capacity of a link based on its speed limit.
+    :param speed_limit: Maximum allowed speed of the link in meters per second.
+    :param vehicle_length: Physical length of a vehicle in meters.
+    :param min_gap: Minimum gap between vehicles in a standing queue in meters.
+    :param tau: Desired minimum time headway in seconds.
+    :return: The capacity of the link in vehicles per hour.
+    Reference: https://sumo.dlr.de/docs/Simulation/RoadCapacity.html
+    """
+    # The time it takes for two vehicles to pass the same location.
+    gross_time_headway = (vehicle_length + min_gap) / speed_limit + tau
+    return 3600 / gross_time_headway
+
+
+def parse_min_int(value: list[str] | str) -> int:
+    """
+    Helper function to extract the minimum integer from a string or list of strings.
+    In some cases, when a road has different speed limits, the max_speed of the simplified edge is a list.
+    In those cases, we choose the minimum speed limit of the road.
+    :raises ValueError: If a value cannot be parsed as an integer.
+    """
+    return min(map(int, value)) if isinstance(value, list) else int(value)
+
+
+def try_parse_min_int(link_data: dict[str, list[str] | str], key: str) -> int | None:
+    """
+    Helper function to extract the minimum integer of an attribute with parse_min_int.
+    Returns None and logs a warning if the attribute is missing or cannot be parsed.
+    """
+    value = link_data.get(key)
+    if value is None:
+        return None
+    try:
+        return parse_min_int(value)
+    except ValueError:
+        logging.warning(
+            f"Invalid {key} value for link {link_data.get('osmid')}: {value}"
+        )
+        return None
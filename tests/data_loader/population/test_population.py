@@ -105,6 +105,27 @@ def test_population_data_from_number(
     assert all(result["pop"] == 100)
 
 
+@pytest.mark.parametrize(
+    "population, expected",
+    [(502, [101, 101, 100, 100, 100]), (3, [1, 1, 1]), (500, [100] * 5)],
+)
+def test_population_data_from_number_remainder(
+    mock_osm_graph: nx.MultiDiGraph, population: int, expected: list[int]
+) -> None:
+    danger_zone = gpd.GeoDataFrame(
+        geometry=[Polygon([(0, 0), (0, 60), (60, 60), (60, 0)])], crs="EPSG:4326"
+    )
+    result = population_data_from_number(
+        danger_zone=danger_zone, population_number=population, G=mock_osm_graph
+    )
+    assert result["pop"].tolist() == expected
+    assert result["id"].tolist() == list(mock_osm_graph.nodes)[: len(expected)]
+    assert [(point.x, point.y) for point in result.geometry] == [
+        (mock_osm_graph.nodes[node]["x"], mock_osm_graph.nodes[node]["y"])
+        for node in result["id"]
+    ]
+
+
 def test_filter_world_pop_to_cph() -> None:
     # Create a mock graph with nodes
     x = [0, 0, 10, 10]
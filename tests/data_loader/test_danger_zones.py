@@ -2,10 +2,16 @@ import json
 from pathlib import Path
 
 import geopandas as gpd
+import numpy as np
 import pytest
 import shapely
 
-from data_loader.danger_zones import load_danger_zone
+from data_loader.danger_zones import (
+    DangerZoneGeometry,
+    Scenario,
+    load_danger_zone,
+)
+from routes.danger_zone_index import DangerZoneIndex
 
 
 def test_load_danger_zone(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
@@ -49,3 +55,54 @@ def test_load_danger_zone(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> No
     polygon = danger_zone.geometry[0]
     assert isinstance(polygon, shapely.Polygon)
     assert list(zip(*polygon.exterior.coords.xy)) == coordinates
+
+
+def test_scenario_from_geojson_str() -> None:
+    data = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {},
+                "geometry": shapely.geometry.mapping(polygon),
+            }
+            for polygon in [shapely.box(0, 0, 2, 2), shapely.box(1, 1, 3, 4)]
+        ],
+    }
+    scenario = Scenario.from_geojson_str(json.dumps(data))
+
+    assert len(scenario.danger_zone) == 2
+    assert scenario.danger_zone.crs == "EPSG:4326"
+    assert scenario.osm_polygon.equals(shapely.box(0, 0, 2, 2))
+    assert scenario.bounds == (0, 0, 3, 4)
+    assert shapely.is_prepared(scenario.geometry.exact)
+    assert scenario.geometry.simplified is None
+
+    # The prepared geometry classifies nodes like the GeoDataFrame it was parsed into
+    x = np.array([1.0, 2.5, 2.5, 0.0])
+    y = np.array([1.0, 3.5, 0.5, 2.0])
+    nodes = list(range(len(x)))
+    from_geometry = DangerZoneIndex(nodes, x, y, scenario.geometry)
+    from_frame = DangerZoneIndex(nodes, x, y, scenario.danger_zone)
+    assert from_geometry.mask.tolist() == [True, True, False, True]
+    assert from_frame.mask.tolist() == from_geometry.mask.tolist()
+
+
+def test_simplified_geometry_matches_exact_geometry() -> None:
+    # A circle with many vertices and a notch narrower than the tolerance
+    circle = shapely.Point(0, 0).buffer(10, quad_segs=256)
+    zone = circle.difference(shapely.box(9.5, -0.05, 11, 0.05))
+    simplified = DangerZoneGeometry(zone, tolerance=0.5)
+    exact = DangerZoneGeometry(zone)
+    assert simplified.simplified is not None
+    assert len(simplified.simplified.exterior.coords) < len(zone.exterior.coords)
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(-11, 11, 20_000)
+    y = rng.uniform(-11, 11, 20_000)
+    # Points on and right next to the boundary, where the simplified geometry differs the most
+    boundary = np.array(zone.exterior.coords)
+    x = np.concatenate([x, boundary[:, 0], boundary[:, 0] * 1.001])
+    y = np.concatenate([y, boundary[:, 1], boundary[:, 1] * 1.001])
+
+    assert simplified.intersects_xy(x, y).tolist() == exact.intersects_xy(x, y).tolist()
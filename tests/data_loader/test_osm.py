@@ -1,9 +1,23 @@
+import logging
+from pathlib import Path
+
 import networkx as nx
 import osmnx as ox
 import pytest
+from _pytest.logging import LogCaptureFixture
+from shapely.geometry import box
 from shapely.geometry.polygon import Polygon
 
-from data_loader.osm import download_osm_graph
+from data_loader.osm import (
+    NETWORK_TYPE,
+    SPEED_KMH,
+    TRAVEL_TIME,
+    OsmGraphCache,
+    add_edge_travel_times,
+    download_osm_graph,
+    graph_cache_key,
+    load_osm_graph,
+)
 
 
 def test_download_osm_graph(
@@ -26,3 +40,72 @@ def test_download_osm_graph(
     result_graph = download_osm_graph(bbox)
     assert isinstance(result_graph, nx.MultiDiGraph)
     assert len(result_graph.edges) == len(mock_osm_graph.edges)
+
+
+def test_add_edge_travel_times(caplog: LogCaptureFixture) -> None:
+    G = nx.MultiDiGraph()
+    G.add_edge(1, 2, length=100, maxspeed="36")
+    G.add_edge(2, 3, length=100, maxspeed=["72", "36"])
+    G.add_edge(3, 4, length=100)
+    G.add_edge(4, 5, length=100, maxspeed="signals")
+    G.add_edge(5, 6, length=100, maxspeed="signals")
+
+    with caplog.at_level(logging.WARNING):
+        add_edge_travel_times(G)
+
+    speeds = [data[SPEED_KMH] for _, _, data in G.edges(data=True)]
+    assert speeds == [36, 36, 50, 50, 50]
+    assert G.edges[1, 2, 0][TRAVEL_TIME] == pytest.approx(10)
+    assert G.edges[2, 3, 0][TRAVEL_TIME] == pytest.approx(10)
+    assert G.edges[3, 4, 0][TRAVEL_TIME] == pytest.approx(7.2)
+    # Invalid values are summarised in a single warning
+    assert len(caplog.records) == 1
+    assert "2 edges have a maxspeed that cannot be parsed" in caplog.text
+
+
+def test_graph_cache_key_is_normalised() -> None:
+    polygon = Polygon([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+    # The same square, starting at another corner and running the other way
+    reordered = Polygon([(1, 1), (1, 0), (0, 0), (0, 1), (1, 1)])
+    key = graph_cache_key(polygon, NETWORK_TYPE, True, True)
+    assert graph_cache_key(reordered, NETWORK_TYPE, True, True) == key
+    assert graph_cache_key(polygon, NETWORK_TYPE, False, True) != key
+    assert graph_cache_key(box(0, 0, 2, 1), NETWORK_TYPE, True, True) != key
+
+
+def test_load_osm_graph_downloads_once(
+    monkeypatch: pytest.MonkeyPatch, mock_osm_graph: nx.MultiDiGraph, tmp_path: Path
+) -> None:
+    downloads: list[Polygon] = []
+
+    def mock_download_osm_graph(
+        polygon: Polygon, simplify: bool = True
+    ) -> nx.MultiDiGraph:
+        downloads.append(polygon)
+        return mock_osm_graph
+
+    monkeypatch.setattr("data_loader.osm.download_osm_graph", mock_download_osm_graph)
+    cache = OsmGraphCache(tmp_path)
+    polygon = box(12.4, 55.4, 13.0, 56.0)
+    first = load_osm_graph(polygon, cache=cache)
+    second = load_osm_graph(polygon, cache=cache)
+    assert len(downloads) == 1
+    assert set(second.nodes) == set(first.nodes)
+    assert len(second.edges) == len(first.edges)
+
+
+def test_graph_cache_cuts_contained_polygon(
+    mock_osm_graph: nx.MultiDiGraph, tmp_path: Path
+) -> None:
+    mock_osm_graph.graph["crs"] = "EPSG:4326"
+    cache = OsmGraphCache(tmp_path)
+    cache.put(box(12.4, 55.4, 13.0, 56.0), mock_osm_graph)
+    assert cache.get(box(13.1, 55.4, 13.5, 56.0)) is None
+    # Within the download buffer of the cached polygon, roads outside it would be simplified differently
+    assert cache.get(box(12.401, 55.45, 12.65, 55.65)) is None
+    graph = cache.get(box(12.45, 55.45, 12.65, 55.65), truncate_by_edge=False)
+    assert graph is None  # Only graphs with the same download options are used
+    graph = cache.get(box(12.45, 55.45, 12.65, 55.65))
+    assert graph is not None
+    # A and B lie inside the polygon, and C is kept for its edges to them
+    assert set(graph.nodes) == {"A", "B", "C"}
@@ -7,6 +7,7 @@ import networkx as nx
 import pytest
 
 from matsim_io import NetworkWriter, write_network, write_plans
+from routes.compact_graph import CompactRoadGraph
 from routes.route import Route
 
 
@@ -58,6 +59,28 @@ def test_write_network(
     assert len(links_element.findall("link")) == num_links
 
 
+def test_write_network_from_compact_graph(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    mock_osm_graph: nx.MultiDiGraph,
+) -> None:
+    """Test that the compact form of a graph is written exactly like the graph itself."""
+    output_path = tmp_path / "matsim"
+    output_path.mkdir(parents=True, exist_ok=True)
+    monkeypatch.setattr("matsim_io.MATSIM_DATA_DIR", output_path)
+
+    write_network(mock_osm_graph, network_filename="graph.xml", gzip_compress=False)
+    write_network(
+        CompactRoadGraph.from_graph(mock_osm_graph),
+        network_filename="compact.xml",
+        gzip_compress=False,
+    )
+
+    assert (output_path / "graph.xml").read_text() == (
+        output_path / "compact.xml"
+    ).read_text()
+
+
 @pytest.mark.parametrize(
     "gzip_compress, input_filename, expected_filename",
     [
@@ -81,10 +104,11 @@ def test_write_plans(
     output_path.mkdir(parents=True, exist_ok=True)
     monkeypatch.setattr("matsim_io.MATSIM_DATA_DIR", output_path)
 
-    # write_network is called to populate link IDs for write_plans
-    write_network(mock_osm_graph)
+    # write_network returns the link IDs for write_plans
+    link_ids = write_network(mock_osm_graph)
     write_plans(
         mock_routes,
+        link_ids,
         plan_filename=input_filename,
         gzip_compress=gzip_compress,
         mat_sim_routing=False,
@@ -138,10 +162,11 @@ def test_write_plans_with_matsim_routing(
     output_path.mkdir(parents=True, exist_ok=True)
     monkeypatch.setattr("matsim_io.MATSIM_DATA_DIR", output_path)
 
-    # write_network is called to populate link IDs for write_plans
-    write_network(mock_osm_graph)
+    # write_network returns the link IDs for write_plans
+    link_ids = write_network(mock_osm_graph)
     write_plans(
         mock_routes,
+        link_ids,
         plan_filename=input_filename,
         gzip_compress=gzip_compress,
         mat_sim_routing=True,
@@ -222,3 +247,22 @@ def test_add_link_invalid_params() -> None:
 
     with pytest.raises(AssertionError, match="perm_lanes must be a positive integer"):
         writer.add_link(1, 2, 3, length=100, speed_limit=50, perm_lanes=0)
+
+
+def test_write_to_output_dir(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    mock_osm_graph: nx.MultiDiGraph,
+    mock_routes: list[Route],
+) -> None:
+    """Test that the network and plans can be written to a separate working directory."""
+    monkeypatch.setattr("matsim_io.MATSIM_DATA_DIR", tmp_path)
+    working_dir = tmp_path / "fastest-path-input"
+
+    link_ids = write_network(mock_osm_graph, output_dir=working_dir)
+    write_plans(mock_routes, link_ids, output_dir=working_dir)
+
+    assert (working_dir / "network.xml.gz").exists()
+    assert (working_dir / "plans.xml.gz").exists()
+    assert not (tmp_path / "network.xml.gz").exists()
+    assert not (tmp_path / "plans.xml.gz").exists()
@@ -0,0 +1,69 @@
+import random
+from typing import Hashable, Sequence
+
+import networkx as nx
+from shapely.geometry import Polygon
+
+EXAMPLE_DANGER_ZONE = Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])
+"""The danger zone of example_road_graph, covering A, B, B1 and C."""
+
+
+def example_road_graph() -> nx.MultiDiGraph:
+    """
+    Creates a small road network of 8 nodes, where A, B, B1 and C lie in EXAMPLE_DANGER_ZONE and lead out of it to
+    D, E, F and G.
+
+    :return: The graph.
+    """
+    graph = nx.MultiDiGraph()
+    graph.add_node("A", x=2, y=2)
+    graph.add_node("B", x=3, y=2)
+    graph.add_node("B1", x=2, y=3)
+    graph.add_node("C", x=3, y=3)
+    graph.add_node("D", x=5, y=5)
+    graph.add_node("E", x=4, y=4)
+    graph.add_node("F", x=6, y=6)
+    graph.add_node("G", x=7, y=7)
+    graph.add_edge("A", "B", length=1, maxspeed=50)
+    graph.add_edge("A", "B1", length=1, maxspeed=50)
+    graph.add_edge("B", "C", length=1, maxspeed=50)
+    graph.add_edge("C", "D", length=2, maxspeed=50)
+    graph.add_edge("C", "E", length=1, maxspeed=50)
+    graph.add_edge("E", "D", length=2, maxspeed=50)
+    graph.add_edge("B", "F", length=10, maxspeed=50)
+    graph.add_edge("B1", "G", length=7, maxspeed=50)
+    return graph
+
+
+def random_road_graph(
+    seed: int, min_length: int = 1, parallel_share: float = 0.0
+) -> nx.MultiDiGraph:
+    """
+    Creates a random road network of 200 nodes spread over (0, 0) to (5, 5) and 600 edges.
+
+    :param seed: The seed of the graph.
+    :param min_length: The shortest edge length, edge lengths are drawn up to 100.
+    :param parallel_share: The share of the edges with a second, parallel edge.
+    :return: The graph.
+    """
+    rng = random.Random(seed)
+    graph = nx.MultiDiGraph()
+    for node in range(200):
+        graph.add_node(str(node), x=rng.uniform(0, 5), y=rng.uniform(0, 5))
+    for u, v in nx.gnm_random_graph(200, 600, seed=seed, directed=True).edges:
+        graph.add_edge(str(u), str(v), length=rng.randint(min_length, 100))
+        if parallel_share and rng.random() < parallel_share:
+            graph.add_edge(str(u), str(v), length=rng.randint(min_length, 100))
+    return graph
+
+
+def route_length(graph: nx.MultiDiGraph, route: Sequence[Hashable]) -> float:
+    """
+    Returns the length of a route, taking the shortest of parallel edges.
+    """
+    return float(
+        sum(
+            min(data["length"] for data in graph[u][v].values())
+            for u, v in zip(route, route[1:])
+        )
+    )
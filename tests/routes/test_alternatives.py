@@ -0,0 +1,92 @@
+import geopandas as gpd
+import networkx as nx
+from shapely.geometry import Polygon
+
+from routes.alternatives import PlateauAlternatives, SuffixCache
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.multi_source import build_safety_tree
+
+danger_zone = gpd.GeoDataFrame(geometry=[Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])])
+
+# A and B are in the danger zone, X, Y and Z are safe
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("B", x=3, y=3)
+G.add_node("X", x=5, y=5)
+G.add_node("Y", x=6, y=6)
+G.add_node("Z", x=7, y=7)
+G.add_edge("A", "B", length=10)
+G.add_edge("B", "X", length=1)
+G.add_edge("B", "Y", length=2)
+G.add_edge("A", "Z", length=20)
+
+
+def _alternatives(
+    max_overlap: float, suffix_cache: SuffixCache | None = None
+) -> tuple[CompactRoadGraph, PlateauAlternatives]:
+    graph = CompactRoadGraph.from_graph(G)
+    mask = DangerZoneIndex.from_compact_graph(graph, danger_zone).mask
+    safety_dist, safety_successor = build_safety_tree(graph, mask, graph.length)
+    return graph, PlateauAlternatives(
+        graph,
+        mask,
+        graph.length,
+        safety_dist,
+        safety_successor,
+        max_overlap,
+        suffix_cache,
+    )
+
+
+def test_alternatives_reject_overlapping_routes() -> None:
+    graph, alternatives = _alternatives(max_overlap=0.5)
+    routes = alternatives.routes(graph.index["A"], 3)
+    # A-B-Y shares 10 of its 12 meters with A-B-X
+    assert [graph.to_path(route) for route in routes] == [["A", "B", "X"], ["A", "Z"]]
+
+
+def test_alternatives_without_overlap_bound() -> None:
+    graph, alternatives = _alternatives(max_overlap=1.0)
+    routes = alternatives.routes(graph.index["A"], 3)
+    assert [graph.to_path(route) for route in routes] == [
+        ["A", "B", "X"],
+        ["A", "B", "Y"],
+        ["A", "Z"],
+    ]
+
+
+def test_alternatives_stop_at_k_routes() -> None:
+    graph, alternatives = _alternatives(max_overlap=1.0)
+    routes = alternatives.routes(graph.index["A"], 1)
+    assert [graph.to_path(route) for route in routes] == [["A", "B", "X"]]
+
+
+def test_alternatives_reuse_cached_suffixes() -> None:
+    graph, alternatives = _alternatives(max_overlap=1.0, suffix_cache=SuffixCache())
+    alternatives.routes(graph.index["A"], 2)
+    routes = alternatives.routes(graph.index["B"], 2)
+
+    assert [graph.to_path(route) for route in routes] == [["B", "X"], ["B", "Y"]]
+    assert alternatives.cache_hits == 1
+
+
+def test_alternatives_search_without_enough_cached_suffixes() -> None:
+    graph, alternatives = _alternatives(max_overlap=1.0, suffix_cache=SuffixCache())
+    alternatives.routes(graph.index["A"], 1)
+    routes = alternatives.routes(graph.index["B"], 2)
+
+    assert [graph.to_path(route) for route in routes] == [["B", "X"], ["B", "Y"]]
+    assert alternatives.cache_hits == 0
+
+
+def test_suffix_cache_evicts_least_recently_used_node() -> None:
+    cache = SuffixCache(max_nodes=2)
+    cache.add([0, 1, 2, 9], [1.0, 1.0, 1.0], max_per_node=2)
+    cache.get(1)
+    cache.add([3, 4, 9], [1.0, 1.0], max_per_node=2)
+
+    assert len(cache) == 2
+    assert cache.get(2) == []
+    assert [cost for cost, *_ in cache.get(1)] == [2.0]
+    assert [cost for cost, *_ in cache.get(4)] == [1.0]
@@ -0,0 +1,63 @@
+import logging
+
+import geopandas as gpd
+import networkx as nx
+import pytest
+from _pytest.logging import LogCaptureFixture
+from route_helpers import (
+    EXAMPLE_DANGER_ZONE,
+    example_road_graph,
+    random_road_graph,
+    route_length,
+)
+from shapely.geometry import box
+
+from routes.batch import route_to_safety_batch
+from routes.shortest_path import ShortestPath
+
+G = example_road_graph()
+# A longer parallel edge, which a sparse matrix would add to the shorter one
+G.add_edge("B1", "G", length=8)
+danger_zone = gpd.GeoDataFrame(geometry=[EXAMPLE_DANGER_ZONE])
+
+
+def test_batch_routes() -> None:
+    routes = route_to_safety_batch(
+        ["A", "B", "B1", "C", "E"], danger_zone, G, metric="length"
+    )
+    assert routes == {
+        "A": [["A", "B", "C", "D"]],
+        "B": [["B", "C", "D"]],
+        "B1": [["B1", "G"]],
+        "C": [["C", "D"]],
+        "E": [["E", "D"]],
+    }
+
+
+def test_batch_logging(caplog: LogCaptureFixture) -> None:
+    trapped = nx.MultiDiGraph()
+    trapped.add_node("A", x=2, y=2)
+    trapped.add_node("B", x=3, y=3)
+    trapped.add_edge("A", "B", length=1)
+    with caplog.at_level(logging.INFO):
+        routes = route_to_safety_batch(
+            ["A", "B", "X"], danger_zone, trapped, metric="length"
+        )
+    assert routes == {}
+    assert "Origin node X is not in the graph" in caplog.text
+    assert "Node B has no neighbors" in caplog.text
+    assert "Node A cannot reach any nodes outside the dangerzone" in caplog.text
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_dijkstra(seed: int) -> None:
+    R = random_road_graph(seed, min_length=0, parallel_share=0.1)
+    zone = gpd.GeoDataFrame(geometry=[box(1, 1, 4, 4)])
+    origins = list(R.nodes)
+
+    routes = route_to_safety_batch(origins, zone, R, metric="length")
+    expected = ShortestPath().route_to_safety(origins, zone, R)
+
+    assert routes.keys() == expected.keys()
+    for origin, origin_routes in routes.items():
+        assert route_length(R, origin_routes[0]) == route_length(R, expected[origin][0])
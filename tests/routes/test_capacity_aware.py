@@ -0,0 +1,42 @@
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pytest
+from shapely.geometry import Polygon
+
+from routes.capacity_aware import CapacityAwareFastestPath, bpr_travel_time
+
+danger_zone = gpd.GeoDataFrame(geometry=[Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])])
+
+# A can leave the danger zone through the nearby exit X, or the exit Y that is twice as far
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("X", x=5, y=5)
+G.add_node("Y", x=6, y=6)
+G.add_edge("A", "X", length=100, maxspeed=50)
+G.add_edge("A", "Y", length=200, maxspeed=50)
+
+msa = CapacityAwareFastestPath()
+
+
+def test_bpr_travel_time() -> None:
+    free_flow_time = np.array([10.0, 10.0])
+    travel_time = bpr_travel_time(
+        free_flow_time, np.array([0.0, 100.0]), np.array([100.0, 100.0])
+    )
+    assert travel_time.tolist() == pytest.approx([10.0, 11.5])
+
+
+def test_capacity_aware_uses_fastest_route_below_capacity() -> None:
+    routes = msa.route_to_safety(["A"], danger_zone, G, 2, demand={"A": 10})
+    assert routes["A"] == [["A", "X"]]
+
+
+def test_capacity_aware_spreads_traffic_over_capacity() -> None:
+    routes = msa.route_to_safety(["A"], danger_zone, G, 2, demand={"A": 10_000})
+    assert sorted(routes["A"]) == [["A", "X"], ["A", "Y"]]
+
+
+def test_capacity_aware_single_route_per_origin_point() -> None:
+    routes = msa.route_to_safety(["A"], danger_zone, G, 1, demand={"A": 10_000})
+    assert len(routes["A"]) == 1
@@ -0,0 +1,144 @@
+import pickle
+from pathlib import Path
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import pytest
+from shapely.geometry import box
+
+from data_loader.osm import OsmGraphCache
+from routes.compact_graph import (
+    COLUMNS,
+    MISSING,
+    CompactRoadGraph,
+    as_compact_graph,
+    load_compact_graph,
+)
+from utils import DANISH_DEFAULT_SPEED_LIMIT
+
+
+def test_compact_graph_csr_layout(mock_osm_graph: nx.MultiDiGraph) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+
+    assert graph.nodes == ["A", "B", "C", "D", "E"]
+    assert graph.num_edges == len(mock_osm_graph.edges)
+    assert graph.offsets.tolist() == [0, 1, 3, 6, 7, 7]
+    for i, node in enumerate(graph.nodes):
+        start, end = graph.offsets[i], graph.offsets[i + 1]
+        targets = [graph.nodes[j] for j in graph.targets[start:end]]
+        assert targets == list(mock_osm_graph.successors(node))
+    assert graph.out_degree(graph.index["E"]) == 0
+
+
+def test_compact_graph_edge_attributes(mock_osm_graph: nx.MultiDiGraph) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+
+    edge = list(mock_osm_graph.edges()).index(("C", "D"))
+    assert graph.length[edge] == 400
+    assert graph.speed_limit[edge] == 130
+    assert graph.lanes[edge] == 3
+    assert graph.oneway[edge]
+    assert graph.travel_time[edge] == pytest.approx(400 / (130 / 3.6))
+
+
+def test_compact_graph_missing_attributes() -> None:
+    G = nx.MultiDiGraph()
+    G.add_node(1, x=0, y=0)
+    G.add_node(2, x=1, y=1)
+    G.add_edge(1, 2, length=10, maxspeed="none")
+
+    graph = CompactRoadGraph.from_graph(G)
+    assert graph.speed_limit[0] == DANISH_DEFAULT_SPEED_LIMIT
+    assert graph.lanes[0] == MISSING
+    assert graph.oneway[0]
+
+
+def test_compact_graph_reverse_csr(mock_osm_graph: nx.MultiDiGraph) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+    offsets, sources, edge_ids = graph.reverse_csr()
+
+    a = graph.index["A"]
+    incoming = {graph.nodes[s] for s in sources[offsets[a] : offsets[a + 1]]}
+    assert incoming == {"B", "C"}
+    assert np.all(graph.targets[edge_ids[offsets[a] : offsets[a + 1]]] == a)
+
+
+def test_compact_graph_subgraph(mock_osm_graph: nx.MultiDiGraph) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+    node_mask = np.isin(graph.nodes, ["A", "B", "C"])
+    subgraph = graph.subgraph(node_mask)
+
+    assert subgraph.nodes == ["A", "B", "C"]
+    for i, node in enumerate(subgraph.nodes):
+        start, end = subgraph.offsets[i], subgraph.offsets[i + 1]
+        targets = [subgraph.nodes[j] for j in subgraph.targets[start:end]]
+        assert targets == [
+            v for v in mock_osm_graph.successors(node) if v in subgraph.nodes
+        ]
+    b = subgraph.index["B"]
+    start, end = subgraph.offsets[b], subgraph.offsets[b + 1]
+    targets = [subgraph.nodes[j] for j in subgraph.targets[start:end]]
+    assert dict(zip(targets, subgraph.length[start:end])) == {"A": 100, "C": 200}
+
+
+def test_compact_graph_pickles(mock_osm_graph: nx.MultiDiGraph) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+    unpickled = pickle.loads(pickle.dumps(graph))
+
+    assert unpickled.index == graph.index
+    assert np.array_equal(unpickled.travel_time, graph.travel_time)
+
+
+def test_compact_graph_save_and_load(
+    mock_osm_graph: nx.MultiDiGraph, tmp_path: Path
+) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+    graph.save(tmp_path / "graph")
+    loaded = CompactRoadGraph.load(tmp_path / "graph")
+
+    assert loaded.nodes == graph.nodes
+    assert loaded.index == graph.index
+    assert isinstance(loaded.targets, np.memmap)
+    for column in COLUMNS:
+        assert np.array_equal(getattr(loaded, column), getattr(graph, column))
+    assert loaded.fingerprint() == graph.fingerprint()
+
+
+def test_compact_graph_from_graphml(tmp_path: Path) -> None:
+    G = nx.MultiDiGraph(crs="EPSG:4326")
+    G.add_node(1, x=12.5, y=55.5)
+    G.add_node(2, x=12.6, y=55.6)
+    G.add_edge(1, 2, length=100.0, maxspeed="50", oneway=True)
+    ox.save_graphml(G, tmp_path / "graph.graphml")
+
+    graph = CompactRoadGraph.from_graphml(tmp_path / "graph.graphml")
+    assert graph.nodes == [1, 2]
+    assert graph.length.tolist() == [100.0]
+    assert graph.speed_limit.tolist() == [50]
+
+
+def test_load_compact_graph_is_cached(
+    mock_osm_graph: nx.MultiDiGraph, tmp_path: Path
+) -> None:
+    cache = OsmGraphCache(tmp_path)
+    polygon = box(12.4, 55.4, 13.0, 56.0)
+    cache.put(polygon, mock_osm_graph)
+    built = load_compact_graph(polygon, mock_osm_graph, cache=cache)
+    loaded = load_compact_graph(polygon, nx.MultiDiGraph(), cache=cache)
+    assert isinstance(loaded.targets, np.memmap)
+    assert loaded.fingerprint() == built.fingerprint()
+
+    # Caching the graph of the polygon again drops the routing graph of the previous one
+    mock_osm_graph.remove_node("E")
+    cache.put(polygon, mock_osm_graph)
+    rebuilt = load_compact_graph(polygon, mock_osm_graph, cache=cache)
+    assert rebuilt.nodes == ["A", "B", "C", "D"]
+
+
+def test_as_compact_graph_reuses_compact_graph(
+    mock_osm_graph: nx.MultiDiGraph,
+) -> None:
+    graph = CompactRoadGraph.from_graph(mock_osm_graph)
+    assert as_compact_graph(graph) is graph
+    assert as_compact_graph(mock_osm_graph).nodes == graph.nodes
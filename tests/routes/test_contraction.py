@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from route_helpers import (
+    EXAMPLE_DANGER_ZONE,
+    example_road_graph,
+    random_road_graph,
+    route_length,
+)
+from shapely.geometry import box
+
+from routes.compact_graph import CompactRoadGraph
+from routes.contraction import ContractionHierarchy
+from routes.danger_zone_index import DangerZoneIndex
+from routes.dijkstra import dijkstra_to_safety
+from routes.shortest_path import ShortestPath
+
+G = example_road_graph()
+danger_zone = gpd.GeoDataFrame(geometry=[EXAMPLE_DANGER_ZONE])
+
+
+def test_contraction_hierarchy_routes(tmp_path: Path) -> None:
+    routes = ShortestPath("ch", tmp_path).route_to_safety(
+        ["A", "B", "B1", "C", "E"], danger_zone, G
+    )
+    assert routes == {
+        "A": [["A", "B", "C", "D"]],
+        "B": [["B", "C", "D"]],
+        "B1": [["B1", "G"]],
+        "C": [["C", "D"]],
+        "E": [["E", "D"]],
+    }
+
+
+def test_contraction_hierarchy_is_cached(tmp_path: Path) -> None:
+    graph = CompactRoadGraph.from_graph(G)
+    hierarchy = ContractionHierarchy.load_or_build(graph, "length", tmp_path)
+    assert len(list(tmp_path.glob("ch-*.npz"))) == 1
+    cached = ContractionHierarchy.load_or_build(graph, "length", tmp_path)
+    assert np.array_equal(cached.rank, hierarchy.rank)
+    assert np.array_equal(cached.up_weights, hierarchy.up_weights)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_contraction_hierarchy_matches_dijkstra(seed: int) -> None:
+    R = random_road_graph(seed)
+    graph = CompactRoadGraph.from_graph(R)
+    mask = DangerZoneIndex.from_compact_graph(
+        graph, gpd.GeoDataFrame(geometry=[box(1, 1, 4, 4)])
+    ).mask
+    origins = graph.to_path(np.flatnonzero(mask).tolist())
+
+    routes = ContractionHierarchy.build(graph, graph.length).route_to_safety(
+        graph, mask, origins
+    )
+    expected = dijkstra_to_safety(graph, mask, origins, graph.length)
+
+    assert routes.keys() == expected.keys()
+    for origin, origin_routes in routes.items():
+        assert route_length(R, origin_routes[0]) == route_length(R, expected[origin][0])
@@ -0,0 +1,43 @@
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import pytest
+from shapely.geometry import Polygon
+
+from routes.danger_zone_index import DangerZoneIndex
+
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("B", x=4, y=2)  # on the boundary
+G.add_node("C", x=5, y=5)
+G.add_node("D", x=8, y=8)  # inside the second polygon
+
+danger_zone = gpd.GeoDataFrame(
+    geometry=[
+        Polygon([(1, 4), (1, 1), (4, 1), (4, 4)]),
+        Polygon([(7, 7), (7, 9), (9, 9), (9, 7)]),
+    ]
+)
+
+
+def test_danger_zone_index_lookups() -> None:
+    index = DangerZoneIndex.from_graph(G, danger_zone)
+    assert "A" in index
+    assert "B" in index
+    assert "C" not in index
+    assert "D" in index
+    assert len(index) == 4
+
+
+def test_danger_zone_index_mask_is_aligned_with_nodes() -> None:
+    index = DangerZoneIndex.from_graph(G, danger_zone)
+    assert index.nodes == ["A", "B", "C", "D"]
+    assert index.mask.dtype == np.bool_
+    assert index.mask.tolist() == [True, True, False, True]
+    assert index.danger_zone_nodes() == ["A", "B", "D"]
+
+
+def test_danger_zone_index_unknown_node() -> None:
+    index = DangerZoneIndex.from_graph(G, danger_zone)
+    with pytest.raises(KeyError):
+        _ = "X" in index
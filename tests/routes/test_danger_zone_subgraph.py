@@ -0,0 +1,51 @@
+import geopandas as gpd
+import networkx as nx
+from shapely.geometry import Polygon
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+
+# A and B are in the danger zone, C is an exit, D and S are safe but not exits
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("B", x=3, y=3)
+G.add_node("C", x=5, y=5)
+G.add_node("D", x=6, y=6)
+G.add_node("S", x=7, y=7)
+G.add_edge("A", "B", length=1)
+G.add_edge("B", "A", length=1)
+G.add_edge("B", "C", length=1)
+G.add_edge("C", "D", length=1)
+G.add_edge("D", "B", length=1)
+G.add_edge("S", "C", length=1)
+
+danger_zone = gpd.GeoDataFrame(geometry=[Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])])
+
+
+def _subgraph(origin_points: list[str] | None = None) -> DangerZoneSubgraph:
+    graph = CompactRoadGraph.from_graph(G)
+    index = DangerZoneIndex.from_compact_graph(graph, danger_zone)
+    return DangerZoneSubgraph.from_index(graph, index, origin_points)
+
+
+def test_danger_zone_subgraph_keeps_danger_zone_and_exits() -> None:
+    subgraph = _subgraph()
+    graph = subgraph.graph
+
+    assert graph.nodes == ["A", "B", "C"]
+    assert subgraph.mask.tolist() == [True, True, False]
+    assert graph.to_path(subgraph.exits.tolist()) == ["C"]
+    edges = {
+        (graph.nodes[u], graph.nodes[v]) for u, v in zip(graph.sources(), graph.targets)
+    }
+    assert edges == {("A", "B"), ("B", "A"), ("B", "C")}
+
+
+def test_danger_zone_subgraph_keeps_safe_origin_points() -> None:
+    subgraph = _subgraph(["A", "S"])
+    graph = subgraph.graph
+
+    assert graph.nodes == ["A", "B", "C", "S"]
+    assert graph.out_degree(graph.index["S"]) == 1
+    assert graph.out_degree(graph.index["C"]) == 0
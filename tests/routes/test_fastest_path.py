@@ -40,34 +40,32 @@ fp = FastestPath()
 
 def test_fastest_path() -> None:
     routes = fp.route_to_safety(["A"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert len(routes["A"]) == 3
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
 
 
 def test_fastest_path_two_origin_points() -> None:
     routes = fp.route_to_safety(["A", "B"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert (["B", "C", "D"]) in routes["B"]
-    assert (["B", "F"]) in routes["B"]
-    assert len(routes["A"]) == 3
-    assert len(routes["B"]) == 2
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
+    assert routes["B"] == [["B", "C", "D"], ["B", "C", "E", "D"], ["B", "F"]]
 
 
 def test_fastest_path_three_origin_points() -> None:
     routes = fp.route_to_safety(["A", "B", "C"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert (["B", "C", "D"]) in routes["B"]
-    assert (["B", "F"]) in routes["B"]
-    assert (["C", "D"]) in routes["C"]
-    assert len(routes["A"]) == 3
-    assert len(routes["B"]) == 2
-    assert len(routes["C"]) == 1
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
+    assert routes["B"] == [["B", "C", "D"], ["B", "C", "E", "D"], ["B", "F"]]
+    assert routes["C"] == [["C", "D"], ["C", "E", "D"]]
 
 
 def test_fastest_path_three_origin_points_div_routes_1() -> None:
@@ -80,6 +78,13 @@ def test_fastest_path_three_origin_points_div_routes_1() -> None:
     assert len(routes["C"]) == 1
 
 
+def test_fastest_path_origin_points_are_routed_independently() -> None:
+    origin_points = ["E", "B1", "C"]
+    routes = fp.route_to_safety(origin_points, danger_zone, G, 1)
+    for origin in origin_points:
+        assert routes[origin] == fp.route_to_safety([origin], danger_zone, G, 1)[origin]
+
+
 # Create a directed graph
 G1 = nx.MultiDiGraph()
 
@@ -154,3 +159,18 @@ def test_fastest_path_origin_has_no_neighbours_logging(
     with caplog.at_level(logging.INFO):
         fp.route_to_safety(["A"], danger_zone, G4, 1)
     assert "Node A has no neighbors" in caplog.text
+
+
+def test_fastest_path_parallel_matches_serial() -> None:
+    origin_points = ["A", "B", "B1", "C", "E"]
+    for diversifying_routes in [1, 3]:
+        serial = fp.route_to_safety(origin_points, danger_zone, G, diversifying_routes)
+        parallel = fp.route_to_safety(
+            origin_points, danger_zone, G, diversifying_routes, workers=2
+        )
+        assert parallel == serial
+        # The merge does not depend on which worker finishes first
+        again = fp.route_to_safety(
+            origin_points, danger_zone, G, diversifying_routes, workers=2
+        )
+        assert list(again.items()) == list(parallel.items())
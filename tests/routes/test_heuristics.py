@@ -0,0 +1,133 @@
+from pathlib import Path
+
+import geopandas as gpd
+import networkx as nx
+import numpy as np
+import osmnx as ox
+import pytest
+from route_helpers import route_length
+from shapely.geometry import box
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.danger_zone_subgraph import DangerZoneSubgraph
+from routes.dijkstra import dijkstra_to_safety
+from routes.heuristics import Landmarks, search_heuristic
+from routes.multi_source import build_safety_tree
+from routes.shortest_path import ShortestPath
+
+# A grid of streets about 100 meters apart, with the danger zone covering all but the outermost ring
+SIZE = 11
+STEP = 0.001
+G = nx.MultiDiGraph()
+for i in range(SIZE):
+    for j in range(SIZE):
+        G.add_node(f"{i},{j}", x=12.5 + i * STEP, y=55.6 + j * STEP)
+for i in range(SIZE):
+    for j in range(SIZE):
+        for next_i, next_j in [(i + 1, j), (i, j + 1)]:
+            if next_i < SIZE and next_j < SIZE:
+                u, v = f"{i},{j}", f"{next_i},{next_j}"
+                length = ox.distance.great_circle(
+                    G.nodes[u]["y"], G.nodes[u]["x"], G.nodes[v]["y"], G.nodes[v]["x"]
+                )
+                G.add_edge(u, v, length=length, maxspeed=50)
+                G.add_edge(v, u, length=length, maxspeed=50)
+
+danger_zone = gpd.GeoDataFrame(
+    geometry=[
+        box(12.5 + 0.5 * STEP, 55.6 + 0.5 * STEP, 12.5 + 9.5 * STEP, 55.6 + 9.5 * STEP)
+    ],
+    crs="EPSG:4326",
+)
+graph = CompactRoadGraph.from_graph(G)
+subgraph = DangerZoneSubgraph.from_index(
+    graph, DangerZoneIndex.from_compact_graph(graph, danger_zone)
+)
+origin_points = [
+    node for node, inside in zip(subgraph.graph.nodes, subgraph.mask.tolist()) if inside
+]
+
+
+@pytest.mark.parametrize("search", ["astar", "alt", "bidirectional"])
+def test_astar_routes_are_as_short_as_dijkstra(search: str, tmp_path: Path) -> None:
+    dijkstra = ShortestPath().route_to_safety(origin_points, danger_zone, graph)
+    astar = ShortestPath(search, tmp_path).route_to_safety(
+        origin_points, danger_zone, graph
+    )
+    assert astar.keys() == dijkstra.keys()
+    for origin, routes in dijkstra.items():
+        assert route_length(G, astar[origin][0]) == pytest.approx(
+            route_length(G, routes[0])
+        )
+
+
+@pytest.mark.parametrize("search", ["astar", "alt"])
+def test_astar_settles_fewer_nodes(search: str, tmp_path: Path) -> None:
+    origin = ["7,5"]  # Two blocks from the eastern boundary, eight from the western
+    dijkstra: dict[str, int] = {}
+    astar: dict[str, int] = {}
+    weights = subgraph.graph.length
+    dijkstra_to_safety(
+        subgraph.graph, subgraph.mask, origin, weights, expansions=dijkstra
+    )
+    heuristic = search_heuristic(
+        search, graph, subgraph, danger_zone, "length", tmp_path
+    )
+    dijkstra_to_safety(
+        subgraph.graph,
+        subgraph.mask,
+        origin,
+        weights,
+        heuristic=heuristic,
+        expansions=astar,
+    )
+    assert astar["7,5"] < dijkstra["7,5"]
+
+
+@pytest.mark.parametrize("search", ["astar", "alt", "bidirectional", "ch"])
+def test_router_reports_expansions(search: str, tmp_path: Path) -> None:
+    origin = ["7,5"]
+    dijkstra = ShortestPath()
+    dijkstra.route_to_safety(origin, danger_zone, graph)
+    router = ShortestPath(search, tmp_path)
+    router.route_to_safety(origin, danger_zone, graph)
+    assert router.expansions.keys() == {"7,5"}
+    assert router.expansions["7,5"] < dijkstra.expansions["7,5"]
+
+
+def test_bidirectional_settles_fewer_nodes() -> None:
+    origins = ["7,5", "5,5"]
+    dijkstra: dict[str, int] = {}
+    bidirectional: dict[str, int] = {}
+    weights = subgraph.graph.length
+    dijkstra_to_safety(
+        subgraph.graph, subgraph.mask, origins, weights, expansions=dijkstra
+    )
+    dijkstra_to_safety(
+        subgraph.graph,
+        subgraph.mask,
+        origins,
+        weights,
+        expansions=bidirectional,
+        bidirectional=True,
+    )
+    for origin in origins:
+        assert bidirectional[origin] < dijkstra[origin]
+
+
+def test_landmarks_are_cached(tmp_path: Path) -> None:
+    landmarks = Landmarks.load_or_compute(graph, "length", count=4, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob("landmarks-*.npz"))) == 1
+    cached = Landmarks.load_or_compute(graph, "length", count=4, cache_dir=tmp_path)
+    assert np.array_equal(cached.from_landmark, landmarks.from_landmark)
+    assert np.array_equal(cached.to_landmark, landmarks.to_landmark)
+
+
+def test_landmark_lower_bound() -> None:
+    landmarks = Landmarks.compute(graph, graph.length, count=4)
+    in_graph = np.array([graph.index[node] for node in subgraph.graph.nodes])
+    bound = landmarks.lower_bound(in_graph[subgraph.exits])[in_graph]
+    dist, _ = build_safety_tree(subgraph.graph, subgraph.mask, subgraph.graph.length)
+    assert np.all(bound <= np.array(dist) + 1e-9)
+    assert np.any(bound > 0)
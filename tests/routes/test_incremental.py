@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import geopandas as gpd
+import networkx as nx
+from shapely.geometry import box
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.incremental import (
+    IncrementalRouting,
+    RoutingSnapshot,
+    node_digests,
+    reusable_routes,
+)
+from routes.shortest_path import ShortestPath
+
+# The west and east origin points leave through their own exit, and the east exit E0 falls in the enlarged danger
+# zone, leaving the longer road north
+G = nx.MultiDiGraph()
+G.add_node("W0", x=0.5, y=2)
+G.add_node("W1", x=1.5, y=2)
+G.add_node("W2", x=2, y=2)
+G.add_node("E0", x=4.5, y=2)
+G.add_node("E1", x=3.5, y=2)
+G.add_node("E2", x=3, y=2)
+G.add_node("N", x=3.5, y=5)
+G.add_edge("W2", "W1", length=1)
+G.add_edge("W1", "W0", length=1)
+G.add_edge("E2", "E1", length=1)
+G.add_edge("E1", "E0", length=1)
+G.add_edge("E1", "N", length=3)
+G.add_edge("E0", "N", length=4)
+
+danger_zone = gpd.GeoDataFrame(geometry=[box(1, 1, 4, 4)])
+enlarged_danger_zone = gpd.GeoDataFrame(geometry=[box(1, 1, 5, 4)])
+origin_points = ["W1", "W2", "E1", "E2"]
+graph = CompactRoadGraph.from_graph(G)
+
+# The road network loaded around the enlarged danger zone reaches further east, giving E0 a closer way out
+G_enlarged = G.copy()
+G_enlarged.add_node("E3", x=5.5, y=2)
+G_enlarged.add_edge("E0", "E3", length=1)
+enlarged_graph = CompactRoadGraph.from_graph(G_enlarged)
+
+
+def snapshot_of(routes_graph: CompactRoadGraph) -> RoutingSnapshot:
+    routes = ShortestPath().route_to_safety(origin_points, danger_zone, routes_graph)
+    mask = DangerZoneIndex.from_compact_graph(routes_graph, danger_zone).mask
+    return RoutingSnapshot(
+        node_digests(routes_graph, routes_graph.length, mask), routes
+    )
+
+
+def test_reusable_routes() -> None:
+    mask = DangerZoneIndex.from_compact_graph(graph, enlarged_danger_zone).mask
+    reused, to_route = reusable_routes(
+        graph, graph.length, snapshot_of(graph), mask, origin_points + ["E0"]
+    )
+    assert reused == {"W1": [["W1", "W0"]], "W2": [["W2", "W1", "W0"]]}
+    assert to_route == ["E1", "E2", "E0"]
+
+
+def test_reusable_routes_on_a_different_graph() -> None:
+    assert enlarged_graph.fingerprint() != graph.fingerprint()
+    mask = DangerZoneIndex.from_compact_graph(enlarged_graph, enlarged_danger_zone).mask
+    reused, to_route = reusable_routes(
+        enlarged_graph, enlarged_graph.length, snapshot_of(graph), mask, origin_points
+    )
+    assert reused == {"W1": [["W1", "W0"]], "W2": [["W2", "W1", "W0"]]}
+    assert to_route == ["E1", "E2"]
+
+
+def test_incremental_routing_matches_routing_from_scratch(tmp_path: Path) -> None:
+    router = IncrementalRouting(ShortestPath(), tmp_path)
+    router.route_to_safety(origin_points, danger_zone, graph)
+    routes = router.route_to_safety(origin_points, enlarged_danger_zone, graph)
+    assert routes == ShortestPath().route_to_safety(
+        origin_points, enlarged_danger_zone, graph
+    )
+    assert routes["E2"] == [["E2", "E1", "N"]]
+
+
+def test_incremental_routing_on_a_different_graph(tmp_path: Path) -> None:
+    router = IncrementalRouting(ShortestPath(), tmp_path)
+    router.route_to_safety(origin_points, danger_zone, graph)
+    routes = router.route_to_safety(origin_points, enlarged_danger_zone, enlarged_graph)
+    assert routes == ShortestPath().route_to_safety(
+        origin_points, enlarged_danger_zone, enlarged_graph
+    )
+    assert routes["E2"] == [["E2", "E1", "E0", "E3"]]
@@ -0,0 +1,98 @@
+import logging
+
+import geopandas as gpd
+import networkx as nx
+from _pytest.logging import LogCaptureFixture
+from route_helpers import EXAMPLE_DANGER_ZONE, example_road_graph
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.fastest_path import FastestPath
+from routes.multi_source import (
+    MultiSourceFastestPath,
+    build_safety_ball,
+    build_safety_tree,
+)
+
+G = example_road_graph()
+danger_zone = gpd.GeoDataFrame(geometry=[EXAMPLE_DANGER_ZONE])
+
+ms = MultiSourceFastestPath()
+
+
+def test_multi_source_fastest_path() -> None:
+    routes = ms.route_to_safety(["A", "B", "C", "E"], danger_zone, G)
+    assert routes["A"] == [["A", "B", "C", "D"]]
+    assert routes["B"] == [["B", "C", "D"]]
+    assert routes["C"] == [["C", "D"]]
+    assert routes["E"] == [["E", "D"]]
+
+
+def test_multi_source_matches_fastest_path() -> None:
+    origin_points = ["A", "B", "B1", "C", "E"]
+    routes = ms.route_to_safety(origin_points, danger_zone, G)
+    expected = FastestPath().route_to_safety(origin_points, danger_zone, G, 1)
+    assert routes == expected
+
+
+def test_multi_source_ignores_diversifying_routes() -> None:
+    routes = ms.route_to_safety(["A"], danger_zone, G, 3)
+    assert routes["A"] == [["A", "B", "C", "D"]]
+
+
+# Create a directed graph
+G1 = nx.MultiDiGraph()
+
+# Add nodes
+G1.add_node("A", x=2, y=2)
+G1.add_node("B", x=3, y=3)
+G1.add_node("C", x=5, y=5)
+
+# Add edges with weights
+G1.add_edge("A", "B", length=1, maxspeed=110)
+G1.add_edge("B", "C", length=1, maxspeed=110)
+G1.add_edge("A", "C", length=2, maxspeed=50)
+
+
+def test_multi_source_takes_fastest_route() -> None:
+    routes = ms.route_to_safety(["A"], danger_zone, G1)
+    assert routes["A"] == [["A", "B", "C"]]
+
+
+# Create a directed graph
+G2 = nx.MultiDiGraph()
+
+# Add nodes
+G2.add_node("A", x=2, y=2)
+G2.add_node("B", x=3, y=2)
+G2.add_node("C", x=4, y=2)
+
+# Add edges with weights
+G2.add_edge("A", "B", length=1, maxspeed=50)
+
+
+def test_multi_source_all_nodes_are_in_dangerzone_logging(
+    caplog: LogCaptureFixture,
+) -> None:
+    with caplog.at_level(logging.INFO):
+        routes = ms.route_to_safety(["A", "C"], danger_zone, G2)
+    assert "Node A cannot reach any nodes outside the dangerzone" in caplog.text
+    assert "Node C has no neighbors" in caplog.text
+    assert routes == {}
+
+
+def test_safety_ball() -> None:
+    graph = CompactRoadGraph.from_graph(G)
+    mask = DangerZoneIndex.from_compact_graph(graph, danger_zone).mask
+    full_dist, _ = build_safety_tree(graph, mask, graph.length)
+    dist, successor, radius = build_safety_ball(
+        graph, mask, graph.length, max_settled=5
+    )
+    # The exits D, F and G are settled first, then C and E two meters from D
+    assert radius == 3
+    for node in ["C", "E", "D", "F", "G"]:
+        assert dist[graph.index[node]] == full_dist[graph.index[node]]
+    assert successor[graph.index["C"]] == graph.index["D"]
+    for node in ["A", "B", "B1"]:
+        assert dist[graph.index[node]] == float("inf")
+        assert full_dist[graph.index[node]] >= radius
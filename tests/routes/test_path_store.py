@@ -0,0 +1,54 @@
+import pickle
+
+from routes.path_store import PathStore
+
+
+def test_routes_share_suffix() -> None:
+    store = PathStore()
+    store.add(["A", "B", "C", "D"])
+    store.add_origin("B")
+    store.add(["E", "C", "F"])  # C already leads on to D
+    assert store == {
+        "A": [["A", "B", "C", "D"]],
+        "B": [["B", "C", "D"]],
+        "E": [["E", "C", "D"]],
+    }
+    route = store["A"][0]
+    assert len(route) == 4
+    assert route[-2] == "C"
+    assert route[1:] == ["B", "C", "D"]
+    assert isinstance(route, list)
+    assert store["A"][0] is route  # Built once, on first access
+
+
+def test_explicit_routes() -> None:
+    store = PathStore()
+    store.add(["A", "B"])
+    store["A"] = [["A", "C"], ["A", "B"]]
+    store["X"] = [["X"]]
+    assert store == {"A": [["A", "C"], ["A", "B"]], "X": [["X"]]}
+    del store["A"]
+    assert list(store) == ["X"]
+
+
+def test_merge_keeps_first_pointer() -> None:
+    store = PathStore()
+    store.add(["A", "B", "C"])
+    shard = PathStore()
+    shard.add(["E", "B", "D"])
+    shard["X"] = [["X", "Y"]]
+    store.merge(shard)
+    store.merge({"Z": [["Z"]]})
+    assert store == {
+        "A": [["A", "B", "C"]],
+        "E": [["E", "B", "C"]],
+        "X": [["X", "Y"]],
+        "Z": [["Z"]],
+    }
+
+
+def test_pickle() -> None:
+    store = PathStore()
+    store.add(["A", "B", "C"])
+    store.add_origin("B")
+    assert pickle.loads(pickle.dumps(store)) == store
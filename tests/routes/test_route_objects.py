@@ -121,3 +121,22 @@ def test_population_diversify_route_math_remainder_0() -> None:
     assert result[0].num_people_on_route == 3
     assert result[1].num_people_on_route == 3
     assert result[2].num_people_on_route == 3
+
+
+def test_get_vehicle_demand() -> None:
+    population_data = gpd.GeoDataFrame(data={"id": ["1", "2"], "pop": [10, 40]})
+    demand = route.get_vehicle_demand(
+        population_data, cars_per_person=0.5, departure_window=1800
+    )
+    assert demand == {"1": 10.0, "2": 40.0}
+
+
+def test_create_route_object_ordered_by_departure() -> None:
+    dict_of_paths = {"1": [["1", "2"], ["1", "3"], ["1", "4"]]}
+    population_data = gpd.GeoDataFrame(data={"id": ["1"], "pop": [11]})
+    routes = route.create_route_objects(
+        dict_of_paths, population_data, 0, 1000, 1.0, ordered_by_departure=True
+    )
+    assert [r.num_people_on_route for r in routes] == [5, 3, 3]
+    assert max(routes[0].departure_times) <= min(routes[1].departure_times)
+    assert max(routes[1].departure_times) <= min(routes[2].departure_times)
@@ -0,0 +1,78 @@
+import pickle
+
+import geopandas as gpd
+import networkx as nx
+import pytest
+from shapely.geometry import Polygon
+
+from routes.compact_graph import CompactRoadGraph
+from routes.danger_zone_index import DangerZoneIndex
+from routes.fastest_path import FastestPath
+from routes.route import Route
+from routes.safe_exits import SafeExitCatalogue
+from utils import compute_capacity, kmh_to_ms
+
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("B", x=3, y=2)
+G.add_node("C", x=3, y=3)
+G.add_node("D", x=5, y=5)
+G.add_node("F", x=6, y=6)
+G.add_edge("A", "B", length=1, maxspeed=50)
+G.add_edge("B", "C", length=1, maxspeed=50)
+G.add_edge("C", "D", length=2, maxspeed=80, lanes=2)
+G.add_edge("B", "F", length=10, maxspeed=50)
+G.add_edge("D", "F", length=1, maxspeed=50)
+
+danger_zone = gpd.GeoDataFrame(geometry=[Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])])
+
+
+def _catalogue() -> tuple[CompactRoadGraph, SafeExitCatalogue]:
+    graph = CompactRoadGraph.from_graph(G)
+    index = DangerZoneIndex.from_compact_graph(graph, danger_zone)
+    return graph, SafeExitCatalogue.from_graph(graph, index)
+
+
+def test_safe_exit_catalogue_lists_boundary_edges() -> None:
+    _, catalogue = _catalogue()
+
+    assert len(catalogue) == 2
+    assert sorted(zip(catalogue.from_nodes, catalogue.to_nodes)) == [
+        ("B", "F"),
+        ("C", "D"),
+    ]
+    assert sorted(catalogue.exit_nodes()) == ["D", "F"]
+    capacity = dict(zip(catalogue.to_nodes, catalogue.capacity))
+    assert capacity["D"] == pytest.approx(compute_capacity(kmh_to_ms(80)))
+    assert catalogue.total_capacity == pytest.approx(
+        compute_capacity(kmh_to_ms(80)) + compute_capacity(kmh_to_ms(50))
+    )
+
+
+def test_safe_exit_catalogue_exit_loads() -> None:
+    _, catalogue = _catalogue()
+    routes = [
+        Route(["A", "B", "C", "D"], 3, [0] * 3),
+        Route(["C", "D"], 2, [0] * 2),
+        Route(["A", "B", "F"], 4, [0] * 4),
+    ]
+
+    loads = dict(zip(catalogue.to_nodes, catalogue.exit_loads(routes)))
+    assert loads == {"D": 5, "F": 4}
+
+
+def test_safe_exit_catalogue_serialises() -> None:
+    _, catalogue = _catalogue()
+    unpickled = pickle.loads(pickle.dumps(catalogue))
+    assert unpickled.to_nodes == catalogue.to_nodes
+
+    exits = catalogue.to_geodataframe()
+    assert list(exits["to_node"]) == catalogue.to_nodes
+    assert exits.geometry.iloc[0].coords[0] == (3, 2)
+
+
+def test_fastest_path_with_safe_exit_catalogue() -> None:
+    graph, catalogue = _catalogue()
+    fp = FastestPath()
+    routes = fp.route_to_safety(["A", "B"], danger_zone, graph, safe_exits=catalogue)
+    assert routes == fp.route_to_safety(["A", "B"], danger_zone, graph)
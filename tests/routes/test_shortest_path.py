@@ -40,34 +40,32 @@ sp = ShortestPath()
 
 def test_route_to_safety() -> None:
     routes = sp.route_to_safety(["A"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert len(routes["A"]) == 3
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
 
 
 def test_route_to_safety_two_origin_points() -> None:
     routes = sp.route_to_safety(["A", "B"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert (["B", "C", "D"]) in routes["B"]
-    assert (["B", "F"]) in routes["B"]
-    assert len(routes["A"]) == 3
-    assert len(routes["B"]) == 2
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
+    assert routes["B"] == [["B", "C", "D"], ["B", "C", "E", "D"], ["B", "F"]]
 
 
 def test_route_to_safety_three_origin_points() -> None:
     routes = sp.route_to_safety(["A", "B", "C"], danger_zone, G, 3)
-    assert (["A", "B", "C", "D"]) in routes["A"]
-    assert (["A", "B", "F"]) in routes["A"]
-    assert (["A", "B1", "G"]) in routes["A"]
-    assert (["B", "C", "D"]) in routes["B"]
-    assert (["B", "F"]) in routes["B"]
-    assert (["C", "D"]) in routes["C"]
-    assert len(routes["A"]) == 3
-    assert len(routes["B"]) == 2
-    assert len(routes["C"]) == 1
+    assert routes["A"] == [
+        ["A", "B", "C", "D"],
+        ["A", "B", "C", "E", "D"],
+        ["A", "B1", "G"],
+    ]
+    assert routes["B"] == [["B", "C", "D"], ["B", "C", "E", "D"], ["B", "F"]]
+    assert routes["C"] == [["C", "D"], ["C", "E", "D"]]
 
 
 def test_fastest_path_three_origin_points_div_routes_1() -> None:
@@ -0,0 +1,76 @@
+import geopandas as gpd
+import networkx as nx
+import pytest
+from shapely.geometry import Polygon
+
+from routes.time_dependent import (
+    LOAD_BIN_SECONDS,
+    LinkLoads,
+    TimeDependentFastestPath,
+    departure_wave_samples,
+    departure_wave_times,
+)
+
+danger_zone = gpd.GeoDataFrame(geometry=[Polygon([(1, 4), (1, 1), (4, 1), (4, 4)])])
+
+# The vehicles of A reach the exit link M-X about 7 minutes after those of B leaving at the same time, so the later
+# waves of B meet the earlier waves of A there unless they take the longer exit link M-Y
+G = nx.MultiDiGraph()
+G.add_node("A", x=2, y=2)
+G.add_node("B", x=3, y=3)
+G.add_node("M", x=3, y=2)
+G.add_node("X", x=5, y=5)
+G.add_node("Y", x=6, y=6)
+G.add_edge("A", "M", length=6000, maxspeed=50)
+G.add_edge("B", "M", length=10, maxspeed=50)
+G.add_edge("M", "X", length=100, maxspeed=50)
+G.add_edge("M", "Y", length=1000, maxspeed=50)
+
+demand = {"A": 20_000, "B": 10}
+time_dependent = TimeDependentFastestPath()
+
+
+def test_departure_wave_times() -> None:
+    times = departure_wave_times(0, 3600, 6)
+    assert len(times) == 6
+    assert times == sorted(times)
+    assert times[2] + times[3] == pytest.approx(3600)
+    assert departure_wave_times(100, 100, 2) == [100.0, 100.0]
+
+
+def test_departure_wave_samples() -> None:
+    times = departure_wave_times(0, 3600, 6)
+    samples = departure_wave_samples(0, 3600, 6, 20)
+    assert [len(wave) for wave in samples] == [20] * 6
+    flat = [time for wave in samples for time in wave]
+    assert flat == sorted(flat)
+    assert 0 <= flat[0] and flat[-1] <= 3600
+    for wave, time in zip(samples, times):
+        # Every wave covers a span of departures around its median departure time
+        assert wave[0] < time < wave[-1]
+        assert (wave[9] + wave[10]) / 2 == pytest.approx(time, abs=30)
+    # The outer waves are spread over more than one load bin
+    assert samples[0][-1] - samples[0][0] > LOAD_BIN_SECONDS
+    assert departure_wave_samples(100, 100, 2, 3) == [[100.0] * 3] * 2
+
+
+def test_link_loads() -> None:
+    loads = LinkLoads(num_edges=2, bin_seconds=300)
+    loads.add(1, 310, 10)
+    assert loads.flow(1, 599) == pytest.approx(120)
+    assert loads.flow(1, 600) == 0
+    assert loads.flow(0, 310) == 0
+
+
+def test_time_dependent_later_waves_avoid_saturated_links() -> None:
+    routes = time_dependent.route_to_safety(
+        ["A", "B"], danger_zone, G, demand=demand, departure_window=(0, 3600)
+    )
+    assert len(routes["B"]) == 6
+    assert routes["B"][0] == ["B", "M", "X"]
+    assert ["B", "M", "Y"] in routes["B"]
+
+
+def test_time_dependent_without_departure_window() -> None:
+    routes = time_dependent.route_to_safety(["A", "B"], danger_zone, G, demand=demand)
+    assert routes == {"A": [["A", "M", "X"]], "B": [["B", "M", "X"]]}